@@ -0,0 +1,165 @@
+import json
+import logging
+import pathlib
+import threading
+import typing
+
+from . import search
+from . import sidecar
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogVersion:
+    """Computes a version identifier for the local catalog files in some directory.
+
+    We only look at the file stats on each call (cheap), and only re-read a catalog file's version if its stats have
+    changed. If a fresh sidecar exists, its (tiny) metadata file is read instead of the (large) catalog file.
+    """
+
+    def __init__(self, catalog_path: typing.Union[str, pathlib.Path] = ".agent-catalog"):
+        self.catalog_path = pathlib.Path(catalog_path)
+        self._signature = None
+        self._identifier = None
+        self._lock = threading.Lock()
+
+    def _stat_signature(self) -> typing.Tuple:
+        signature = list()
+        for catalog_name in sidecar.CATALOG_FILES:
+            try:
+                stat = (self.catalog_path / catalog_name).stat()
+                signature.append((catalog_name, stat.st_size, stat.st_mtime_ns))
+            except FileNotFoundError:
+                signature.append((catalog_name, None, None))
+        return tuple(signature)
+
+    def _read_version(self, catalog_file: pathlib.Path) -> typing.Optional[typing.Dict]:
+        embeddings = sidecar.load_sidecar(catalog_file)
+        if embeddings is not None:
+            return embeddings.meta.version
+        with catalog_file.open("r") as fp:
+            return json.load(fp).get("version")
+
+    def __call__(self) -> str:
+        signature = self._stat_signature()
+        with self._lock:
+            if signature == self._signature:
+                return self._identifier
+
+            parts = list()
+            for catalog_name, size, _ in signature:
+                if size is None:
+                    continue
+                version = self._read_version(self.catalog_path / catalog_name) or dict()
+                identifier = version.get("identifier", "unknown")
+                if version.get("is_dirty", False):
+                    # Dirty catalogs share a git identifier, so we need the timestamp to tell them apart.
+                    identifier += "_dirty@" + str(version.get("timestamp"))
+                parts.append(f"{catalog_name.removesuffix('.json')}={identifier}")
+            self._signature = signature
+            self._identifier = ";".join(parts) if len(parts) > 0 else "unversioned"
+            logger.debug(f"Catalog version is now {self._identifier}.")
+            return self._identifier
+
+
+class ResolutionCache:
+    """A thread-safe map of (kind, query, annotations, limit, kwargs) -> resolved prompt / tools for one catalog version.
+
+    All entries are dropped as soon as a lookup is made with a different catalog version.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries = dict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(kind: str, query: str, annotations: search.AnnotationQuery, limit: int, **kwargs) -> typing.Tuple:
+        if annotations is not None and not isinstance(annotations, str):
+            annotations = json.dumps(annotations, sort_keys=True)
+        # Any other (provider-specific) arguments are forwarded to the provider, so they are part of our key as well.
+        extra = json.dumps(kwargs, sort_keys=True, default=repr) if len(kwargs) > 0 else None
+        return kind, query, annotations, limit, extra
+
+    def get_or_resolve(self, version: str, key: typing.Tuple, resolve: typing.Callable[[], typing.Any]) -> typing.Any:
+        with self._lock:
+            if version != self.version:
+                if self.version is not None:
+                    logger.info(f"Catalog version changed ({self.version} -> {version}). Clearing resolution cache.")
+                    self.invalidations += 1
+                self._entries.clear()
+                self.version = version
+            elif key in self._entries:
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        # We resolve outside the lock (at worst, two sessions resolve the same key concurrently on a cold cache).
+        value = resolve()
+        with self._lock:
+            if version == self.version:
+                self._entries[key] = value
+        return value
+
+    def stats(self) -> typing.Dict[str, typing.Any]:
+        with self._lock:
+            return {
+                "version": self.version,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+            }
+
+
+class CachingProvider:
+    """A wrapper around a provider that memoizes get_prompt_for / get_tools_for by catalog version.
+
+    One CachingProvider is meant to be shared by all sessions of a process, so a query resolved by one session is free
+    for every later session (until the catalog version changes).
+    """
+
+    def __init__(
+        self,
+        provider,
+        catalog_version: typing.Callable[[], str] = None,
+        cache: ResolutionCache = None,
+    ):
+        self.provider = provider
+        if catalog_version is None:
+            catalog_version = CatalogVersion(getattr(provider, "catalog_path", ".agent-catalog"))
+        self.catalog_version = catalog_version
+        self.cache = cache if cache is not None else ResolutionCache()
+
+    def get_prompt_for(self, query: str = None, name: str = None, annotations: search.AnnotationQuery = None, **kwargs):
+        key = self.cache.make_key("prompt", query if name is None else "name:" + name, annotations, 1, **kwargs)
+        return self.cache.get_or_resolve(
+            self.catalog_version(),
+            key,
+            lambda: self.provider.get_prompt_for(query=query, name=name, annotations=annotations, **kwargs),
+        )
+
+    def get_tools_for(
+        self, query: str = None, name: str = None, annotations: search.AnnotationQuery = None, limit: int = 1, **kwargs
+    ):
+        key = self.cache.make_key("tool", query if name is None else "name:" + name, annotations, limit, **kwargs)
+        return self.cache.get_or_resolve(
+            self.catalog_version(),
+            key,
+            lambda: self.provider.get_tools_for(query=query, name=name, annotations=annotations, limit=limit, **kwargs),
+        )
+
+    def warm(self, prompt_queries: typing.Iterable[str] = (), tool_queries: typing.Iterable[str] = ()) -> None:
+        """Resolve the given queries ahead of time (e.g., at server startup)."""
+        for query in prompt_queries:
+            self.get_prompt_for(query=query)
+        for query in tool_queries:
+            self.get_tools_for(query=query)
+
+    def __getattr__(self, item):
+        if item == "provider":
+            raise AttributeError(item)
+        return getattr(self.provider, item)
@@ -0,0 +1,366 @@
+import argparse
+import ast
+import datetime
+import hashlib
+import json
+import logging
+import numpy
+import os
+import pathlib
+import pydantic
+import subprocess
+import time
+import typing
+import yaml
+
+from ..embedding import backends
+from . import search
+from . import sidecar
+
+logger = logging.getLogger(__name__)
+
+# The file extensions (and the record kinds they hold) that belong to each catalog.
+_TOOL_EXTENSIONS = {".py", ".sqlpp", ".yaml", ".yml"}
+_PROMPT_EXTENSIONS = {".prompt"}
+_DEFAULT_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L12-v2"
+
+
+class SourceEntry(pydantic.BaseModel):
+    size: int
+    mtime_ns: int
+    sha256: str
+    identifiers: typing.List[str]
+
+
+class Manifest(pydantic.BaseModel):
+    embedding_model: str
+    sources: typing.Dict[str, SourceEntry] = dict()
+
+
+class IndexReport(pydantic.BaseModel):
+    kind: str
+    added: typing.List[str] = list()
+    modified: typing.List[str] = list()
+    removed: typing.List[str] = list()
+    reparsed: typing.List[str] = list()
+    unchanged: int = 0
+    items: int = 0
+    embedded: int = 0
+    reused: int = 0
+    seconds: float = 0.0
+
+    def __str__(self):
+        return (
+            f"Indexed {self.items} {self.kind}(s) in {self.seconds:.2f}s: "
+            f"{len(self.added)} source(s) added, {len(self.modified)} modified, {len(self.removed)} removed, "
+            f"{self.unchanged} unchanged ({len(self.reparsed)} re-parsed). Embedded {self.embedded} item(s), reused {self.reused} embedding(s)."
+        )
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _timestamp() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+class _GitVersioner:
+    """Builds the item 'version' fields the same way agentc does (git commit if clean, a timestamp if dirty)."""
+
+    def __init__(self, root: pathlib.Path):
+        self.root = root
+        self.dirty = set()
+        self._enabled = True
+
+    def _git(self, *args) -> typing.Optional[str]:
+        if not self._enabled:
+            return None
+        try:
+            result = subprocess.run(["git", *args], cwd=self.root, capture_output=True, text=True, check=True)
+            return result.stdout.rstrip("\n")
+        except (FileNotFoundError, subprocess.CalledProcessError):
+            logger.warning("Could not run git, so all items will be marked as dirty.")
+            self._enabled = False
+            return None
+
+    def prepare(self, sources: typing.List[str]) -> None:
+        # One 'git status' call covers every source that we need to version.
+        if len(sources) == 0:
+            return
+        status = self._git("status", "--porcelain", "--", *sources)
+        if status is None:
+            self.dirty = set(sources)
+            return
+        # Porcelain paths are relative to the repository root (not to our working directory).
+        prefix = self._git("rev-parse", "--show-prefix") or ""
+        for line in status.splitlines():
+            self.dirty.add(os.path.relpath(line[3:].strip().strip('"'), prefix or "."))
+
+    def version(self, source: str) -> typing.Dict:
+        commit = None if source in self.dirty else self._git("log", "-1", "--format=%H", "--", source)
+        if not commit:
+            return {"is_dirty": True, "timestamp": _timestamp()}
+        return {"identifier": commit, "is_dirty": False, "timestamp": _timestamp(), "version_system": "git"}
+
+    def catalog_version(self) -> typing.Dict:
+        commit = self._git("rev-parse", "HEAD")
+        is_dirty = self._git("status", "--porcelain") != ""
+        version = {"identifier": commit, "is_dirty": is_dirty, "timestamp": _timestamp()}
+        return {k: v for k, v in version.items() if v is not None}
+
+
+def _extract_prompt(source: str, text: str) -> typing.List[typing.Dict]:
+    _, front_matter, body = text.split("---", 2)
+    metadata = yaml.safe_load(front_matter)
+    return [{**metadata, "prompt": body, "source": source}]
+
+
+def _extract_sqlpp(source: str, text: str) -> typing.List[typing.Dict]:
+    metadata = yaml.safe_load(text[text.index("/*") + 2 : text.index("*/")])
+    return [{**metadata, "record_kind": "sqlpp_query", "query": text, "source": source}]
+
+
+def _extract_yaml(source: str, text: str) -> typing.List[typing.Dict]:
+    metadata = yaml.safe_load(text)
+    if metadata.get("record_kind") != "http_request":
+        return [{**metadata, "source": source}]
+
+    # HTTP request records hold one item per OpenAPI operation (specification paths are relative to the CWD).
+    filename = os.path.normpath(metadata["open_api"]["filename"])
+    with open(filename, "r") as fp:
+        specification = json.load(fp)
+    items = list()
+    for operation in metadata["open_api"]["operations"]:
+        spec_operation = specification["paths"][operation["path"]][operation["method"]]
+        item = {
+            "description": spec_operation.get("description", spec_operation.get("summary", "")),
+            "name": spec_operation["operationId"],
+            "operation": {"method": operation["method"], "path": operation["path"]},
+            "record_kind": "http_request",
+            "source": source,
+            "specification": {"filename": filename},
+        }
+        if "annotations" in metadata:
+            item["annotations"] = metadata["annotations"]
+        items.append(item)
+    return items
+
+
+def _extract_python(source: str, text: str) -> typing.List[typing.Dict]:
+    items = list()
+    for node in ast.parse(text).body:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        for decorator in node.decorator_list:
+            target = decorator.func if isinstance(decorator, ast.Call) else decorator
+            name = target.attr if isinstance(target, ast.Attribute) else getattr(target, "id", None)
+            if name == "tool":
+                # Like agentc's @tool, the decorator's (literal) keywords override the function's name and docstring.
+                keywords = dict()
+                if isinstance(decorator, ast.Call):
+                    keywords = {x.arg: ast.literal_eval(x.value) for x in decorator.keywords if x.arg is not None}
+                items.append(
+                    {
+                        "annotations": keywords.get("annotations") or {},
+                        "contents": text,
+                        "description": keywords.get("description") or ast.get_docstring(node) or "",
+                        "name": keywords.get("name") or node.name,
+                        "record_kind": "python_function",
+                        "source": source,
+                    }
+                )
+                break
+    return items
+
+
+class IncrementalIndexer:
+    """Re-indexes a local catalog, only re-reading and re-embedding the sources that have changed.
+
+    Alongside each catalog file, we keep a manifest of (size, mtime, sha256, identifiers) for every source file. A source
+    whose stats are unchanged is not even read. A source whose stats changed is hashed, and is only re-parsed if its
+    contents changed. An unchanged source is still re-parsed if any of its items is missing from the catalog (e.g., it
+    was rewritten by 'agentc index', with new identifiers), or if its items were indexed as dirty but it has since been
+    committed. Finally, an item is only re-embedded if its description is new (embeddings are keyed by the
+    description they were computed from, so renames and edits to non-descriptive fields cost nothing).
+    """
+
+    def __init__(
+        self,
+        kind: typing.Literal["tool", "prompt"],
+        source_dirs: typing.List[typing.Union[str, pathlib.Path]],
+        catalog_path: typing.Union[str, pathlib.Path] = ".agent-catalog",
+        encoder: typing.Callable[[typing.List[str]], numpy.ndarray] = None,
+        embedding_model: str = None,
+    ):
+        self.kind = kind
+        self.source_dirs = [pathlib.Path(d) for d in source_dirs]
+        self.catalog_path = pathlib.Path(catalog_path)
+        self.catalog_file = self.catalog_path / f"{kind}-catalog.json"
+        self.manifest_file = self.catalog_path / f"{kind}-catalog.manifest.json"
+        self.extensions = _TOOL_EXTENSIONS if kind == "tool" else _PROMPT_EXTENSIONS
+        self.embedding_model = embedding_model
+        self._encoder = encoder
+
+    def _encode(self, texts: typing.List[str]) -> numpy.ndarray:
+        if self._encoder is None:
+            # The model is only loaded if something actually needs to be embedded.
+            self._encoder = backends.load_encoder(self.embedding_model).encode
+        return numpy.asarray(self._encoder(texts), dtype=numpy.float32)
+
+    def _walk(self) -> typing.Iterable[pathlib.Path]:
+        for source_dir in self.source_dirs:
+            for path in sorted(source_dir.rglob("*")):
+                if path.is_file() and path.suffix in self.extensions and "__pycache__" not in path.parts:
+                    yield path
+
+    def _extract(self, path: pathlib.Path, text: str) -> typing.List[typing.Dict]:
+        source = os.path.normpath(path)
+        match path.suffix:
+            case ".prompt":
+                return _extract_prompt(source, text)
+            case ".sqlpp":
+                return _extract_sqlpp(source, text)
+            case ".yaml" | ".yml":
+                return _extract_yaml(source, text)
+            case ".py":
+                return _extract_python(source, text)
+            case _:
+                raise ValueError(f"Unknown source type: {path}")
+
+    def _load_previous(self) -> typing.Tuple[typing.Dict, Manifest]:
+        catalog = {"items": list()}
+        if self.catalog_file.exists():
+            with self.catalog_file.open("r") as fp:
+                catalog = json.load(fp)
+        manifest = None
+        if self.manifest_file.exists():
+            with self.manifest_file.open("r") as fp:
+                manifest = Manifest.model_validate_json(fp.read())
+        embedding_model = self.embedding_model or catalog.get("embedding_model") or _DEFAULT_EMBEDDING_MODEL
+        if manifest is None or manifest.embedding_model != embedding_model:
+            # Without a (compatible) manifest, every source is treated as modified (but embeddings can be reused).
+            manifest = Manifest(embedding_model=embedding_model)
+        if catalog.get("embedding_model", embedding_model) != embedding_model:
+            catalog = {"items": list()}
+        self.embedding_model = embedding_model
+        return catalog, manifest
+
+    def run(self) -> IndexReport:
+        start_time = time.perf_counter()
+        report = IndexReport(kind=self.kind)
+        catalog, manifest = self._load_previous()
+        previous_items = {x["identifier"]: x for x in catalog["items"]}
+        embeddings_by_description = {x["description"]: x["embedding"] for x in catalog["items"]}
+
+        # First, figure out which sources have changed (using only a stat() call for most of them).
+        new_sources: typing.Dict[str, SourceEntry] = dict()
+        changed: typing.Dict[str, typing.Tuple[pathlib.Path, bytes]] = dict()
+        for path in self._walk():
+            source, stat = os.path.normpath(path), path.stat()
+            entry = manifest.sources.get(source)
+            if entry is not None and (entry.size, entry.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+                new_sources[source] = entry
+                continue
+            data = path.read_bytes()
+            digest = _sha256(data)
+            if entry is not None and entry.sha256 == digest:
+                new_sources[source] = entry.model_copy(update={"size": stat.st_size, "mtime_ns": stat.st_mtime_ns})
+                continue
+            (report.modified if entry is not None else report.added).append(source)
+            changed[source] = (path, data)
+            new_sources[source] = SourceEntry(
+                size=stat.st_size, mtime_ns=stat.st_mtime_ns, sha256=digest, identifiers=[]
+            )
+        report.removed = sorted(set(manifest.sources) - set(new_sources))
+        report.unchanged = len(new_sources) - len(changed)
+
+        # Unchanged sources whose items we cannot carry over (or whose dirty version may now be a commit) are re-parsed.
+        versioner = _GitVersioner(pathlib.Path.cwd())
+        unchanged = [x for x in new_sources if x not in changed]
+        dirty = [x for x in unchanged if any(i.endswith(":git__dirty") for i in new_sources[x].identifiers)]
+        versioner.prepare(dirty)
+        for source in unchanged:
+            entry = new_sources[source]
+            missing = any(i not in previous_items for i in entry.identifiers)
+            if missing or (source in dirty and source not in versioner.dirty):
+                report.reparsed.append(source)
+                path = pathlib.Path(source)
+                changed[source] = (path, path.read_bytes())
+                new_sources[source] = entry.model_copy(update={"identifiers": []})
+
+        # Next, carry over the items of unchanged sources verbatim...
+        items = list()
+        for source, entry in new_sources.items():
+            if source not in changed:
+                items.extend(previous_items[i] for i in entry.identifiers)
+
+        # ...and re-parse the changed sources.
+        versioner.prepare([x for x in changed if x not in dirty])
+        to_embed = list()
+        for source, (path, data) in changed.items():
+            version = versioner.version(source)
+            for item in self._extract(path, data.decode("utf-8")):
+                suffix = "git_" + version["identifier"] if not version["is_dirty"] else "git__dirty"
+                item["identifier"] = f"{source}:{item['name']}:{suffix}"
+                item["version"] = version
+                if item["description"] in embeddings_by_description:
+                    item["embedding"] = embeddings_by_description[item["description"]]
+                    report.reused += 1
+                else:
+                    to_embed.append(item)
+                new_sources[source].identifiers.append(item["identifier"])
+                items.append(item)
+
+        # Our providers fetch items by name, so two items with the same name would make a lookup ambiguous.
+        duplicates = search.duplicate_names(items)
+        if len(duplicates) > 0:
+            raise ValueError(f"Item names must be unique within a catalog, but found duplicates: {duplicates}!")
+
+        # All new descriptions are embedded in a single batch.
+        if len(to_embed) > 0:
+            vectors = self._encode([x["description"] for x in to_embed])
+            for item, vector in zip(to_embed, vectors, strict=True):
+                item["embedding"] = vector.tolist()
+            report.embedded = len(to_embed)
+
+        # Finally, write our catalog, manifest, and sidecar (only if something changed).
+        report.items = len(items)
+        if len(changed) > 0 or len(report.removed) > 0 or not self.catalog_file.exists():
+            self._write(catalog, items, versioner)
+        manifest.sources = new_sources
+        self.catalog_path.mkdir(parents=True, exist_ok=True)
+        with self.manifest_file.open("w") as fp:
+            fp.write(manifest.model_dump_json(indent=2))
+        report.seconds = time.perf_counter() - start_time
+        return report
+
+    def _write(self, previous_catalog: typing.Dict, items: typing.List[typing.Dict], versioner: _GitVersioner) -> None:
+        catalog = {k: v for k, v in previous_catalog.items() if k != "items"}
+        catalog["embedding_model"] = self.embedding_model
+        catalog["kind"] = self.kind
+        catalog["source_dirs"] = sorted({os.path.normpath(d) for d in self.source_dirs})
+        catalog["version"] = versioner.catalog_version()
+        catalog["items"] = sorted(items, key=lambda x: x["identifier"])
+
+        self.catalog_path.mkdir(parents=True, exist_ok=True)
+        temp_file = self.catalog_file.with_name(self.catalog_file.name + ".tmp")
+        with temp_file.open("w") as fp:
+            json.dump(catalog, fp, indent=2, sort_keys=True)
+            fp.write("\n")
+        os.replace(temp_file, self.catalog_file)
+        sidecar.write_sidecar(self.catalog_file)
+
+
+if __name__ == "__main__":
+    # Usage: python -m agent_catalog_example.catalog.indexer --kind prompt src/resources/agent_c/prompts
+    parser = argparse.ArgumentParser(description="Incrementally (re-)index a local catalog.")
+    parser.add_argument("source_dirs", nargs="+", type=pathlib.Path)
+    parser.add_argument("--kind", choices=["tool", "prompt"], required=True)
+    parser.add_argument("--catalog", type=pathlib.Path, default=pathlib.Path(".agent-catalog"))
+    parser.add_argument("--embedding-model", default=os.getenv("DEFAULT_SENTENCE_EMODEL"))
+    args = parser.parse_args()
+    indexer = IncrementalIndexer(
+        kind=args.kind, source_dirs=args.source_dirs, catalog_path=args.catalog, embedding_model=args.embedding_model
+    )
+    print(indexer.run())
@@ -0,0 +1,78 @@
+import logging
+import numpy
+import pathlib
+import typing
+
+from ..embedding import batching
+from . import search
+
+logger = logging.getLogger(__name__)
+
+
+class IndexedProvider:
+    """A wrapper around an agentc.Provider that resolves catalog queries against local CatalogIndexes.
+
+    Query-based lookups (e.g., get_prompt_for(query=...)) are answered by our own vectorized search, and the winning
+    items are then fetched from the wrapped provider by name. Name-based lookups (and anything else) are forwarded as-is.
+    If a local catalog file does not exist (e.g., the catalog only lives in Couchbase), we fall back to the provider.
+    """
+
+    def __init__(
+        self,
+        provider,
+        catalog_path: typing.Union[str, pathlib.Path] = ".agent-catalog",
+        encoder: typing.Callable[[typing.List[str]], numpy.ndarray] = None,
+    ):
+        self.provider = provider
+        self.catalog_path = pathlib.Path(catalog_path)
+        self.tool_index = self._load_index("tool-catalog.json")
+        self.prompt_index = self._load_index("prompt-catalog.json")
+        self._encoder = encoder
+
+    def _load_index(self, catalog_name: str) -> typing.Optional[search.CatalogIndex]:
+        catalog_file = self.catalog_path / catalog_name
+        if not catalog_file.exists():
+            logger.debug(f"No local catalog found at {catalog_file}. Deferring to the agentc provider.")
+            return None
+        return search.CatalogIndex.from_catalog(catalog_file)
+
+    def encode(self, queries: typing.List[str]) -> numpy.ndarray:
+        if self._encoder is None:
+            # Queries of all sessions are encoded together, in micro-batches (see EmbeddingService).
+            index = self.prompt_index if self.prompt_index is not None else self.tool_index
+            self._encoder = batching.shared_service(index.embedding_model).encode
+        return numpy.asarray(self._encoder(queries), dtype=numpy.float32)
+
+    def find_prompts(
+        self, query: str, annotations: search.AnnotationQuery = None, limit: int = 1
+    ) -> typing.List[search.SearchResult]:
+        return self.prompt_index.search(self.encode([query]), annotations=annotations, limit=limit)
+
+    def find_tools(
+        self, query: str, annotations: search.AnnotationQuery = None, limit: int = 1
+    ) -> typing.List[search.SearchResult]:
+        return self.tool_index.search(self.encode([query]), annotations=annotations, limit=limit)
+
+    def get_prompt_for(self, query: str = None, name: str = None, annotations: str = None, **kwargs):
+        if name is not None or query is None or self.prompt_index is None:
+            return self.provider.get_prompt_for(query=query, name=name, annotations=annotations, **kwargs)
+
+        results = self.find_prompts(query, annotations=annotations, limit=1)
+        if len(results) == 0:
+            return None
+        return self.provider.get_prompt_for(name=results[0].item["name"], **kwargs)
+
+    def get_tools_for(self, query: str = None, name: str = None, annotations: str = None, limit: int = 1, **kwargs):
+        if name is not None or query is None or self.tool_index is None:
+            return self.provider.get_tools_for(query=query, name=name, annotations=annotations, limit=limit, **kwargs)
+
+        tools = list()
+        for result in self.find_tools(query, annotations=annotations, limit=limit):
+            found = self.provider.get_tools_for(name=result.item["name"], **kwargs)
+            tools.extend(found if isinstance(found, list) else [found])
+        return tools
+
+    def __getattr__(self, item):
+        if item == "provider":
+            raise AttributeError(item)
+        return getattr(self.provider, item)
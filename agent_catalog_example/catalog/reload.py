@@ -0,0 +1,190 @@
+import contextlib
+import contextvars
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+import typing
+
+from . import search
+
+logger = logging.getLogger(__name__)
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm", "r") as fp:
+            return int(fp.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (FileNotFoundError, ValueError):
+        # Not on Linux (or without procfs), so we settle for the peak RSS (reported in bytes on macOS, but KB elsewhere).
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+class Snapshot:
+    """One immutable provider (and the catalog version it was built from), reference counted by its sessions."""
+
+    def __init__(self, version: str, provider):
+        self.version = version
+        self.provider = provider
+        self.created_at = time.monotonic()
+        self.retired_at: typing.Optional[float] = None
+        self.sessions = 0
+
+
+class ReloadingProvider:
+    """A provider that swaps in a freshly built provider (in the background) whenever the catalog version changes.
+
+    A new snapshot is built (and warmed, if the build function does so) on a watcher thread while the current snapshot
+    keeps serving requests. The swap itself is a single reference assignment under a lock. Sessions should pin a
+    snapshot for their whole lifetime (see pin()), so a session never observes a mix of tool / prompt versions. A
+    retired snapshot is released once its last pinned session ends.
+
+    The catalog version can be any callable, e.g., a CatalogVersion over the local catalog files (which polls file
+    stats) or a function that reads the latest catalog version from the catalog bucket. build(version) is given the
+    version it builds a snapshot for: anything in that snapshot that is keyed by version (e.g., a CachingProvider)
+    should use this fixed version, not the live one (which moves on while older snapshots are still pinned).
+    """
+
+    def __init__(
+        self,
+        build: typing.Callable[[str], typing.Any],
+        catalog_version: typing.Callable[[], str],
+        poll_interval: float = 5.0,
+    ):
+        self.build = build
+        self.catalog_version = catalog_version
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._pinned: contextvars.ContextVar[typing.Optional[Snapshot]] = contextvars.ContextVar(
+            "pinned_snapshot", default=None
+        )
+        self._retired: typing.List[Snapshot] = list()
+        self._stop = threading.Event()
+        self._watcher: typing.Optional[threading.Thread] = None
+
+        # Our metrics.
+        self.reloads = 0
+        self.failed_reloads = 0
+        self.last_reload_seconds: typing.Optional[float] = None
+        self.last_reload_rss_delta_bytes: typing.Optional[int] = None
+        self.last_overlap_seconds: typing.Optional[float] = None
+
+        version = self.catalog_version()
+        self._current = Snapshot(version, self.build(version))
+        logger.info(f"Serving catalog version {version}.")
+
+    @property
+    def current(self) -> Snapshot:
+        return self._current
+
+    @property
+    def version(self) -> str:
+        """The catalog version of the snapshot pinned to this context (or of the current snapshot)."""
+        pinned = self._pinned.get()
+        return pinned.version if pinned is not None else self._current.version
+
+    @contextlib.contextmanager
+    def pin(self) -> typing.Iterator[Snapshot]:
+        """Pin the current snapshot to this context (i.e., one session) until the context manager exits."""
+        with self._lock:
+            snapshot = self._current
+            snapshot.sessions += 1
+        token = self._pinned.set(snapshot)
+        try:
+            yield snapshot
+        finally:
+            self._pinned.reset(token)
+            with self._lock:
+                snapshot.sessions -= 1
+                self._release_retired()
+
+    def _release_retired(self) -> None:
+        for snapshot in [x for x in self._retired if x.sessions == 0]:
+            self._retired.remove(snapshot)
+            self.last_overlap_seconds = time.monotonic() - snapshot.retired_at
+            logger.info(
+                f"Released catalog version {snapshot.version} ({self.last_overlap_seconds:.2f}s after it was replaced)."
+            )
+
+    def reload(self, force: bool = False) -> bool:
+        """Build and swap in a new snapshot if the catalog version has changed. Returns True if a swap occurred."""
+        version = self.catalog_version()
+        if not force and version == self._current.version:
+            return False
+
+        logger.info(f"Catalog version changed ({self._current.version} -> {version}). Building a new snapshot.")
+        start_time, start_rss = time.perf_counter(), _rss_bytes()
+        try:
+            snapshot = Snapshot(version, self.build(version))
+        except Exception as e:
+            # A bad catalog should never take down a running server, so we keep serving the current snapshot.
+            logger.error(f"Could not build a snapshot for catalog version {version}: {e}")
+            self.failed_reloads += 1
+            return False
+
+        with self._lock:
+            previous, self._current = self._current, snapshot
+            previous.retired_at = time.monotonic()
+            self._retired.append(previous)
+            self._release_retired()
+            self.reloads += 1
+            self.last_reload_seconds = time.perf_counter() - start_time
+            self.last_reload_rss_delta_bytes = _rss_bytes() - start_rss
+        logger.info(f"Now serving catalog version {version} (built in {self.last_reload_seconds:.2f}s).")
+        return True
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.reload()
+            except Exception as e:
+                logger.error(f"Error while checking for a new catalog version: {e}")
+
+    def start(self) -> None:
+        if self._watcher is not None:
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, name="catalog-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop(self) -> None:
+        if self._watcher is None:
+            return
+        self._stop.set()
+        self._watcher.join()
+        self._watcher = None
+
+    def stats(self) -> typing.Dict[str, typing.Any]:
+        with self._lock:
+            return {
+                "version": self._current.version,
+                "sessions": self._current.sessions,
+                "retired_snapshots": len(self._retired),
+                "retired_sessions": sum(x.sessions for x in self._retired),
+                "reloads": self.reloads,
+                "failed_reloads": self.failed_reloads,
+                "last_reload_seconds": self.last_reload_seconds,
+                "last_reload_rss_delta_bytes": self.last_reload_rss_delta_bytes,
+                "last_overlap_seconds": self.last_overlap_seconds,
+                "rss_bytes": _rss_bytes(),
+            }
+
+    def _provider(self):
+        pinned = self._pinned.get()
+        return pinned.provider if pinned is not None else self._current.provider
+
+    def get_prompt_for(self, query: str = None, name: str = None, annotations: search.AnnotationQuery = None, **kwargs):
+        return self._provider().get_prompt_for(query=query, name=name, annotations=annotations, **kwargs)
+
+    def get_tools_for(
+        self, query: str = None, name: str = None, annotations: search.AnnotationQuery = None, limit: int = 1, **kwargs
+    ):
+        return self._provider().get_tools_for(query=query, name=name, annotations=annotations, limit=limit, **kwargs)
+
+    def __getattr__(self, item):
+        if item in {"_pinned", "_current"}:
+            raise AttributeError(item)
+        return getattr(self._provider(), item)
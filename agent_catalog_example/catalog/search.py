@@ -0,0 +1,178 @@
+import json
+import numpy
+import pathlib
+import re
+import typing
+
+from . import sidecar
+
+# Annotation queries follow the same grammar as agentc: KEY="VALUE" ((AND|OR) KEY="VALUE")*, where AND binds tighter
+# than OR. We also accept dictionaries (a single conjunction) and lists of dictionaries (a disjunction of conjunctions).
+AnnotationQuery = typing.Union[str, typing.Dict[str, str], typing.List[typing.Dict[str, str]]]
+_ANNOTATION_TERM = re.compile(r'\s*(\w+)\s*=\s*"([^"]*)"\s*')
+
+
+def parse_annotations(annotations: AnnotationQuery) -> typing.List[typing.Dict[str, str]]:
+    """Normalize an annotation query into a list of disjuncts (where each disjunct is a conjunction of key/values)."""
+    if isinstance(annotations, dict):
+        return [annotations]
+    elif isinstance(annotations, list):
+        return annotations
+
+    disjuncts = list()
+    for disjunct_text in re.split(r"\s+OR\s+", annotations.strip()):
+        disjunct = dict()
+        for term_text in re.split(r"\s+AND\s+", disjunct_text):
+            term = _ANNOTATION_TERM.fullmatch(term_text)
+            if term is None:
+                raise ValueError(f"Malformed annotation term '{term_text}' in query '{annotations}'!")
+            disjunct[term.group(1)] = term.group(2)
+        disjuncts.append(disjunct)
+    return disjuncts
+
+
+class SearchResult(typing.NamedTuple):
+    item: typing.Dict
+    score: float
+
+
+class CatalogIndex:
+    """An in-memory search engine over the items of a local catalog file.
+
+    All embeddings live in one L2-normalized float32 matrix (so cosine similarity is a single matrix product), and all
+    annotations live in an inverted index of (key, value) -> sorted row numbers. Annotation filters are resolved
+    against the inverted index first, so we only score the rows that can actually be returned. Vectors that are already
+    normalized (e.g., a memory-mapped sidecar) are used as-is.
+
+    Item names must be unique, as our providers fetch the items we find by name.
+    """
+
+    def __init__(
+        self,
+        items: typing.List[typing.Dict],
+        vectors: numpy.ndarray,
+        embedding_model: str = None,
+        normalized: bool = False,
+    ):
+        if len(items) != vectors.shape[0]:
+            raise ValueError(f"Expected {len(items)} vectors, but got {vectors.shape[0]}!")
+        duplicates = duplicate_names(items)
+        if len(duplicates) > 0:
+            raise ValueError(f"Catalog item names must be unique, but found duplicates: {duplicates}!")
+        self.items = items
+        self.embedding_model = embedding_model
+
+        # Normalize once here instead of on every query.
+        if normalized and vectors.dtype == numpy.float32:
+            self.vectors = vectors
+        else:
+            self.vectors = numpy.array(vectors, dtype=numpy.float32, copy=True)
+            norms = numpy.linalg.norm(self.vectors, axis=1, keepdims=True)
+            norms[norms == 0] = 1
+            self.vectors /= norms
+
+        # Build our inverted index over the item annotations.
+        postings: typing.Dict[typing.Tuple[str, str], typing.List[int]] = dict()
+        for row, item in enumerate(items):
+            for key, value in _item_annotations(item).items():
+                postings.setdefault((key, str(value)), list()).append(row)
+        self.postings = {k: numpy.array(v, dtype=numpy.int64) for k, v in postings.items()}
+
+    @classmethod
+    def from_catalog(cls, catalog_file: pathlib.Path) -> "CatalogIndex":
+        # Prefer our (memory-mapped) sidecar if it is fresh: we then never read the embeddings out of the JSON.
+        embeddings = sidecar.load_sidecar(catalog_file)
+        if embeddings is not None and embeddings.meta.normalized:
+            items = embeddings.items()
+            if items is not None and len(items) == embeddings.meta.count:
+                return cls(
+                    items=items,
+                    vectors=embeddings.vectors,
+                    embedding_model=embeddings.meta.embedding_model,
+                    normalized=True,
+                )
+
+        # Otherwise, we parse the embeddings out of the JSON (see 'python -m agent_catalog_example.catalog.sidecar').
+        with catalog_file.open("r") as fp:
+            catalog = json.load(fp)
+        vectors = numpy.array(
+            [sidecar.parse_embedding(item.pop("embedding")) for item in catalog["items"]], dtype=numpy.float32
+        ).reshape(len(catalog["items"]), -1)
+        return cls(items=catalog["items"], vectors=vectors, embedding_model=catalog.get("embedding_model"))
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def candidates(self, annotations: AnnotationQuery = None) -> typing.Optional[numpy.ndarray]:
+        """Return the (sorted) rows that satisfy the given annotation query, or None if there is no filter."""
+        if annotations is None:
+            return None
+        rows = numpy.empty(0, dtype=numpy.int64)
+        for disjunct in parse_annotations(annotations):
+            disjunct_rows = None
+            for key, value in disjunct.items():
+                term_rows = self.postings.get((key, str(value)), numpy.empty(0, dtype=numpy.int64))
+                if disjunct_rows is None:
+                    disjunct_rows = term_rows
+                else:
+                    disjunct_rows = numpy.intersect1d(disjunct_rows, term_rows, assume_unique=True)
+                if len(disjunct_rows) == 0:
+                    break
+            if disjunct_rows is not None:
+                rows = numpy.union1d(rows, disjunct_rows)
+        return rows
+
+    def search_vectors(
+        self, queries: numpy.ndarray, annotations: AnnotationQuery = None, limit: int = 1
+    ) -> typing.List[typing.List[SearchResult]]:
+        """Return the top-limit items for each query vector (i.e., each row of queries)."""
+        queries = numpy.atleast_2d(numpy.asarray(queries, dtype=numpy.float32))
+        norms = numpy.linalg.norm(queries, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        queries = queries / norms
+
+        rows = self.candidates(annotations)
+        matrix = self.vectors if rows is None else self.vectors[rows]
+        if matrix.shape[0] == 0:
+            return [list() for _ in range(queries.shape[0])]
+
+        # One (Q x D) @ (D x N) product scores every query against every candidate.
+        scores = queries @ matrix.T
+        k = matrix.shape[0] if limit is None or limit <= 0 else min(limit, matrix.shape[0])
+        if k < matrix.shape[0]:
+            top = numpy.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = numpy.broadcast_to(numpy.arange(matrix.shape[0]), (queries.shape[0], matrix.shape[0]))
+        results = list()
+        for i in range(queries.shape[0]):
+            ordered = top[i][numpy.argsort(-scores[i, top[i]], kind="stable")]
+            results.append(
+                [
+                    SearchResult(item=self.items[j if rows is None else rows[j]], score=float(scores[i, j]))
+                    for j in ordered
+                ]
+            )
+        return results
+
+    def search(
+        self,
+        query_vector: numpy.ndarray,
+        annotations: AnnotationQuery = None,
+        limit: int = 1,
+    ) -> typing.List[SearchResult]:
+        return self.search_vectors(query_vector, annotations=annotations, limit=limit)[0]
+
+
+def duplicate_names(items: typing.Iterable[typing.Dict]) -> typing.Dict[str, typing.List[str]]:
+    """Return the names that more than one item shares (mapped to the sources of those items)."""
+    sources = dict()
+    for item in items:
+        sources.setdefault(item["name"], list()).append(item.get("source", item.get("identifier")))
+    return {name: x for name, x in sources.items() if len(x) > 1}
+
+
+def _item_annotations(item: typing.Dict) -> typing.Dict[str, str]:
+    annotations = item.get("annotations")
+    if isinstance(annotations, str):
+        annotations = json.loads(annotations)
+    return annotations or dict()
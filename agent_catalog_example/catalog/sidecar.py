@@ -0,0 +1,194 @@
+import hashlib
+import json
+import logging
+import numpy
+import os
+import pathlib
+import pydantic
+import sys
+import typing
+
+logger = logging.getLogger(__name__)
+
+# Every local catalog file (e.g., tool-catalog.json) can be paired with the following "sidecar" files:
+# 1. <stem>.vectors.npy -- an (N x D) float32 matrix, where row i holds the (L2-normalized) embedding of catalog item i.
+# 2. <stem>.ids.npy -- an (N,) fixed-width byte array, where row i holds the (UTF-8) identifier of catalog item i.
+# 3. <stem>.items.json -- the catalog items (in row order) without their embeddings.
+# 4. <stem>.meta.json -- a small JSON document describing the files above (written last).
+# Both .npy files are memory-mapped on load, so opening a sidecar costs the same for 10 items as for 50,000 items.
+# Vectors are normalized when they are written, so searches can use the memory-mapped matrix as-is (without a copy).
+CATALOG_FILES = ["tool-catalog.json", "prompt-catalog.json"]
+
+
+class SidecarMeta(pydantic.BaseModel):
+    embedding_model: str
+    count: int
+    dims: int
+
+    # The version of the catalog these vectors were taken from (copied verbatim from the catalog file).
+    version: typing.Optional[dict] = None
+
+    # Sidecars written before we normalized their vectors (or wrote their items) must be rebuilt to be used as-is.
+    normalized: bool = False
+    has_items: bool = False
+
+    # We use these to decide whether our sidecar is still in sync with its catalog file.
+    source_size: int
+    source_mtime_ns: int
+    source_sha256: str
+
+
+class EmbeddingSidecar:
+    def __init__(
+        self, vectors: numpy.ndarray, identifiers: numpy.ndarray, meta: SidecarMeta, items_path: pathlib.Path = None
+    ):
+        self.vectors = vectors
+        self.identifiers = identifiers
+        self.meta = meta
+        self.items_path = items_path
+        self._rows = None
+
+    def __len__(self) -> int:
+        return self.meta.count
+
+    def identifier(self, row: int) -> str:
+        return self.identifiers[row].decode("utf-8")
+
+    def row(self, identifier: str) -> int:
+        # The identifier -> row map is only built if someone asks for it.
+        if self._rows is None:
+            self._rows = {self.identifier(i): i for i in range(len(self))}
+        return self._rows[identifier]
+
+    def vector(self, identifier: str) -> numpy.ndarray:
+        return self.vectors[self.row(identifier)]
+
+    def items(self) -> typing.Optional[typing.List[typing.Dict]]:
+        """Return the catalog items (without their embeddings), or None if this sidecar does not hold them."""
+        if not self.meta.has_items:
+            return None
+        with self.items_path.open("r") as fp:
+            return json.load(fp)
+
+
+def sidecar_paths(catalog_file: pathlib.Path) -> typing.Tuple[pathlib.Path, pathlib.Path, pathlib.Path]:
+    return (
+        catalog_file.with_name(catalog_file.stem + ".vectors.npy"),
+        catalog_file.with_name(catalog_file.stem + ".ids.npy"),
+        catalog_file.with_name(catalog_file.stem + ".meta.json"),
+    )
+
+
+def items_path(catalog_file: pathlib.Path) -> pathlib.Path:
+    return catalog_file.with_name(catalog_file.stem + ".items.json")
+
+
+def _file_sha256(path: pathlib.Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as fp:
+        for block in iter(lambda: fp.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def parse_embedding(embedding: typing.Union[str, typing.List[float]]) -> typing.List[float]:
+    # Some catalog files store the embedding as a JSON string instead of a JSON array.
+    return json.loads(embedding) if isinstance(embedding, str) else embedding
+
+
+def write_sidecar(catalog_file: pathlib.Path) -> SidecarMeta:
+    """Build the sidecar files for the given catalog file."""
+    with catalog_file.open("r") as fp:
+        catalog = json.load(fp)
+    items = catalog["items"]
+    count = len(items)
+    dims = len(parse_embedding(items[0]["embedding"])) if count > 0 else 0
+    width = max((len(item["identifier"].encode("utf-8")) for item in items), default=1)
+
+    # Write to temporary files first, then move everything into place (so readers never see a partial sidecar).
+    vectors_path, ids_path, meta_path = sidecar_paths(catalog_file)
+    vectors_temp = vectors_path.with_name(vectors_path.name + ".tmp")
+    ids_temp = ids_path.with_name(ids_path.name + ".tmp")
+    vectors = numpy.lib.format.open_memmap(vectors_temp, mode="w+", dtype=numpy.float32, shape=(count, dims))
+    identifiers = numpy.lib.format.open_memmap(ids_temp, mode="w+", dtype=f"S{width}", shape=(count,))
+    for i, item in enumerate(items):
+        embedding = numpy.asarray(parse_embedding(item["embedding"]), dtype=numpy.float32)
+        if len(embedding) != dims:
+            raise ValueError(f"Item {item['identifier']} has {len(embedding)} dimensions (expected {dims})!")
+        norm = numpy.linalg.norm(embedding)
+        vectors[i] = embedding / norm if norm > 0 else embedding
+        identifiers[i] = item["identifier"].encode("utf-8")
+    vectors.flush()
+    identifiers.flush()
+    del vectors, identifiers
+    items_temp = items_path(catalog_file).with_name(items_path(catalog_file).name + ".tmp")
+    with items_temp.open("w") as fp:
+        json.dump([{k: v for k, v in item.items() if k != "embedding"} for item in items], fp)
+
+    stat = catalog_file.stat()
+    meta = SidecarMeta(
+        embedding_model=catalog["embedding_model"],
+        count=count,
+        dims=dims,
+        version=catalog.get("version"),
+        normalized=True,
+        has_items=True,
+        source_size=stat.st_size,
+        source_mtime_ns=stat.st_mtime_ns,
+        source_sha256=_file_sha256(catalog_file),
+    )
+    os.replace(vectors_temp, vectors_path)
+    os.replace(ids_temp, ids_path)
+    os.replace(items_temp, items_path(catalog_file))
+    meta_temp = meta_path.with_name(meta_path.name + ".tmp")
+    with meta_temp.open("w") as fp:
+        fp.write(meta.model_dump_json(indent=2))
+        fp.write("\n")
+    os.replace(meta_temp, meta_path)
+    return meta
+
+
+def is_fresh(catalog_file: pathlib.Path, meta: SidecarMeta) -> bool:
+    """Return True if the sidecar described by meta was built from the current contents of catalog_file."""
+    stat = catalog_file.stat()
+    if stat.st_size != meta.source_size:
+        return False
+    if stat.st_mtime_ns == meta.source_mtime_ns:
+        return True
+
+    # A checkout (or a touch) changes the mtime without changing the content, so we fall back to the digest here.
+    return _file_sha256(catalog_file) == meta.source_sha256
+
+
+def load_sidecar(catalog_file: pathlib.Path, check_freshness: bool = True) -> typing.Optional[EmbeddingSidecar]:
+    """Memory-map the sidecar of the given catalog file. Returns None if no (fresh) sidecar exists."""
+    vectors_path, ids_path, meta_path = sidecar_paths(catalog_file)
+    if not meta_path.exists():
+        return None
+    with meta_path.open("r") as fp:
+        meta = SidecarMeta.model_validate_json(fp.read())
+    if check_freshness and catalog_file.exists() and not is_fresh(catalog_file, meta):
+        logger.warning(f"Sidecar for {catalog_file} is stale. Rebuild it with 'python -m {__name__}'.")
+        return None
+
+    vectors = numpy.load(vectors_path, mmap_mode="r")
+    identifiers = numpy.load(ids_path, mmap_mode="r")
+    if vectors.shape != (meta.count, meta.dims) or identifiers.shape != (meta.count,):
+        raise ValueError(f"Sidecar for {catalog_file} does not match its metadata!")
+    return EmbeddingSidecar(vectors=vectors, identifiers=identifiers, meta=meta, items_path=items_path(catalog_file))
+
+
+def write_sidecars(catalog_dir: pathlib.Path) -> typing.Dict[str, SidecarMeta]:
+    written = dict()
+    for catalog_name in CATALOG_FILES:
+        catalog_file = catalog_dir / catalog_name
+        if catalog_file.exists():
+            written[catalog_name] = write_sidecar(catalog_file)
+    return written
+
+
+if __name__ == "__main__":
+    # Usage: python -m agent_catalog_example.catalog.sidecar [CATALOG_DIR] (run this after 'agentc index').
+    _catalog_dir = pathlib.Path(sys.argv[1] if len(sys.argv) > 1 else ".agent-catalog")
+    for _name, _meta in write_sidecars(_catalog_dir).items():
+        print(f"Wrote sidecar for {_name}: {_meta.count} items x {_meta.dims} dims ({_meta.embedding_model}).")
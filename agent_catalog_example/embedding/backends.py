@@ -0,0 +1,159 @@
+import contextlib
+import contextvars
+import functools
+import logging
+import numpy
+import pathlib
+import threading
+import typing
+import yaml
+
+logger = logging.getLogger(__name__)
+
+# How a model is run on the CPU: as-is (PyTorch), exported to ONNX Runtime, or with int8 (dynamically quantized) linear
+# layers. Both 'onnx' and 'int8' trade some accuracy for encode throughput.
+BACKENDS = {"torch", "onnx", "int8"}
+
+
+class EncoderSpec(typing.NamedTuple):
+    """Which encoder to use, written as '[backend:]model[@dims]' wherever we name an embedding model.
+
+    For example, 'sentence-transformers/all-MiniLM-L12-v2' (our default: PyTorch, all 384 dimensions),
+    'onnx:sentence-transformers/all-MiniLM-L6-v2', or 'int8:mixedbread-ai/mxbai-embed-xsmall-v1@256' (the latter
+    truncates the embeddings of a Matryoshka model to their first 256 dimensions). Documents and queries of one vector
+    index must be encoded with the same spec.
+    """
+
+    model: str
+    backend: str = "torch"
+    dims: typing.Optional[int] = None
+
+    @staticmethod
+    def parse(spec: str) -> "EncoderSpec":
+        backend, model, dims = "torch", spec.strip(), None
+        if ":" in model:
+            backend, model = model.split(":", 1)
+        if "@" in model:
+            model, dims = model.rsplit("@", 1)
+            dims = int(dims)
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown embedding backend '{backend}' in '{spec}' (expected one of {BACKENDS}).")
+        return EncoderSpec(model=model, backend=backend, dims=dims)
+
+    def __str__(self) -> str:
+        prefix = f"{self.backend}:" if self.backend != "torch" else ""
+        suffix = f"@{self.dims}" if self.dims is not None else ""
+        return f"{prefix}{self.model}{suffix}"
+
+
+class Encoder:
+    """A loaded SentenceTransformer model behind an EncoderSpec, producing float32 embeddings of spec.dims dimensions."""
+
+    def __init__(self, spec: EncoderSpec, model):
+        self.spec = spec
+        self.model = model
+        model_dims = model.get_sentence_embedding_dimension()
+        if spec.dims is not None and spec.dims > model_dims:
+            raise ValueError(f"Cannot truncate {spec.model} embeddings ({model_dims} dimensions) to {spec.dims}.")
+        self.dims = spec.dims if spec.dims is not None else model_dims
+
+    @property
+    def tokenizer(self):
+        return self.model.tokenizer
+
+    def encode(self, texts: typing.List[str], batch_size: int = 32) -> numpy.ndarray:
+        vectors = numpy.asarray(self.model.encode(texts, batch_size=batch_size), dtype=numpy.float32)
+        if self.spec.dims is not None:
+            # A truncated (Matryoshka) embedding is re-normalized, so that dot products are still cosine similarities.
+            vectors = vectors[:, : self.spec.dims]
+            vectors /= numpy.maximum(numpy.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors
+
+    def __call__(self, texts: typing.List[str]) -> numpy.ndarray:
+        return self.encode(texts)
+
+
+@functools.lru_cache
+def load_encoder(spec: typing.Union[str, EncoderSpec]) -> Encoder:
+    """Load (once per process) the encoder for spec."""
+    import sentence_transformers
+
+    spec = EncoderSpec.parse(spec) if isinstance(spec, str) else spec
+    kwargs = {"tokenizer_kwargs": {"clean_up_tokenization_spaces": True}}
+    match spec.backend:
+        case "torch":
+            model = sentence_transformers.SentenceTransformer(spec.model, **kwargs)
+        case "onnx":
+            # This requires sentence-transformers>=3.2 and optimum[onnxruntime] (the model is exported if needed).
+            model = sentence_transformers.SentenceTransformer(spec.model, backend="onnx", **kwargs)
+        case "int8":
+            import torch
+
+            model = sentence_transformers.SentenceTransformer(spec.model, device="cpu", **kwargs)
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    logger.debug(f"Loaded encoder {spec}.")
+    return Encoder(spec, model)
+
+
+# The SentenceTransformer models loaded within shared_sentence_transformers(), by their (repr'ed) arguments.
+_shared_models: typing.Dict[str, typing.Any] = dict()
+_shared_models_lock = threading.RLock()
+_sharing_models: contextvars.ContextVar[bool] = contextvars.ContextVar("sharing_models", default=False)
+
+
+def _sharing_class(factory: type) -> type:
+    # A stand-in for the SentenceTransformer class that only shares models with the context that is sharing them. For
+    # everyone else (e.g., other threads), it builds models and passes isinstance / issubclass checks like the original.
+    class _SharingMeta(type(factory)):
+        def __call__(cls, *args, **kwargs):
+            if not _sharing_models.get():
+                return factory(*args, **kwargs)
+            key = repr((args, sorted(kwargs.items())))
+            with _shared_models_lock:
+                if key not in _shared_models:
+                    _shared_models[key] = factory(*args, **kwargs)
+                else:
+                    logger.debug(f"Reusing SentenceTransformer{args}.")
+                return _shared_models[key]
+
+        def __instancecheck__(cls, instance):
+            return isinstance(instance, factory)
+
+        def __subclasscheck__(cls, subclass):
+            return issubclass(subclass, factory)
+
+    return _SharingMeta(factory.__name__, (factory,), {"__module__": factory.__module__, "__doc__": factory.__doc__})
+
+
+@contextlib.contextmanager
+def shared_sentence_transformers() -> typing.Iterator[None]:
+    """Within this context, SentenceTransformer(...) returns the model loaded by the first call with the same arguments.
+
+    Libraries that load their own model whenever they are built (e.g., the embedding model of an agentc.Provider) then
+    load it once per process, instead of once per build. Only this context (i.e., the thread or task that entered it)
+    shares models: while it is open, SentenceTransformer is a subclass that builds a fresh model (and passes isinstance
+    checks) everywhere else.
+    """
+    import sentence_transformers
+
+    with _shared_models_lock:
+        factory = sentence_transformers.SentenceTransformer
+        sentence_transformers.SentenceTransformer = _sharing_class(factory)
+        token = _sharing_models.set(True)
+        try:
+            yield
+        finally:
+            _sharing_models.reset(token)
+            sentence_transformers.SentenceTransformer = factory
+
+
+def embedding_dims(spec: typing.Union[str, EncoderSpec]) -> int:
+    """Return the number of dimensions of spec's embeddings (i.e., the 'dims' of a vector index built over them)."""
+    spec = EncoderSpec.parse(spec) if isinstance(spec, str) else spec
+    return spec.dims if spec.dims is not None else load_encoder(spec).dims
+
+
+def tool_embedding_model(tool_file: typing.Union[str, pathlib.Path]) -> str:
+    """Return the encoder spec (i.e., the 'embedding_model') of a semantic_search tool's YAML file."""
+    with pathlib.Path(tool_file).open("r") as fp:
+        return yaml.safe_load(fp)["vector_search"]["embedding_model"]
@@ -0,0 +1,166 @@
+import concurrent.futures
+import logging
+import numpy
+import os
+import queue
+import threading
+import time
+import typing
+
+from . import backends
+
+logger = logging.getLogger(__name__)
+
+# The defaults for our shared (per-model) services. By default we do not wait for a batch to fill up: under load, the
+# next batch forms while the current one is being encoded, and an idle service should not add latency to a lone query.
+DEFAULT_MAX_BATCH_SIZE = 64
+DEFAULT_MAX_WAIT = 0.0
+
+
+class _Request(typing.NamedTuple):
+    texts: typing.List[str]
+    future: concurrent.futures.Future
+
+
+class EmbeddingService:
+    """Encodes the texts of many concurrent callers in dynamic micro-batches, using one background worker thread.
+
+    Callers submit() texts and get a future back (or call encode(), which waits on it). The worker takes the first
+    queued request, then keeps collecting requests until max_batch_size texts are queued or max_wait seconds have
+    passed, and encodes the whole batch (with duplicate texts removed) in one call. Under load, the next batch fills up
+    while the current one is being encoded, so batches grow with the number of concurrent callers.
+    The worker is started lazily (and restarted in a forked child), so a service can be created before forking.
+    """
+
+    def __init__(
+        self,
+        encode: typing.Callable[[typing.List[str]], numpy.ndarray],
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        max_wait: float = DEFAULT_MAX_WAIT,
+        name: str = "embedding",
+    ):
+        self._encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.name = name
+        self._queue: typing.Optional[queue.SimpleQueue] = None
+        self._thread: typing.Optional[threading.Thread] = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+        # Our metrics.
+        self.requests = 0
+        self.batches = 0
+        self.texts = 0
+        self.encoded = 0
+        self.max_batch = 0
+        self.seconds = 0.0
+
+    def _ensure_started(self) -> queue.SimpleQueue:
+        if self._pid == os.getpid():
+            return self._queue
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.SimpleQueue()
+                self._thread = threading.Thread(target=self._run, args=(self._queue,), name=self.name, daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+            return self._queue
+
+    def submit(self, texts: typing.List[str]) -> concurrent.futures.Future:
+        """Queue texts for encoding, returning a future of their (len(texts), dims) float32 embeddings."""
+        future = concurrent.futures.Future()
+        self._ensure_started().put(_Request(list(texts), future))
+        return future
+
+    def encode(self, texts: typing.List[str]) -> numpy.ndarray:
+        return self.submit(texts).result()
+
+    def __call__(self, texts: typing.List[str]) -> numpy.ndarray:
+        return self.encode(texts)
+
+    def _run(self, requests: queue.SimpleQueue) -> None:
+        while True:
+            request = requests.get()
+            if request is None:
+                return
+            batch, size = [request], len(request.texts)
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch_size:
+                # Past the deadline, we only take what is already queued.
+                timeout = deadline - time.monotonic()
+                try:
+                    request = requests.get(timeout=timeout) if timeout > 0 else requests.get_nowait()
+                except queue.Empty:
+                    break
+                if request is None:
+                    self._flush(batch)
+                    return
+                batch.append(request)
+                size += len(request.texts)
+            self._flush(batch)
+
+    def _flush(self, batch: typing.List[_Request]) -> None:
+        batch = [x for x in batch if x.future.set_running_or_notify_cancel()]
+        if len(batch) == 0:
+            return
+        unique = list(dict.fromkeys(text for request in batch for text in request.texts))
+        start_time = time.perf_counter()
+        try:
+            vectors = numpy.asarray(self._encode(unique), dtype=numpy.float32).reshape(len(unique), -1)
+        except Exception as e:
+            for request in batch:
+                request.future.set_exception(e)
+            return
+        finally:
+            self.seconds += time.perf_counter() - start_time
+            self.requests += len(batch)
+            self.batches += 1
+            self.texts += sum(len(x.texts) for x in batch)
+            self.encoded += len(unique)
+            self.max_batch = max(self.max_batch, len(unique))
+
+        rows = {text: i for i, text in enumerate(unique)}
+        for request in batch:
+            request.future.set_result(vectors[[rows[x] for x in request.texts]])
+
+    def close(self) -> None:
+        with self._lock:
+            if self._pid == os.getpid():
+                self._queue.put(None)
+                self._thread.join()
+            self._pid = None
+
+    def stats(self) -> typing.Dict[str, typing.Any]:
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "mean_batch_size": self.encoded / self.batches if self.batches > 0 else None,
+            "max_batch_size": self.max_batch,
+            "duplicates_removed": self.texts - self.encoded,
+            "encode_seconds": self.seconds,
+        }
+
+
+_services: typing.Dict[str, EmbeddingService] = dict()
+_services_lock = threading.Lock()
+
+
+def shared_service(embedding_model: str) -> EmbeddingService:
+    """Return the process-wide EmbeddingService for an encoder spec (all query encoders of a process share these)."""
+    with _services_lock:
+        if embedding_model not in _services:
+            encoder = backends.load_encoder(embedding_model)
+            _services[embedding_model] = EmbeddingService(encoder.encode, name=f"embedding-{embedding_model}")
+        return _services[embedding_model]
+
+
+def stats() -> typing.Dict[str, typing.Dict[str, typing.Any]]:
+    return {name: service.stats() for name, service in _services.items()}
+
+
+def stop_workers() -> None:
+    """Stop the worker threads of all shared services (e.g., before forking). Each one restarts on its next request."""
+    with _services_lock:
+        for service in _services.values():
+            service.close()
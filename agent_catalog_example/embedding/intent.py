@@ -0,0 +1,123 @@
+import logging
+import numpy
+import pathlib
+import typing
+import yaml
+
+from . import backends
+
+logger = logging.getLogger(__name__)
+
+# By default, a decision is only ours if its nearest centroid is at least this similar to the text, and at least this
+# much more similar than the runner-up. Anything else is deferred (i.e., left to the LLM).
+DEFAULT_MIN_SCORE = 0.35
+DEFAULT_MIN_MARGIN = 0.08
+
+
+class Decision(typing.NamedTuple):
+    label: typing.Any
+    score: float
+    margin: float
+    confident: bool
+
+    def audit(self, router: str, text: str) -> typing.Dict[str, typing.Any]:
+        """Return the (JSON) content we give our auditor for this decision."""
+        return {
+            "router": router,
+            "text": text,
+            "label": self.label,
+            "score": round(self.score, 4),
+            "margin": round(self.margin, 4),
+            "route": "local" if self.confident else "llm",
+        }
+
+
+class IntentClassifier:
+    """A nearest-centroid classifier over the embeddings of labelled examples, used to route requests without an LLM.
+
+    Each label's centroid is the (re-normalized) mean of its example embeddings, so classifying a text costs one encode
+    and one (tiny) matrix product. Decisions that are not confident (see Decision) should be deferred to the LLM.
+    """
+
+    def __init__(
+        self,
+        encoder: typing.Callable[[typing.List[str]], numpy.ndarray],
+        examples: typing.Dict[typing.Any, typing.List[str]],
+        min_score: float = DEFAULT_MIN_SCORE,
+        min_margin: float = DEFAULT_MIN_MARGIN,
+    ):
+        if len(examples) < 2 or any(len(x) == 0 for x in examples.values()):
+            raise ValueError("An intent classifier needs (at least) two labels, each with at least one example!")
+        self.encoder = encoder
+        self.labels = list(examples.keys())
+        self.min_score = min_score
+        self.min_margin = min_margin
+
+        centroids = list()
+        for texts in examples.values():
+            vectors = _normalized(numpy.asarray(encoder(texts), dtype=numpy.float32))
+            centroids.append(vectors.mean(axis=0))
+        self.centroids = _normalized(numpy.stack(centroids))
+
+    def scores(self, texts: typing.List[str]) -> numpy.ndarray:
+        return _normalized(numpy.asarray(self.encoder(texts), dtype=numpy.float32)) @ self.centroids.T
+
+    def classify(self, text: str) -> Decision:
+        scores = self.scores([text])[0]
+        first, second = numpy.argsort(-scores)[:2]
+        score, margin = float(scores[first]), float(scores[first] - scores[second])
+        return Decision(
+            label=self.labels[first],
+            score=score,
+            margin=margin,
+            confident=score >= self.min_score and margin >= self.min_margin,
+        )
+
+
+class IntentRouter(typing.NamedTuple):
+    """One routing decision of an agent: the question we ask the user, and the classifier we give their answer to."""
+
+    name: str
+    question: str
+    classifier: IntentClassifier
+
+
+def prompt_description(prompts_dir: typing.Union[str, pathlib.Path], name: str) -> str:
+    with (pathlib.Path(prompts_dir) / f"{name}.prompt").open("r") as fp:
+        _, front_matter, _ = fp.read().split("---", 2)
+    return yaml.safe_load(front_matter)["description"]
+
+
+def load_routers(
+    routers_file: typing.Union[str, pathlib.Path], prompts_dir: typing.Union[str, pathlib.Path] = None
+) -> typing.Dict[str, IntentRouter]:
+    """Build the routers described in a YAML file of labelled examples (see src/resources/agent_c/intents.yaml).
+
+    A label may name the prompt its requests are handed to, in which case the description of that prompt (in
+    prompts_dir) is used as one more example of the label.
+    """
+    with pathlib.Path(routers_file).open("r") as fp:
+        spec = yaml.safe_load(fp)
+    encoder = backends.load_encoder(spec["embedding_model"])
+
+    routers = dict()
+    for name, router in spec["routers"].items():
+        examples = dict()
+        for label in router["labels"]:
+            texts = list(label.get("examples", list()))
+            if label.get("prompt") is not None and prompts_dir is not None:
+                texts.append(prompt_description(prompts_dir, label["prompt"]))
+            examples[label["label"]] = texts
+        classifier = IntentClassifier(
+            encoder,
+            examples,
+            min_score=router.get("min_score", DEFAULT_MIN_SCORE),
+            min_margin=router.get("min_margin", DEFAULT_MIN_MARGIN),
+        )
+        routers[name] = IntentRouter(name=name, question=router["question"], classifier=classifier)
+        logger.debug(f"Built intent router {name} over {len(examples)} labels.")
+    return routers
+
+
+def _normalized(vectors: numpy.ndarray) -> numpy.ndarray:
+    return vectors / numpy.maximum(numpy.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
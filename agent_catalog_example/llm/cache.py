@@ -0,0 +1,391 @@
+import contextlib
+import datetime
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import tempfile
+import threading
+import time
+import typing
+
+logger = logging.getLogger(__name__)
+
+# The defaults of our response caches (an entry lives for a day, and the disk backend holds at most this much).
+DEFAULT_TTL = 86400.0
+DEFAULT_MAX_ENTRIES = 10_000
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_MAX_ENTRY_BYTES = 1024 * 1024
+
+
+def canonical_messages(messages: typing.List) -> typing.List[typing.Dict[str, typing.Any]]:
+    """Return the parts of LangChain messages that determine a generation (e.g., not their ids or token usage).
+
+    Tool call ids are chosen by the model, so they differ between otherwise identical conversations. We renumber them
+    in order of appearance (an AI message's tool calls and the tool messages that answer them keep matching ids).
+    """
+    ids: typing.Dict[str, str] = dict()
+
+    def _id(tool_call_id: str) -> str:
+        return ids.setdefault(tool_call_id, f"call_{len(ids)}")
+
+    canonical = list()
+    for message in messages:
+        entry = {"type": message.type, "content": message.content}
+        if getattr(message, "name", None) is not None:
+            entry["name"] = message.name
+        if getattr(message, "tool_calls", None):
+            entry["tool_calls"] = [
+                {"name": x["name"], "args": x["args"], "id": _id(x.get("id"))} for x in message.tool_calls
+            ]
+        if getattr(message, "tool_call_id", None) is not None:
+            entry["tool_call_id"] = _id(message.tool_call_id)
+        canonical.append(entry)
+    return canonical
+
+
+def cache_key(
+    model: str, catalog_version: str, messages: typing.List, stop: typing.Optional[typing.List[str]], **kwargs
+) -> str:
+    """Hash everything a (deterministic) generation depends on: the model, our prompts / tools (i.e., the catalog
+    version), the conversation, and the request options (e.g., the tools bound to the model, in their JSON schema)."""
+    canonical = {
+        "model": model,
+        "catalog_version": catalog_version,
+        "messages": canonical_messages(messages),
+        "stop": stop,
+        "options": kwargs,
+    }
+    text = json.dumps(canonical, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def dump_result(result) -> typing.Dict[str, typing.Any]:
+    """Serialize a LangChain ChatResult to JSON (without its token usage, which a cache hit does not incur)."""
+    import langchain_core.messages
+
+    def _message_to_dict(message) -> typing.Dict[str, typing.Any]:
+        # Streamed generations hold their token usage on their message.
+        serialized = langchain_core.messages.message_to_dict(message)
+        if "usage_metadata" in serialized["data"]:
+            serialized["data"]["usage_metadata"] = None
+        return serialized
+
+    return {
+        "created": time.time(),
+        "generations": [
+            {
+                "message": _message_to_dict(x.message),
+                "generation_info": x.generation_info,
+            }
+            for x in result.generations
+        ],
+        "llm_output": {k: v for k, v in (result.llm_output or dict()).items() if k != "token_usage"},
+    }
+
+
+def load_result(entry: typing.Dict[str, typing.Any]):
+    import langchain_core.messages
+    import langchain_core.outputs
+
+    generations = [
+        langchain_core.outputs.ChatGeneration(
+            message=langchain_core.messages.messages_from_dict([x["message"]])[0],
+            generation_info=x["generation_info"],
+        )
+        for x in entry["generations"]
+    ]
+    return langchain_core.outputs.ChatResult(
+        generations=generations, llm_output={**entry["llm_output"], "cached": True}
+    )
+
+
+class CacheStats:
+    # Our caches are read and written by the tasks of many sessions (i.e., threads) at once.
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.oversized = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self) -> typing.Dict[str, int]:
+        with self._lock:
+            return {k: v for k, v in vars(self).items() if not k.startswith("_")}
+
+
+class DiskResponseCache:
+    """A response cache of JSON files (one per key) in a local directory, bounded by a TTL, a number of entries, and a
+    total size in bytes. When either bound is exceeded, the least recently used entries (by mtime, which a hit
+    refreshes) are removed until we are back under 90% of both bounds.
+    """
+
+    def __init__(
+        self,
+        directory: typing.Union[str, pathlib.Path],
+        ttl: float = DEFAULT_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        self.directory = pathlib.Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.counters = CacheStats()
+        self._lock = threading.Lock()
+        files = list(self._files())
+        self._entries = len(files)
+        self._bytes = sum(x.stat().st_size for x in files)
+
+    def _files(self) -> typing.Iterable[pathlib.Path]:
+        return self.directory.glob("*/*.json")
+
+    def _path(self, key: str) -> pathlib.Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _remove(self, path: pathlib.Path) -> None:
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except FileNotFoundError:
+            return
+        self._entries -= 1
+        self._bytes -= size
+
+    def get(self, key: str) -> typing.Optional[typing.Dict[str, typing.Any]]:
+        path = self._path(key)
+        try:
+            with path.open("r") as fp:
+                entry = json.load(fp)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.counters.count("misses")
+            return None
+        if entry["created"] + self.ttl < time.time():
+            with self._lock:
+                self._remove(path)
+                self.counters.count("expirations")
+                self.counters.count("misses")
+            return None
+        with contextlib.suppress(FileNotFoundError):
+            # A hit makes this entry the most recently used (unless it was evicted in the meantime).
+            os.utime(path)
+        self.counters.count("hits")
+        return entry
+
+    def put(self, key: str, entry: typing.Dict[str, typing.Any]) -> None:
+        data = json.dumps(entry).encode("utf-8")
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        with self._lock:
+            self._remove(path)
+            # Readers never see a partially written entry.
+            with tempfile.NamedTemporaryFile(dir=path.parent, suffix=".tmp", delete=False) as fp:
+                fp.write(data)
+            os.replace(fp.name, path)
+            self._entries += 1
+            self._bytes += len(data)
+            self.counters.count("stores")
+            if self._entries > self.max_entries or self._bytes > self.max_bytes:
+                self._trim()
+
+    def _trim(self) -> None:
+        files = sorted(((x.stat().st_mtime, x) for x in self._files()), key=lambda x: x[0])
+        for _, path in files:
+            if self._entries <= 0.9 * self.max_entries and self._bytes <= 0.9 * self.max_bytes:
+                break
+            self._remove(path)
+            self.counters.count("evictions")
+
+    def stats(self) -> typing.Dict[str, typing.Any]:
+        with self._lock:
+            entries, size = self._entries, self._bytes
+        return {"backend": "disk", "entries": entries, "bytes": size, **self.counters.stats()}
+
+
+class CouchbaseResponseCache:
+    """A response cache of documents in a Couchbase collection (shared by every agent server that uses it).
+
+    Entries expire with their document's expiry (i.e., our TTL), and entries larger than max_entry_bytes are not
+    stored. The collection's size is otherwise bounded by its bucket (e.g., its quota and ejection policy). The
+    collection is created (if it does not exist) on first use.
+    """
+
+    def __init__(
+        self,
+        cluster_factory: typing.Callable,
+        bucket: str,
+        scope: str,
+        collection: str,
+        ttl: float = DEFAULT_TTL,
+        max_entry_bytes: int = DEFAULT_MAX_ENTRY_BYTES,
+    ):
+        self.cluster_factory = cluster_factory
+        self.keyspace = (bucket, scope, collection)
+        self.ttl = ttl
+        self.max_entry_bytes = max_entry_bytes
+        self.counters = CacheStats()
+        self._collection = None
+        self._lock = threading.Lock()
+
+    def collection(self):
+        with self._lock:
+            if self._collection is None:
+                bucket, scope, collection = self.keyspace
+                cluster = self.cluster_factory()
+                cluster.query(f"CREATE COLLECTION `{bucket}`.`{scope}`.`{collection}` IF NOT EXISTS;").execute()
+                self._collection = cluster.bucket(bucket).scope(scope).collection(collection)
+            return self._collection
+
+    def get(self, key: str) -> typing.Optional[typing.Dict[str, typing.Any]]:
+        import couchbase.exceptions
+
+        try:
+            entry = self.collection().get(f"llm::{key}").content_as[dict]
+        except couchbase.exceptions.DocumentNotFoundException:
+            self.counters.count("misses")
+            return None
+        self.counters.count("hits")
+        return entry
+
+    def put(self, key: str, entry: typing.Dict[str, typing.Any]) -> None:
+        import couchbase.options
+
+        if len(json.dumps(entry)) > self.max_entry_bytes:
+            self.counters.count("oversized")
+            return
+        options = couchbase.options.UpsertOptions(expiry=datetime.timedelta(seconds=self.ttl))
+        self.collection().upsert(f"llm::{key}", entry, options)
+        self.counters.count("stores")
+
+    def stats(self) -> typing.Dict[str, typing.Any]:
+        return {"backend": "couchbase", "keyspace": ".".join(self.keyspace), **self.counters.stats()}
+
+
+class ResponseCache(typing.Protocol):
+    counters: CacheStats
+
+    def get(self, key: str) -> typing.Optional[typing.Dict[str, typing.Any]]: ...
+
+    def put(self, key: str, entry: typing.Dict[str, typing.Any]) -> None: ...
+
+    def stats(self) -> typing.Dict[str, typing.Any]: ...
+
+
+def _lookup(cache: ResponseCache, key: str) -> typing.Optional[typing.Dict[str, typing.Any]]:
+    # A cache that is unavailable (e.g., an unreachable cluster) only costs us our hits.
+    try:
+        return cache.get(key)
+    except Exception as e:
+        cache.counters.count("errors")
+        logger.warning(f"Could not read from our LLM response cache: {e}")
+        return None
+
+
+def _store(cache: ResponseCache, key: str, result) -> None:
+    try:
+        cache.put(key, dump_result(result))
+    except Exception as e:
+        cache.counters.count("errors")
+        logger.warning(f"Could not write to our LLM response cache: {e}")
+
+
+def _chunk_of(result):
+    # A cached result, replayed as the single chunk of a stream (marked as cached, like the llm_output of load_result).
+    import langchain_core.messages
+    import langchain_core.outputs
+
+    message = result.generations[0].message
+    tool_call_chunks = [
+        {"name": x["name"], "args": json.dumps(x["args"]), "id": x.get("id"), "index": i}
+        for i, x in enumerate(getattr(message, "tool_calls", None) or list())
+    ]
+    chunk = langchain_core.messages.AIMessageChunk(
+        content=message.content, tool_call_chunks=tool_call_chunks, response_metadata=message.response_metadata
+    )
+    return langchain_core.outputs.ChatGenerationChunk(message=chunk, generation_info={"cached": True})
+
+
+def _result_of(chunk):
+    import langchain_core.messages
+    import langchain_core.outputs
+
+    message = langchain_core.messages.message_chunk_to_message(chunk.message)
+    return langchain_core.outputs.ChatResult(generations=[langchain_core.outputs.ChatGeneration(message=message)])
+
+
+def cache_responses(chat_model, cache: ResponseCache, catalog_version: str):
+    """Serve the (deterministic) generations of a LangChain chat model from cache, wrapping the model in place.
+
+    Only models with temperature 0 are cached. We wrap the model's _generate / _agenerate / _stream / _astream methods,
+    so this must be applied before agentc.langchain.audit (which wraps the same methods): cache hits then pass through
+    the auditor like any other generation. Streamed hits are replayed as one chunk.
+    """
+    if getattr(chat_model, "temperature", None) != 0:
+        logger.debug("Not caching the responses of a chat model with a non-zero temperature.")
+        return chat_model
+    model = getattr(chat_model, "model_name", None) or getattr(chat_model, "model", None) or type(chat_model).__name__
+    generate, agenerate = chat_model._generate, chat_model._agenerate
+    stream, astream = chat_model._stream, chat_model._astream
+
+    def _generate(messages, stop=None, run_manager=None, **kwargs):
+        key = cache_key(model, catalog_version, messages, stop, **kwargs)
+        entry = _lookup(cache, key)
+        if entry is not None:
+            return load_result(entry)
+        result = generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        _store(cache, key, result)
+        return result
+
+    async def _agenerate(messages, stop=None, run_manager=None, **kwargs):
+        key = cache_key(model, catalog_version, messages, stop, **kwargs)
+        entry = _lookup(cache, key)
+        if entry is not None:
+            return load_result(entry)
+        result = await agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        _store(cache, key, result)
+        return result
+
+    def _stream(messages, stop=None, run_manager=None, **kwargs):
+        key = cache_key(model, catalog_version, messages, stop, **kwargs)
+        entry = _lookup(cache, key)
+        if entry is not None:
+            yield _chunk_of(load_result(entry))
+            return
+        total = None
+        for chunk in stream(messages, stop=stop, run_manager=run_manager, **kwargs):
+            total = chunk if total is None else total + chunk
+            yield chunk
+        if total is not None:
+            _store(cache, key, _result_of(total))
+
+    async def _astream(messages, stop=None, run_manager=None, **kwargs):
+        key = cache_key(model, catalog_version, messages, stop, **kwargs)
+        entry = _lookup(cache, key)
+        if entry is not None:
+            yield _chunk_of(load_result(entry))
+            return
+        total = None
+        async for chunk in astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+            total = chunk if total is None else total + chunk
+            yield chunk
+        if total is not None:
+            _store(cache, key, _result_of(total))
+
+    # Chat models are pydantic models, which do not accept new attributes through setattr.
+    for name, method in [
+        ("_generate", _generate),
+        ("_agenerate", _agenerate),
+        ("_stream", _stream),
+        ("_astream", _astream),
+    ]:
+        object.__setattr__(chat_model, name, method)
+    return chat_model
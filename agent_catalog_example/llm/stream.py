@@ -0,0 +1,191 @@
+import collections
+import numpy
+import re
+import threading
+import time
+import typing
+
+# Deltas are coalesced so that we send (at most) one frame per interval, but the first delta of a message is always sent
+# right away (it is what the user is waiting for).
+DEFAULT_FLUSH_INTERVAL = 0.05
+
+# Escapes of a JSON string (besides \uXXXX).
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class PartialStringArgument:
+    """Decodes one string argument of a tool call (e.g., the 'message' of talk_to_user) from its JSON arguments, as
+    they stream in. feed() returns the text decoded since the last call.
+
+    Escapes that are split across chunks (including surrogate pairs) are held back until they are complete.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.raw = ""
+        self.position = None
+        self.done = False
+        self._key = re.compile(r'"' + re.escape(name) + r'"\s*:\s*"')
+
+    def feed(self, text: str) -> str:
+        self.raw += text
+        if self.done:
+            return ""
+        if self.position is None:
+            match = self._key.search(self.raw)
+            if match is None:
+                return ""
+            self.position = match.end()
+
+        raw, i, decoded = self.raw, self.position, list()
+        while i < len(raw):
+            c = raw[i]
+            if c == '"':
+                self.done = True
+                i += 1
+                break
+            elif c != "\\":
+                decoded.append(c)
+                i += 1
+            elif i + 1 == len(raw):
+                break
+            elif raw[i + 1] != "u":
+                decoded.append(_ESCAPES.get(raw[i + 1], raw[i + 1]))
+                i += 2
+            elif i + 6 > len(raw):
+                break
+            else:
+                code = int(raw[i + 2 : i + 6], 16)
+                if 0xD800 <= code < 0xDC00:
+                    # A high surrogate, which we can only decode with the low surrogate that follows it.
+                    if i + 12 > len(raw):
+                        break
+                    if raw[i + 6 : i + 8] == "\\u":
+                        code = 0x10000 + ((code - 0xD800) << 10) + (int(raw[i + 8 : i + 12], 16) - 0xDC00)
+                        i += 6
+                decoded.append(chr(code))
+                i += 6
+        self.position = i
+        return "".join(decoded)
+
+
+class StreamStats:
+    """How long users wait for the first delta of a streamed message vs. for the full message (shared by all sessions).
+
+    Both are measured from the start of the LLM call that generates the message (percentiles are over the last 1024
+    messages). Without streaming, users would wait for the latter.
+    """
+
+    def __init__(self):
+        self.messages = 0
+        self.deltas = 0
+        self.characters = 0
+        self.first_delta: collections.deque = collections.deque(maxlen=1024)
+        self.full_message: collections.deque = collections.deque(maxlen=1024)
+        self._lock = threading.Lock()
+
+    def record(self, first_delta: float, full_message: float, deltas: int, characters: int) -> None:
+        with self._lock:
+            self.messages += 1
+            self.deltas += deltas
+            self.characters += characters
+            self.first_delta.append(first_delta)
+            self.full_message.append(full_message)
+
+    def stats(self) -> typing.Dict[str, typing.Any]:
+        def _ms(latencies, q):
+            return float(numpy.percentile(latencies, q) * 1e3) if latencies else None
+
+        with self._lock:
+            first_delta, full_message = list(self.first_delta), list(self.full_message)
+            return {
+                "messages": self.messages,
+                "deltas": self.deltas,
+                "characters": self.characters,
+                "first_delta_p50_ms": _ms(first_delta, 50),
+                "first_delta_p99_ms": _ms(first_delta, 99),
+                "full_message_p50_ms": _ms(full_message, 50),
+                "full_message_p99_ms": _ms(full_message, 99),
+            }
+
+
+class _Stream:
+    def __init__(self, stream_id: str, argument: str):
+        self.stream_id = stream_id
+        self.argument = PartialStringArgument(argument)
+        self.pending = ""
+        self.first_delta = None
+        self.flushed = 0.0
+        self.deltas = 0
+        self.characters = 0
+
+
+def message_streamer(
+    send: typing.Callable[[str, str], typing.Awaitable],
+    stats: StreamStats,
+    tool_name: str = "talk_to_user",
+    argument: str = "message",
+    flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+):
+    """A LangChain callback handler that sends the (string) argument of a tool call to send(), as it is generated.
+
+    Our agent talks to the user through a tool (talk_to_user), so the text the user waits for is the 'message' argument
+    of its call. Deltas are sent as send(stream_id, text), where stream_id identifies one tool call. The chat model
+    must stream (e.g., ChatOpenAI(streaming=True)) for this handler to see any tokens. Text that is still pending when
+    the LLM call ends is flushed, but callers should still send the full message (e.g., from the tool itself), as the
+    call may never run.
+    """
+    # Built lazily, so that this module does not need LangChain to be installed.
+    import langchain_core.callbacks
+
+    class _MessageStreamer(langchain_core.callbacks.AsyncCallbackHandler):
+        def __init__(self):
+            self.started: typing.Dict[typing.Any, float] = dict()
+            self.streams: typing.Dict[typing.Any, typing.Dict[int, _Stream]] = dict()
+
+        @staticmethod
+        async def _flush(stream: _Stream) -> None:
+            text, stream.pending = stream.pending, ""
+            stream.flushed = time.perf_counter()
+            if stream.first_delta is None:
+                stream.first_delta = stream.flushed
+            stream.deltas += 1
+            stream.characters += len(text)
+            await send(stream.stream_id, text)
+
+        async def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+            self.started[run_id] = time.perf_counter()
+            self.streams[run_id] = dict()
+
+        async def on_llm_new_token(self, token, *, chunk=None, run_id, **kwargs) -> None:
+            streams = self.streams.get(run_id)
+            if streams is None or chunk is None:
+                return
+            for tool_call_chunk in getattr(chunk.message, "tool_call_chunks", None) or list():
+                index = tool_call_chunk.get("index") or 0
+                if tool_call_chunk.get("name") == tool_name:
+                    streams[index] = _Stream(f"{run_id}:{index}", argument)
+                stream = streams.get(index)
+                if stream is None or not tool_call_chunk.get("args"):
+                    continue
+                stream.pending += stream.argument.feed(tool_call_chunk["args"])
+                if stream.pending and (
+                    stream.first_delta is None or time.perf_counter() - stream.flushed >= flush_interval
+                ):
+                    await self._flush(stream)
+
+        async def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+            started, streams = self.started.pop(run_id, None), self.streams.pop(run_id, dict())
+            for stream in streams.values():
+                if stream.pending:
+                    await self._flush(stream)
+                if stream.first_delta is not None:
+                    stats.record(
+                        stream.first_delta - started, time.perf_counter() - started, stream.deltas, stream.characters
+                    )
+
+        async def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+            self.started.pop(run_id, None)
+            self.streams.pop(run_id, None)
+
+    return _MessageStreamer()
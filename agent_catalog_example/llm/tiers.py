@@ -0,0 +1,229 @@
+import collections
+import json
+import logging
+import numpy
+import pathlib
+import threading
+import time
+import typing
+
+from ..catalog import search
+
+logger = logging.getLogger(__name__)
+
+# Our default pool, from the cheapest (and fastest) tier to the strongest. A task whose result fails validation is
+# re-run on the next tier (see ModelPool.escalate()).
+DEFAULT_TIERS = "fast=gpt-4o-mini,standard=gpt-4o"
+DEFAULT_TIER = "standard"
+
+# USD per 1M (input, output) tokens, used to report the cost of each tier. Models that are not listed cost nothing.
+PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+}
+
+
+class TierSpec(typing.NamedTuple):
+    name: str
+    model: str
+
+    @staticmethod
+    def parse_all(specs: str) -> typing.List["TierSpec"]:
+        """Parse 'tier=model,tier=model,...' (in escalation order), e.g., MODEL_TIERS="fast=gpt-4o-mini,standard=gpt-4o"."""
+        tiers = list()
+        for spec in specs.split(","):
+            if spec.strip() == "":
+                continue
+            if "=" not in spec:
+                raise ValueError(f"Malformed model tier '{spec}' (expected 'tier=model')!")
+            name, model = spec.split("=", 1)
+            tiers.append(TierSpec(name=name.strip(), model=model.strip()))
+        if len(tiers) == 0:
+            raise ValueError("A model pool needs at least one tier!")
+        return tiers
+
+
+class TierPolicy(typing.NamedTuple):
+    """Which model tier a prompt's task runs on, declared with the 'model_tier' annotation of the prompt, e.g.:
+
+    annotations:
+      model_tier: "fast"        # (optional, defaults to DEFAULT_TIER)
+    """
+
+    tier: str
+
+    @staticmethod
+    def from_annotations(annotations: typing.Union[typing.Dict[str, str], str, None]) -> typing.Optional["TierPolicy"]:
+        # Catalogs may hold annotations as a JSON string (see search._item_annotations).
+        annotations = search._item_annotations({"annotations": annotations})
+        if "model_tier" not in annotations:
+            return None
+        return TierPolicy(tier=str(annotations["model_tier"]).strip())
+
+
+class TierStats:
+    """Call counts, latencies, and token usage of one tier (latency percentiles are over the last 1024 calls).
+
+    Generations served from our response cache (see llm.cache) are only counted as cache_hits (so they do not skew the
+    latencies of the tier's model).
+    """
+
+    def __init__(self, spec: TierSpec):
+        self.spec = spec
+        self.calls = 0
+        self.errors = 0
+        self.escalations = 0
+        self.cache_hits = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.latencies: collections.deque = collections.deque(maxlen=1024)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, input_tokens: int, output_tokens: int) -> None:
+        with self._lock:
+            self.calls += 1
+            self.latencies.append(latency)
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+
+    def cost(self) -> float:
+        input_price, output_price = PRICES.get(self.spec.model, (0.0, 0.0))
+        return (self.input_tokens * input_price + self.output_tokens * output_price) / 1e6
+
+    def stats(self) -> typing.Dict[str, typing.Any]:
+        with self._lock:
+            latencies = list(self.latencies)
+            return {
+                "model": self.spec.model,
+                "calls": self.calls,
+                "errors": self.errors,
+                "escalations": self.escalations,
+                "cache_hits": self.cache_hits,
+                "latency_p50_ms": float(numpy.percentile(latencies, 50) * 1e3) if latencies else None,
+                "latency_p99_ms": float(numpy.percentile(latencies, 99) * 1e3) if latencies else None,
+                "input_tokens": self.input_tokens,
+                "output_tokens": self.output_tokens,
+                "cost_usd": round(self.cost(), 6),
+            }
+
+
+def _usage_handler(stats: TierStats):
+    # Built lazily, so that this module does not need LangChain to be installed.
+    import langchain_core.callbacks
+
+    class _UsageHandler(langchain_core.callbacks.BaseCallbackHandler):
+        def __init__(self):
+            self.started: typing.Dict[typing.Any, float] = dict()
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+            self.started[run_id] = time.perf_counter()
+
+        def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+            started = self.started.pop(run_id, None)
+            generations = (response.generations or [[]])[0]
+            if (response.llm_output or dict()).get("cached") or any(
+                (x.generation_info or dict()).get("cached") for x in generations
+            ):
+                with stats._lock:
+                    stats.cache_hits += 1
+                return
+            usage = (response.llm_output or dict()).get("token_usage") or dict()
+            input_tokens, output_tokens = usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+            if not usage:
+                # Streamed generations report their usage on their message instead (e.g., with stream_usage=True).
+                for generation in generations:
+                    message_usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or dict()
+                    input_tokens += message_usage.get("input_tokens", 0)
+                    output_tokens += message_usage.get("output_tokens", 0)
+            stats.record(time.perf_counter() - started if started is not None else 0.0, input_tokens, output_tokens)
+
+        def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+            self.started.pop(run_id, None)
+            with stats._lock:
+                stats.errors += 1
+
+    return _UsageHandler()
+
+
+class ModelPool:
+    """The chat models of our tiers, with per-tier latency / token / cost metrics (shared by all sessions).
+
+    model_factory builds a chat model from a model name and a list of LangChain callback handlers, e.g.,
+    lambda model, callbacks: ChatOpenAI(model=model, temperature=0, callbacks=callbacks). Each call to model() builds a
+    new chat model, as wrappers like agentc.langchain.audit bind a model (in place) to one session. Handlers that belong
+    to one session (e.g., one that streams to its websocket) can be given to model() as well.
+    """
+
+    def __init__(
+        self,
+        tiers: typing.List[TierSpec],
+        model_factory: typing.Callable[[str, typing.List], typing.Any],
+        default_tier: str = DEFAULT_TIER,
+    ):
+        self.tiers = list(tiers)
+        self.model_factory = model_factory
+        self.default_tier = default_tier if default_tier in self.names else self.names[-1]
+        self._stats = {tier.name: TierStats(tier) for tier in self.tiers}
+        self._handlers = {tier.name: None for tier in self.tiers}
+        self._lock = threading.Lock()
+
+    @property
+    def names(self) -> typing.List[str]:
+        return [tier.name for tier in self.tiers]
+
+    def resolve(self, tier: str) -> str:
+        if tier not in self._stats:
+            logger.warning(f"Unknown model tier '{tier}' (expected one of {self.names}). Using {self.default_tier}.")
+            return self.default_tier
+        return tier
+
+    def model(self, tier: str, callbacks: typing.List = None):
+        with self._lock:
+            if self._handlers[tier] is None:
+                self._handlers[tier] = _usage_handler(self._stats[tier])
+        return self.model_factory(self._stats[tier].spec.model, [self._handlers[tier], *(callbacks or list())])
+
+    def escalate(self, tier: str) -> typing.Optional[str]:
+        """Return the tier after tier (or None if tier is our strongest), counting the escalation against tier."""
+        position = self.names.index(tier)
+        if position + 1 == len(self.tiers):
+            return None
+        with self._stats[tier]._lock:
+            self._stats[tier].escalations += 1
+        return self.names[position + 1]
+
+    def stats(self) -> typing.Dict[str, typing.Dict[str, typing.Any]]:
+        return {name: stats.stats() for name, stats in self._stats.items()}
+
+
+class ModelTierBinder:
+    """Maps prompt names to the model tier their annotations declare (see TierPolicy).
+
+    Like our tool binders, this reads the local (prompt) catalog file. Build one binder per catalog snapshot, so sessions
+    pinned to an older snapshot keep the tiers they started with (refresh() re-reads the file in place). Prompts without a 'model_tier' annotation (or missing from the catalog) run on the pool's default tier.
+    """
+
+    def __init__(self, catalog_file: typing.Union[str, pathlib.Path], pool: ModelPool):
+        self.catalog_file = pathlib.Path(catalog_file)
+        self.pool = pool
+        self.tiers: typing.Dict[str, str] = dict()
+        self.refresh()
+
+    def refresh(self) -> None:
+        """(Re-)read our prompts from the local catalog file."""
+        tiers = dict()
+        if self.catalog_file.exists():
+            with self.catalog_file.open("r") as fp:
+                for item in json.load(fp)["items"]:
+                    policy = TierPolicy.from_annotations(item.get("annotations"))
+                    if policy is not None:
+                        tiers[item["name"]] = self.pool.resolve(policy.tier)
+        else:
+            logger.debug(f"No local catalog found at {self.catalog_file}. All prompts use the default model tier.")
+        self.tiers = tiers
+
+    def tier_for(self, prompt_name: str) -> str:
+        return self.tiers.get(prompt_name, self.pool.default_tier)
@@ -0,0 +1,223 @@
+import collections
+import copy
+import functools
+import inspect
+import json
+import logging
+import pathlib
+import threading
+import time
+import typing
+
+from ..catalog import search
+
+logger = logging.getLogger(__name__)
+
+# Ingest scripts (which run in other processes) invalidate all tool caches by touching this file.
+DEFAULT_EPOCH_FILE = pathlib.Path(".agent-catalog") / "tool-cache.epoch"
+
+_MISSING = object()
+
+
+class CachePolicy(typing.NamedTuple):
+    """How a tool's results are cached, declared with the 'cache_*' annotations of the tool's metadata, e.g.:
+
+    annotations:
+      cache_ttl: "300"                                     # seconds (mandatory, this enables caching)
+      cache_max_entries: "1024"                            # (optional, defaults to 1024)
+      cache_key: "source_airport,destination_airport"      # (optional, defaults to all arguments)
+    """
+
+    ttl: float
+    max_entries: int
+    key_fields: typing.Optional[typing.Tuple[str, ...]]
+
+    @staticmethod
+    def from_annotations(
+        annotations: typing.Union[typing.Dict[str, str], str, None],
+    ) -> typing.Optional["CachePolicy"]:
+        # Catalogs may hold annotations as a JSON string (see search._item_annotations).
+        annotations = search._item_annotations({"annotations": annotations})
+        if "cache_ttl" not in annotations:
+            return None
+        key_fields = annotations.get("cache_key")
+        return CachePolicy(
+            ttl=float(annotations["cache_ttl"]),
+            max_entries=int(annotations.get("cache_max_entries", 1024)),
+            key_fields=tuple(x.strip() for x in key_fields.split(",")) if key_fields else None,
+        )
+
+
+class ResultCache:
+    """A thread-safe LRU map of tool arguments -> tool results, whose entries expire after some TTL."""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._entries: collections.OrderedDict = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: typing.Hashable) -> typing.Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return _MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: typing.Hashable, value: typing.Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> typing.Dict[str, typing.Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+class ToolCacheRegistry:
+    """The (process-wide) set of tool result caches, keyed by tool name.
+
+    Caches are cleared in-process with invalidate(), and across processes by bumping the epoch file (see bump_epoch()).
+    We check the epoch file's mtime at most once every epoch_check_interval seconds.
+    """
+
+    def __init__(self, epoch_file: typing.Union[str, pathlib.Path] = DEFAULT_EPOCH_FILE, epoch_check_interval=1.0):
+        self.epoch_file = pathlib.Path(epoch_file)
+        self.epoch_check_interval = epoch_check_interval
+        self.caches: typing.Dict[str, ResultCache] = dict()
+        self._epoch = self._read_epoch()
+        self._epoch_checked_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _read_epoch(self) -> typing.Optional[int]:
+        try:
+            return self.epoch_file.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _check_epoch(self) -> None:
+        now = time.monotonic()
+        if now - self._epoch_checked_at < self.epoch_check_interval:
+            return
+        self._epoch_checked_at = now
+        epoch = self._read_epoch()
+        if epoch != self._epoch:
+            logger.info(f"Tool cache epoch changed ({self.epoch_file}). Invalidating all tool caches.")
+            self._epoch = epoch
+            self.invalidate()
+
+    def cache_for(self, tool_name: str, policy: CachePolicy) -> ResultCache:
+        with self._lock:
+            cache = self.caches.get(tool_name)
+            if cache is None or (cache.ttl, cache.max_entries) != (policy.ttl, policy.max_entries):
+                cache = self.caches[tool_name] = ResultCache(policy.ttl, policy.max_entries)
+            return cache
+
+    def lookup(self, tool_name: str, key: typing.Hashable) -> typing.Any:
+        self._check_epoch()
+        return self.caches[tool_name].get(key)
+
+    def invalidate(self, tool_names: typing.Iterable[str] = None) -> None:
+        for name in tool_names if tool_names is not None else list(self.caches):
+            if name in self.caches:
+                self.caches[name].clear()
+
+    def stats(self) -> typing.Dict[str, typing.Dict[str, typing.Any]]:
+        return {name: cache.stats() for name, cache in self.caches.items()}
+
+
+# By default, all tools of a process share one registry.
+default_registry = ToolCacheRegistry()
+
+
+def bump_epoch(epoch_file: typing.Union[str, pathlib.Path] = DEFAULT_EPOCH_FILE) -> None:
+    """Invalidate the tool caches of every process watching epoch_file (e.g., after ingesting new data)."""
+    epoch_file = pathlib.Path(epoch_file)
+    epoch_file.parent.mkdir(parents=True, exist_ok=True)
+    epoch_file.touch()
+
+
+def cached_tool(
+    func: typing.Callable, policy: CachePolicy, registry: ToolCacheRegistry = None
+) -> typing.Callable[..., typing.Any]:
+    """Wrap func so that its results are cached according to policy (the wrapper keeps func's name and signature).
+
+    Results are copied in and out of the cache, so callers that mutate a (list or dict) result do not change what other
+    callers get.
+    """
+    registry = registry if registry is not None else default_registry
+    signature = inspect.signature(func)
+    tool_name = func.__name__
+    if policy.key_fields is not None:
+        # An unknown field would always key as None, i.e., every call would share (and return) one result.
+        unknown = [x for x in policy.key_fields if x not in signature.parameters]
+        if len(unknown) > 0:
+            raise ValueError(f"Cache key fields {unknown} of tool {tool_name} are not arguments of the tool.")
+    registry.cache_for(tool_name, policy)
+
+    @functools.wraps(func)
+    def _call(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        fields = policy.key_fields if policy.key_fields is not None else tuple(bound.arguments)
+        key = json.dumps([bound.arguments.get(x) for x in fields], sort_keys=True, default=str)
+        result = registry.lookup(tool_name, key)
+        if result is _MISSING:
+            result = func(*args, **kwargs)
+            registry.caches[tool_name].put(key, copy.deepcopy(result))
+            return result
+        return copy.deepcopy(result)
+
+    return _call
+
+
+class CachingToolBinder:
+    """Wraps the tools whose catalog annotations declare a cache policy (see CachePolicy) with a result cache.
+
+    Like HTTPToolBinder, this reads the local tool catalog and is meant to be used in the decorator of an agentc.Provider
+    (applied last, so it caches whatever the other binders return).
+    """
+
+    def __init__(self, catalog_file: typing.Union[str, pathlib.Path], registry: ToolCacheRegistry = None):
+        self.registry = registry if registry is not None else default_registry
+        self.policies: typing.Dict[str, CachePolicy] = dict()
+        catalog_file = pathlib.Path(catalog_file)
+        if not catalog_file.exists():
+            logger.debug(f"No local catalog found at {catalog_file}. Tool results will not be cached.")
+            return
+        with catalog_file.open("r") as fp:
+            for item in json.load(fp)["items"]:
+                policy = CachePolicy.from_annotations(item.get("annotations"))
+                if policy is not None:
+                    self.policies[item["name"]] = policy
+
+    def __call__(self, func: typing.Callable) -> typing.Callable:
+        policy = self.policies.get(getattr(func, "__name__", None))
+        return cached_tool(func, policy, self.registry) if policy is not None else func
@@ -0,0 +1,34 @@
+import threading
+import typing
+
+_clusters = dict()
+_lock = threading.Lock()
+
+
+def cluster_for(couchbase_secrets: typing.Dict[str, str], secrets: typing.Dict[str, str]):
+    """Return the (process-wide, lazily opened) cluster connection for a tool's 'couchbase' secrets entry.
+
+    couchbase_secrets maps conn_string / username / password to secret keys, which are resolved using secrets. All
+    tools that resolve to the same credentials share one connection.
+    """
+    key = tuple(secrets.get(couchbase_secrets[x]) for x in ["conn_string", "username", "password"])
+    with _lock:
+        if key not in _clusters:
+            import couchbase.auth
+            import couchbase.cluster
+            import couchbase.options
+
+            _clusters[key] = couchbase.cluster.Cluster(
+                key[0],
+                couchbase.options.ClusterOptions(
+                    couchbase.auth.PasswordAuthenticator(username=key[1], password=key[2])
+                ),
+            )
+        return _clusters[key]
+
+
+def reset() -> None:
+    """Forget all cluster connections (e.g., in a forked child, where the parent's connections cannot be used)."""
+    global _lock
+    _clusters.clear()
+    _lock = threading.Lock()
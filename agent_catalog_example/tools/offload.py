@@ -0,0 +1,206 @@
+import asyncio
+import collections
+import concurrent.futures
+import fnmatch
+import functools
+import logging
+import multiprocessing
+import numpy
+import os
+import threading
+import time
+import typing
+
+from ..embedding import batching
+from . import connections
+from . import openapi
+
+logger = logging.getLogger(__name__)
+
+# Where a tool call can run: in a forked worker process, in a worker thread, or on the calling (event loop) thread.
+TARGETS = {"process", "thread", "inline"}
+
+# The tool functions that workers can run, by name. Workers are forked, so each one inherits this dictionary (and
+# everything the functions reference, e.g., loaded models) as it was when the pool was started.
+_registry: typing.Dict[str, typing.Callable] = dict()
+
+
+def _run_registered(name: str, args: typing.Tuple, kwargs: typing.Dict) -> typing.Any:
+    return _registry[name](*args, **kwargs)
+
+
+def _initialize_worker() -> None:
+    # Connections (and their sockets / IO threads) of the parent cannot be used in a forked child.
+    connections.reset()
+    openapi.default_client.reset()
+    try:
+        import torch
+
+        # Each worker is one of several processes, so it should not also spread one forward pass over all cores.
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+
+
+def _ready(_: int) -> int:
+    return os.getpid()
+
+
+class OffloadRule(typing.NamedTuple):
+    pattern: str
+    target: str
+
+    @staticmethod
+    def parse(rules: str) -> typing.List["OffloadRule"]:
+        """Parse rules of the form 'tool_name_or_glob=target,...' (e.g., 'get_*_blog_*=process,*=thread')."""
+        parsed = list()
+        for rule in filter(None, (x.strip() for x in rules.split(","))):
+            pattern, target = (x.strip() for x in rule.split("="))
+            if target not in TARGETS:
+                raise ValueError(f"Unknown offload target for {pattern}: {target} (expected one of {TARGETS}).")
+            parsed.append(OffloadRule(pattern, target))
+        return parsed
+
+
+class OffloadPool:
+    """Runs (blocking) tool calls off the event loop thread, in a forked process pool or in a thread pool.
+
+    Each tool is routed by the first rule whose pattern matches its name (tools without a matching rule go to
+    default). Process workers are forked (once) by start(), so call it after models are loaded (their weights are then
+    shared copy-on-write) but before any other threads are started. A worker can only run the tool functions that were
+    registered before it was forked: a function that was rebound after start() (e.g., by a catalog reload) runs in the
+    thread pool instead.
+    Note that a worker has its own copy of everything a tool keeps in memory (e.g., caches), so tools that share state
+    across sessions are best run in the thread pool.
+    Like the binders in this package, an OffloadPool is meant to be used in the decorator of an agentc.Provider (as the
+    outermost decorator, since it turns tools into coroutine functions).
+    """
+
+    def __init__(
+        self,
+        processes: int = 2,
+        threads: int = 16,
+        rules: typing.Union[str, typing.List[OffloadRule]] = None,
+        default: str = "thread",
+    ):
+        self.processes = processes
+        self.rules = OffloadRule.parse(rules) if isinstance(rules, str) else list(rules or [])
+        self.default = default
+        self._threads = concurrent.futures.ThreadPoolExecutor(max_workers=threads, thread_name_prefix="tool-offload")
+        self._executor: typing.Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self._forked: typing.Dict[str, typing.Callable] = dict()
+
+        # Our metrics (per tool and target).
+        self._calls = collections.Counter()
+        self._seconds = collections.Counter()
+
+    def route(self, name: str) -> str:
+        for rule in self.rules:
+            if fnmatch.fnmatchcase(name, rule.pattern):
+                return rule.target
+        return self.default
+
+    def start(self) -> None:
+        """Fork our process workers, which inherit all tool functions registered so far (only the first call forks).
+
+        Nothing is forked unless some rule (or our default) routes tools to 'process'.
+        Forking a process that runs other threads can leave the locks those threads hold locked forever in the child, so
+        the worker threads of our (shared) embedding services are stopped first, and we do not fork at all (i.e., every
+        tool runs in the thread pool) if any other Python thread is still running. This check cannot see native threads,
+        e.g., the I/O threads of Couchbase clusters that were already opened (by SQL++ tool warm-up): workers drop those
+        connections (see _initialize_worker) and open their own, but process offload is only as safe as the libraries
+        that own such threads are across a fork.
+        """
+        uses_processes = self.default == "process" or any(x.target == "process" for x in self.rules)
+        if self.processes <= 0 or not uses_processes or self._executor is not None:
+            return
+        batching.stop_workers()
+        others = [x.name for x in threading.enumerate() if x is not threading.current_thread()]
+        if len(others) > 0:
+            logger.warning(f"Not forking tool workers while other threads are running ({others}). Using threads only.")
+            return
+        self._executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=_initialize_worker,
+        )
+        self._forked = dict(_registry)
+
+        # Workers are otherwise forked on demand (i.e., later, and from whatever state the process is in by then).
+        pids = set(self._executor.map(_ready, range(self.processes * 4)))
+        logger.debug(f"Forked {len(pids)} tool worker(s) with {len(self._forked)} tool(s).")
+
+    async def run(self, name: str, func: typing.Callable, *args, **kwargs) -> typing.Any:
+        target = self.route(name)
+        if target == "process" and (self._executor is None or self._forked.get(name) is not func):
+            target = "thread"
+
+        start_time = time.perf_counter()
+        try:
+            if target == "process":
+                future = self._executor.submit(_run_registered, name, args, kwargs)
+                return await asyncio.wrap_future(future)
+            elif target == "thread":
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._threads, functools.partial(func, *args, **kwargs))
+            else:
+                return func(*args, **kwargs)
+        finally:
+            self._calls[(name, target)] += 1
+            self._seconds[(name, target)] += time.perf_counter() - start_time
+
+    def __call__(self, func: typing.Callable) -> typing.Callable:
+        if asyncio.iscoroutinefunction(func):
+            return func
+        name = func.__name__
+        _registry[name] = func
+
+        @functools.wraps(func)
+        async def _call(*args, **kwargs):
+            return await self.run(name, func, *args, **kwargs)
+
+        return _call
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+        self._threads.shutdown()
+
+    def stats(self) -> typing.Dict[str, typing.Dict[str, typing.Any]]:
+        stats = collections.defaultdict(dict)
+        for (name, target), calls in self._calls.items():
+            stats[name][target] = {"calls": calls, "mean_ms": self._seconds[(name, target)] / calls * 1e3}
+        return dict(stats)
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes up from short sleeps (i.e., how long callbacks wait for the loop)."""
+
+    def __init__(self, interval: float = 0.01, window: int = 1000):
+        self.interval = interval
+        self.lags = collections.deque(maxlen=window)
+        self._task: typing.Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            start_time = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(time.perf_counter() - start_time - self.interval, 0.0))
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+
+    def stats(self) -> typing.Dict[str, typing.Any]:
+        if len(self.lags) == 0:
+            return {"samples": 0}
+        lags = numpy.asarray(self.lags) * 1e3
+        return {
+            "samples": len(lags),
+            "p50_ms": float(numpy.percentile(lags, 50)),
+            "p99_ms": float(numpy.percentile(lags, 99)),
+            "max_ms": float(lags.max()),
+        }
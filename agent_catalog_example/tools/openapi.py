@@ -0,0 +1,271 @@
+import concurrent.futures
+import functools
+import inspect
+import json
+import logging
+import pathlib
+import random
+import requests
+import requests.adapters
+import threading
+import time
+import typing
+import urllib.parse
+import urllib3.exceptions
+
+logger = logging.getLogger(__name__)
+
+# Statuses that are worth retrying (on this server or the next one).
+_RETRY_STATUSES = {429, 502, 503, 504}
+
+# Methods that can be sent more than once with the same effect. Only these are hedged, or retried after they were sent.
+_IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+_PARAMETER_LOCATIONS = {"header", "query", "cookie", "path"}
+
+# How JSON schema types (of a parameter or body field) map to Python annotations (arrays are handled by _annotation).
+_JSON_TYPES = {"string": str, "integer": int, "number": float, "boolean": bool, "object": dict}
+
+
+def _resolve(specification: typing.Dict, schema: typing.Dict) -> typing.Dict:
+    # We only need to follow local references (e.g., "#/components/schemas/...").
+    while "$ref" in schema:
+        reference = specification
+        for key in schema["$ref"].removeprefix("#/").split("/"):
+            reference = reference[key]
+        schema = reference
+    return schema
+
+
+def _annotation(specification: typing.Dict, schema: typing.Dict) -> typing.Any:
+    schema = _resolve(specification, schema)
+    if schema.get("type") == "array":
+        return typing.List[_annotation(specification, schema.get("items", dict()))]
+    return _JSON_TYPES.get(schema.get("type"), typing.Any)
+
+
+class HTTPClient:
+    """A shared, pooled HTTP client for OpenAPI-backed tools.
+
+    All requests go through one keep-alive requests.Session (with a bounded connection pool), and each attempt is
+    bounded by a (connect, read) timeout. Failed attempts (connection errors, timeouts, and 429 / 5xx-gateway statuses)
+    are retried with exponential backoff and full jitter, moving on to the next server of the spec on every retry. If
+    hedge_after is set and the spec lists more than one server, a request that has not finished after hedge_after
+    seconds is duplicated to the next server and the first successful response wins.
+
+    Requests with a non-idempotent method (e.g., POST) are never hedged, and are only retried if they were never sent
+    (i.e., we could not connect), as a server may have acted on an attempt that failed afterward.
+    """
+
+    def __init__(
+        self,
+        connect_timeout: float = 3.05,
+        read_timeout: float = 30.0,
+        max_retries: int = 2,
+        backoff_base: float = 0.1,
+        backoff_max: float = 2.0,
+        hedge_after: typing.Optional[float] = None,
+        pool_maxsize: int = 32,
+    ):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_after = hedge_after
+        self.pool_maxsize = pool_maxsize
+        self.reset()
+
+    def reset(self) -> None:
+        """Start over with a new session (e.g., in a forked child, which must not share the parent's sockets)."""
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=8, pool_maxsize=self.pool_maxsize)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._hedge_pool = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _never_sent(error: requests.RequestException) -> bool:
+        if isinstance(error, requests.ConnectTimeout):
+            return True
+        if not isinstance(error, requests.ConnectionError):
+            return False
+        # requests wraps urllib3's MaxRetryError, whose reason tells us whether a connection was ever made.
+        reason = error.args[0] if len(error.args) > 0 else None
+        return isinstance(getattr(reason, "reason", reason), urllib3.exceptions.NewConnectionError)
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2**attempt)))
+
+    def _send(self, method: str, url: str, **kwargs) -> requests.Response:
+        response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+        if response.status_code in _RETRY_STATUSES:
+            response.raise_for_status()
+        return response
+
+    def _send_hedged(self, method: str, urls: typing.List[str], **kwargs) -> requests.Response:
+        with self._lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = concurrent.futures.ThreadPoolExecutor(thread_name_prefix="http-hedge")
+        pending = {self._hedge_pool.submit(self._send, method, urls[0], **kwargs)}
+        error, sent = None, 1
+        while len(pending) > 0:
+            done, pending = concurrent.futures.wait(
+                pending, timeout=self.hedge_after, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                try:
+                    return future.result()
+                except requests.RequestException as e:
+                    error = e
+
+            # Our outstanding requests are slow (or one has failed), so we send the same request to the next server.
+            if sent < len(urls):
+                logger.debug(f"Hedging {method} request to {urls[sent]}.")
+                pending.add(self._hedge_pool.submit(self._send, method, urls[sent], **kwargs))
+                sent += 1
+        raise error
+
+    def request(self, method: str, servers: typing.List[str], path: str, **kwargs) -> requests.Response:
+        error, idempotent = None, method.upper() in _IDEMPOTENT_METHODS
+        for attempt in range(self.max_retries + 1):
+            # Each attempt starts at a different server (so a retry is also a failover).
+            offset = attempt % len(servers)
+            urls = [server + path for server in servers[offset:] + servers[:offset]]
+            try:
+                if self.hedge_after is not None and len(urls) > 1 and idempotent:
+                    return self._send_hedged(method, urls, **kwargs)
+                return self._send(method, urls[0], **kwargs)
+            except requests.RequestException as e:
+                logger.warning(f"Attempt {attempt + 1} of {method} {urls[0]} failed: {e}")
+                error = e
+                if not idempotent and not self._never_sent(e):
+                    break
+                if attempt < self.max_retries:
+                    time.sleep(self._backoff(attempt))
+        raise error
+
+
+# By default, all of our tools share one client (and thus one connection pool).
+default_client = HTTPClient()
+
+
+class OperationTemplate:
+    """One OpenAPI operation, compiled once into everything we need to issue a request for it."""
+
+    def __init__(self, specification: typing.Dict, path: str, method: str, client: HTTPClient = None):
+        operation = specification["paths"][path][method.lower()]
+        self.path = path
+        self.method = method.upper()
+        self.name = operation["operationId"]
+        self.description = operation.get("description", operation.get("summary", ""))
+        self.servers = [x["url"].rstrip("/") for x in specification.get("servers", [{"url": ""}])]
+        self.client = client if client is not None else default_client
+
+        # Group our parameters by location up front, instead of dispatching on each parameter at call time.
+        self.parameters = {location: list() for location in _PARAMETER_LOCATIONS}
+        self.required = list()
+        self.annotations = dict()
+        for parameter in operation.get("parameters", []):
+            parameter = _resolve(specification, parameter)
+            if parameter["in"] not in _PARAMETER_LOCATIONS:
+                raise ValueError(f"Unknown location of parameter {parameter['name']}: {parameter['in']}")
+            self.parameters[parameter["in"]].append(parameter["name"])
+            self.annotations[parameter["name"]] = _annotation(specification, parameter.get("schema", dict()))
+            if parameter.get("required", False):
+                self.required.append(parameter["name"])
+        body_schema = operation.get("requestBody", {}).get("content", {}).get("application/json", {}).get("schema", {})
+        body_schema = _resolve(specification, body_schema)
+        self.body = list(body_schema.get("properties", {}).keys())
+        for name, schema in body_schema.get("properties", {}).items():
+            self.annotations[name] = _annotation(specification, schema)
+        self.required.extend(body_schema.get("required", []))
+
+    def bind(self, **kwargs) -> typing.Tuple[str, typing.Dict]:
+        path = self.path
+        for name in self.parameters["path"]:
+            path = path.replace("{" + name + "}", urllib.parse.quote(str(kwargs[name]), safe=""))
+        request_args = dict()
+        for location, argument in [("query", "params"), ("header", "headers"), ("cookie", "cookies")]:
+            values = {k: kwargs[k] for k in self.parameters[location] if k in kwargs}
+            if len(values) > 0:
+                request_args[argument] = values
+        body = {k: kwargs[k] for k in self.body if k in kwargs}
+        if len(body) > 0:
+            request_args["json"] = body
+        return path, request_args
+
+    def __call__(self, **kwargs) -> str:
+        path, request_args = self.bind(**kwargs)
+        response = self.client.request(self.method, self.servers, path, **request_args)
+        if response.status_code == 200:
+            return response.text
+        raise Exception(f"Non-200 status code returned from server!\n\n{response.text}")
+
+    def as_function(self) -> typing.Callable[..., str]:
+        """Build a plain function (with a proper signature and docstring) that tool frameworks can introspect."""
+
+        def _call(**kwargs) -> str:
+            # Optional arguments that were not given (i.e., left at None) are left out of the request.
+            return self(**{k: v for k, v in kwargs.items() if v is not None or k in self.required})
+
+        names = self.required + [x for x in self.arguments() if x not in self.required]
+        annotations = {
+            name: self.annotations[name] if name in self.required else typing.Optional[self.annotations[name]]
+            for name in names
+        }
+        _call.__signature__ = inspect.Signature(
+            [
+                inspect.Parameter(
+                    name,
+                    inspect.Parameter.KEYWORD_ONLY,
+                    annotation=annotations[name],
+                    default=inspect.Parameter.empty if name in self.required else None,
+                )
+                for name in names
+            ],
+            return_annotation=str,
+        )
+        _call.__annotations__ = {**annotations, "return": str}
+        _call.__name__ = self.name
+        _call.__qualname__ = self.name
+        _call.__doc__ = self.description
+        return _call
+
+    def arguments(self) -> typing.List[str]:
+        return [x for location in sorted(_PARAMETER_LOCATIONS) for x in self.parameters[location]] + self.body
+
+
+@functools.lru_cache
+def load_specification(filename: str) -> typing.Dict:
+    with pathlib.Path(filename).open("r") as fp:
+        return json.load(fp)
+
+
+class HTTPToolBinder:
+    """Swaps generated http_request tool functions for ones backed by precompiled templates and a pooled client.
+
+    The catalog file tells us which spec, path, and method each http_request tool (by name) was generated from. This is
+    meant to be used in the decorator of an agentc.Provider, e.g.:
+    decorator=lambda t: controlflow.tools.Tool.from_function(binder(t.func)).
+    """
+
+    def __init__(self, catalog_file: typing.Union[str, pathlib.Path], client: HTTPClient = None):
+        self.client = client if client is not None else default_client
+        self.templates: typing.Dict[str, OperationTemplate] = dict()
+        self._functions: typing.Dict[str, typing.Callable[..., str]] = dict()
+        catalog_file = pathlib.Path(catalog_file)
+        if not catalog_file.exists():
+            logger.debug(f"No local catalog found at {catalog_file}. HTTP tools will not be rebound.")
+            return
+        with catalog_file.open("r") as fp:
+            for item in json.load(fp)["items"]:
+                if item["record_kind"] != "http_request":
+                    continue
+                specification = load_specification(item["specification"]["filename"])
+                self.templates[item["name"]] = OperationTemplate(
+                    specification, item["operation"]["path"], item["operation"]["method"], self.client
+                )
+        self._functions = {name: template.as_function() for name, template in self.templates.items()}
+
+    def __call__(self, func: typing.Callable) -> typing.Callable:
+        return self._functions.get(getattr(func, "__name__", None), func)
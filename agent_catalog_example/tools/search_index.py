@@ -0,0 +1,228 @@
+import http
+import logging
+import math
+import pathlib
+import requests
+import sys
+import time
+import typing
+import yaml
+
+from ..embedding import backends
+from . import connections
+
+logger = logging.getLogger(__name__)
+
+# We give an index one partition per DOCS_PER_PARTITION documents (at most MAX_PARTITIONS). Partitions are built and
+# searched in parallel, but every query fans out to all of them, so small collections are best served by one.
+DOCS_PER_PARTITION = 100_000
+MAX_PARTITIONS = 16
+
+# These are set by the search service itself (so they never match a definition we write).
+_SERVER_FIELDS = {"name", "uuid", "sourceUUID", "prevIndexUUID"}
+
+
+def partitions_for(count: int) -> int:
+    return min(MAX_PARTITIONS, max(1, math.ceil(count / DOCS_PER_PARTITION)))
+
+
+class VectorIndexSpec(typing.NamedTuple):
+    """The desired state of an FTS vector index over one (vector) field of one collection.
+
+    If partitions is None, the index is given partitions_for(<number of documents with a vector>) partitions when it is
+    created, and keeps however many partitions it has afterwards (so that a growing collection does not rebuild it).
+    """
+
+    name: str
+    bucket: str
+    scope: str
+    collection: str
+    vector_field: str
+    dims: int
+    similarity: str = "dot_product"
+    optimized_for: str = "recall"
+    partitions: typing.Optional[int] = None
+
+    @staticmethod
+    def from_tool(tool_file: typing.Union[str, pathlib.Path], **kwargs) -> "VectorIndexSpec":
+        """Build the spec of the index a semantic_search tool queries (its dims follow the tool's encoder)."""
+        with pathlib.Path(tool_file).open("r") as fp:
+            vector_search = yaml.safe_load(fp)["vector_search"]
+        return VectorIndexSpec(
+            name=vector_search["index"],
+            bucket=vector_search["bucket"],
+            scope=vector_search["scope"],
+            collection=vector_search["collection"],
+            vector_field=vector_search["vector_field"],
+            dims=backends.embedding_dims(vector_search["embedding_model"]),
+            **kwargs,
+        )
+
+    def definition(self, partitions: int) -> typing.Dict[str, typing.Any]:
+        vector_field = {
+            "dims": self.dims,
+            "index": True,
+            "name": self.vector_field,
+            "similarity": self.similarity,
+            "type": "vector",
+            "vector_index_optimized_for": self.optimized_for,
+        }
+        return {
+            "name": self.name,
+            "type": "fulltext-index",
+            "params": {
+                "doc_config": {
+                    "docid_prefix_delim": "",
+                    "docid_regexp": "",
+                    "mode": "scope.collection.type_field",
+                    "type_field": "type",
+                },
+                "mapping": {
+                    "default_analyzer": "standard",
+                    "default_datetime_parser": "dateTimeOptional",
+                    "default_field": "_all",
+                    "default_mapping": {"dynamic": False, "enabled": False},
+                    "default_type": "_default",
+                    "docvalues_dynamic": False,
+                    "index_dynamic": False,
+                    "store_dynamic": False,
+                    "type_field": "_type",
+                    "types": {
+                        f"{self.scope}.{self.collection}": {
+                            "dynamic": False,
+                            "enabled": True,
+                            "properties": {
+                                self.vector_field: {"enabled": True, "dynamic": False, "fields": [vector_field]}
+                            },
+                        }
+                    },
+                },
+                "store": {"indexType": "scorch", "segmentVersion": 16},
+            },
+            "sourceType": "gocbcore",
+            "sourceName": self.bucket,
+            "sourceParams": {},
+            "planParams": {"maxPartitionsPerPIndex": 1024, "indexPartitions": partitions, "numReplicas": 0},
+        }
+
+
+def changes(desired: typing.Any, existing: typing.Any, path: str = "") -> typing.List[str]:
+    """Return the paths at which existing differs from desired (keys that only existing has are ignored)."""
+    if isinstance(desired, dict) and isinstance(existing, dict):
+        return [
+            change
+            for key, value in desired.items()
+            if not (path == "" and key in _SERVER_FIELDS)
+            for change in changes(value, existing.get(key), f"{path}.{key}" if path else key)
+        ]
+    if isinstance(desired, list) and isinstance(existing, list) and len(desired) == len(existing):
+        return [
+            change
+            for i, (x, y) in enumerate(zip(desired, existing, strict=True))
+            for change in changes(x, y, f"{path}[{i}]")
+        ]
+    return [path] if desired != existing else list()
+
+
+class SearchIndexManager:
+    """Brings FTS vector indexes to the state described by a VectorIndexSpec, through the search service's REST API.
+
+    apply() is idempotent: an index is created if it does not exist, updated (i.e., rebuilt) if its definition differs
+    from ours, and left alone otherwise. It then waits until the index holds as many documents as the collection holds
+    vectors (an index that is still building returns partial results).
+    """
+
+    def __init__(self, conn_string: str, username: str, password: str, port: int = 8094):
+        # couchbase:// becomes http://, and couchbases:// becomes https://.
+        self.base_url = f"{conn_string.replace('couchbase', 'http')}:{port}"
+        self.session = requests.Session()
+        self.session.auth = (username, password)
+        self._secrets = {"conn_string": conn_string, "username": username, "password": password}
+
+    @staticmethod
+    def from_env(env: typing.Mapping[str, str]) -> "SearchIndexManager":
+        return SearchIndexManager(env["CB_CONN_STRING"], env["CB_USERNAME"], env["CB_PASSWORD"])
+
+    def _url(self, spec: VectorIndexSpec, suffix: str = "") -> str:
+        return f"{self.base_url}/api/bucket/{spec.bucket}/scope/{spec.scope}/index/{spec.name}{suffix}"
+
+    def cluster(self):
+        return connections.cluster_for({x: x for x in self._secrets}, self._secrets)
+
+    def document_count(self, spec: VectorIndexSpec) -> int:
+        """Return the number of documents (in spec's collection) that hold a vector."""
+        statement = (
+            f"SELECT RAW COUNT(*) FROM `{spec.bucket}`.`{spec.scope}`.`{spec.collection}` AS d "
+            f"WHERE d.`{spec.vector_field}` IS VALUED"
+        )
+        return next(iter(self.cluster().query(statement).rows()))
+
+    def existing(self, spec: VectorIndexSpec) -> typing.Optional[typing.Dict[str, typing.Any]]:
+        response = self.session.get(self._url(spec))
+        if response.status_code != http.HTTPStatus.OK and "not found" in response.text:
+            return None
+        response.raise_for_status()
+        return response.json()["indexDef"]
+
+    def drop(self, spec: VectorIndexSpec) -> None:
+        response = self.session.delete(self._url(spec))
+        if response.status_code != http.HTTPStatus.OK and "not found" not in response.text:
+            response.raise_for_status()
+
+    def indexed_count(self, spec: VectorIndexSpec) -> int:
+        response = self.session.get(self._url(spec, "/count"))
+        response.raise_for_status()
+        return response.json()["count"]
+
+    def ensure(self, spec: VectorIndexSpec, count: int) -> str:
+        """Create or update spec's index (if needed), returning 'created', 'updated', or 'unchanged'."""
+        existing = self.existing(spec)
+        partitions = spec.partitions
+        if partitions is None and existing is not None:
+            partitions = existing.get("planParams", dict()).get("indexPartitions")
+        desired = spec.definition(partitions if partitions is not None else partitions_for(count))
+        if existing is not None:
+            differences = changes(desired, existing)
+            if len(differences) == 0:
+                return "unchanged"
+            logger.info(f"Index {spec.name} differs from its definition at: {', '.join(differences)}.")
+            # An update must name the index it replaces (or the search service rejects it as a duplicate).
+            desired["uuid"] = existing["uuid"]
+
+        response = self.session.put(self._url(spec), json=desired, headers={"Content-Type": "application/json"})
+        if response.status_code != http.HTTPStatus.OK:
+            raise RuntimeError(f"Could not create / update index {spec.name}: {response.text}")
+        return "created" if existing is None else "updated"
+
+    def wait(self, spec: VectorIndexSpec, expected: int, timeout: float = 600.0, interval: float = 1.0) -> float:
+        """Poll spec's document count (showing our progress) until it reaches expected, returning the seconds waited."""
+        start_time = time.monotonic()
+        while True:
+            elapsed = time.monotonic() - start_time
+            try:
+                indexed = self.indexed_count(spec)
+            except requests.HTTPError:
+                # A new index answers with an error until its partitions have been assigned.
+                indexed = 0
+            rate = indexed / elapsed if elapsed > 0 else 0.0
+            sys.stdout.write(
+                f"\r{spec.name}: {indexed} / {expected} documents indexed "
+                f"({indexed / max(expected, 1):.0%}, {rate:.0f} docs/s, {elapsed:.0f}s)"
+            )
+            sys.stdout.flush()
+            if indexed >= expected:
+                sys.stdout.write("\n")
+                return elapsed
+            if elapsed > timeout:
+                sys.stdout.write("\n")
+                raise TimeoutError(f"Index {spec.name} only holds {indexed} / {expected} documents after {timeout}s.")
+            time.sleep(interval)
+
+    def apply(self, spec: VectorIndexSpec, wait: bool = True, timeout: float = 600.0) -> str:
+        count = self.document_count(spec)
+        status = self.ensure(spec, count)
+        print(f"Index {spec.name} ({count} documents): {status}.")
+        if wait:
+            # Even an unchanged index may still be building (e.g., if a previous run did not wait for it).
+            self.wait(spec, count, timeout)
+        return status
@@ -0,0 +1,377 @@
+import collections
+import concurrent.futures
+import functools
+import inspect
+import json
+import logging
+import numpy
+import pathlib
+import threading
+import time
+import typing
+
+from ..catalog import search
+from ..embedding import batching
+from . import connections
+from . import vector_index
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticCache:
+    """A bounded cache of (query embedding -> search results), hit by any query that is similar enough.
+
+    Query embeddings are kept (normalized) in one matrix (allocated on the first insert), so a lookup is a single
+    matrix-vector product.
+    Entries expire after ttl seconds, and the oldest entry is replaced once max_entries is reached. On every hit, we
+    add the latency of the search that produced the cached results to 'seconds_saved'.
+    """
+
+    def __init__(self, threshold: float = 0.92, max_entries: int = 256, ttl: float = 600.0):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._vectors: typing.Optional[numpy.ndarray] = None
+        self._expires_at = numpy.full(max_entries, -numpy.inf)
+        self._results: typing.List[typing.Any] = [None] * max_entries
+        self._costs = numpy.zeros(max_entries)
+        self._next = 0
+        self._lock = threading.Lock()
+
+        # Our metrics.
+        self.hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+        self._similarity_total = 0.0
+
+    @staticmethod
+    def _normalize(vector: numpy.ndarray) -> numpy.ndarray:
+        vector = numpy.asarray(vector, dtype=numpy.float32).reshape(-1)
+        return vector / max(float(numpy.linalg.norm(vector)), 1e-12)
+
+    def lookup(self, vector: numpy.ndarray) -> typing.Optional[typing.Any]:
+        vector = self._normalize(vector)
+        with self._lock:
+            if self._vectors is None:
+                self.misses += 1
+                return None
+            similarities = self._vectors @ vector
+            similarities[self._expires_at < time.monotonic()] = -numpy.inf
+            best = int(numpy.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.seconds_saved += float(self._costs[best])
+            self._similarity_total += float(similarities[best])
+            return self._results[best]
+
+    def insert(self, vector: numpy.ndarray, results: typing.Any, cost: float) -> None:
+        vector = self._normalize(vector)
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = numpy.zeros((self.max_entries, len(vector)), dtype=numpy.float32)
+
+            # Expired slots are reused first, and then the oldest slot.
+            expired = numpy.flatnonzero(self._expires_at < time.monotonic())
+            slot = int(expired[0]) if len(expired) > 0 else self._next
+            if slot == self._next:
+                self._next = (self._next + 1) % self.max_entries
+            self._vectors[slot] = vector
+            self._expires_at[slot] = time.monotonic() + self.ttl
+            self._results[slot] = results
+            self._costs[slot] = cost
+
+    def clear(self) -> None:
+        with self._lock:
+            self._expires_at[:] = -numpy.inf
+            self._results = [None] * self.max_entries
+
+    def stats(self) -> typing.Dict[str, typing.Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": int(numpy.count_nonzero(self._expires_at >= time.monotonic())),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups > 0 else None,
+                "mean_hit_similarity": self._similarity_total / self.hits if self.hits > 0 else None,
+                "seconds_saved": self.seconds_saved,
+            }
+
+
+@functools.lru_cache
+def _default_executor() -> concurrent.futures.ThreadPoolExecutor:
+    # Our searches mostly wait on the network (the SDK releases the GIL), so a handful of threads is plenty.
+    return concurrent.futures.ThreadPoolExecutor(max_workers=8, thread_name_prefix="semantic-search")
+
+
+def query_texts(value: typing.Union[str, typing.List[str]]) -> typing.List[str]:
+    # A list (e.g., of interests) is searched one (normalized, distinct) item at a time, so order does not matter.
+    if isinstance(value, str):
+        return [value]
+    return sorted({x.strip().lower() for x in value if x.strip()})
+
+
+def reciprocal_rank_fusion(rankings: typing.Iterable[typing.List[str]], k: int = 60) -> typing.List[str]:
+    """Merge several rankings of ids into one, scoring each id by the sum of 1 / (k + rank) over all rankings.
+
+    An id that appears in several rankings is only returned once. RRF only looks at ranks (not scores), so rankings
+    from different queries do not have to be calibrated against each other.
+    """
+    scores = collections.defaultdict(float)
+    for ranking in rankings:
+        for rank, identifier in enumerate(ranking, start=1):
+            scores[identifier] += 1.0 / (k + rank)
+    return sorted(scores, key=lambda x: -scores[x])
+
+
+class SemanticSearchTool:
+    """One semantic_search tool: embed the query, consult the semantic cache, and only then run a vector search.
+
+    The vector search is answered by the tool's LocalVectorIndex (if it has one and it is fresh), and by FTS otherwise.
+
+    A list input (e.g., a user's interests) is not joined into one query. Instead, all items are embedded in one batch,
+    searched in parallel (each through the cache), and the per-item rankings are merged with reciprocal rank fusion,
+    so that one item cannot drown out the others.
+
+    Results are deduplicated by the vector_search 'dedupe_field' (e.g., the URL of the article a chunk was cut from,
+    set with the tool's 'dedupe_field' annotation), so that several chunks of one article are returned only once (as
+    its best chunk). Without one, results are deduplicated by document.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        parameter: str,
+        parameter_type: type,
+        vector_search: typing.Dict,
+        cluster_factory: typing.Callable,
+        cache: typing.Optional[SemanticCache],
+        encoder: typing.Callable[[typing.List[str]], numpy.ndarray] = None,
+        max_results: typing.Optional[int] = None,
+        executor: typing.Optional[concurrent.futures.Executor] = None,
+        local_index: typing.Optional[vector_index.LocalVectorIndex] = None,
+    ):
+        self.name = name
+        self.description = description
+        self.parameter = parameter
+        self.parameter_type = parameter_type
+        self.vector_search = vector_search
+        self.cluster_factory = cluster_factory
+        self.cache = cache
+        self.max_results = max_results
+        self.local_index = local_index
+        self._encoder = encoder
+        self._executor = executor if executor is not None else _default_executor()
+
+    def encode(self, texts: typing.List[str]) -> numpy.ndarray:
+        if self._encoder is None:
+            # Queries of all sessions are encoded together, in micro-batches (see EmbeddingService).
+            self._encoder = batching.shared_service(self.vector_search["embedding_model"]).encode
+        return numpy.asarray(self._encoder(texts), dtype=numpy.float32).reshape(len(texts), -1)
+
+    def search(self, vector: numpy.ndarray) -> typing.List[typing.Tuple[str, str, typing.Optional[str]]]:
+        """Run one vector search, returning the (document id, text, group) triples of the nearest documents (best first).
+
+        The group of a document is the value of its 'dedupe_field' (None if the tool does not declare one).
+        """
+        if self.local_index is not None:
+            results = self.local_index.search(vector, self.vector_search.get("num_candidates", 3))
+            if results is not None:
+                return results
+        return self.search_fts(vector)
+
+    def search_fts(self, vector: numpy.ndarray) -> typing.List[typing.Tuple[str, str, typing.Optional[str]]]:
+        import couchbase.options
+        import couchbase.search
+        import couchbase.vector_search
+
+        config = self.vector_search
+        scope = self.cluster_factory().bucket(config["bucket"]).scope(config["scope"])
+        vector_request = couchbase.vector_search.VectorSearch.from_vector_query(
+            couchbase.vector_search.VectorQuery(
+                config["vector_field"],
+                vector.astype("float64").tolist(),
+                num_candidates=config.get("num_candidates", 3),
+            )
+        )
+        search_request = couchbase.search.SearchRequest.create(couchbase.search.MatchNoneQuery()).with_vector_search(
+            vector_request
+        )
+        # We ask FTS for the text (and dedupe) fields directly. Only if they are not stored in the index, we fetch the
+        # document.
+        text_field, group_field = config["text_field"], config.get("dedupe_field")
+        fields = [text_field] + ([group_field] if group_field else [])
+        result = scope.search(config["index"], search_request, couchbase.options.SearchOptions(fields=fields))
+        collection = scope.collection(config["collection"])
+        results = list()
+        for row in result.rows():
+            document = row.fields if row.fields is not None and all(x in row.fields for x in fields) else None
+            if document is None:
+                document = collection.get(row.id).content_as[dict]
+            results.append((row.id, document[text_field], document.get(group_field) if group_field else None))
+        return results
+
+    def ranked(self, vector: numpy.ndarray) -> typing.List[typing.Tuple[str, str, typing.Optional[str]]]:
+        if self.cache is not None:
+            results = self.cache.lookup(vector)
+            if results is not None:
+                return list(results)
+
+        start_time = time.perf_counter()
+        results = self.search(vector)
+        if self.cache is not None:
+            self.cache.insert(vector, tuple(results), time.perf_counter() - start_time)
+        return results
+
+    def fused(self, value: typing.Union[str, typing.List[str]]) -> typing.List[typing.Tuple[str, str]]:
+        """Return the (document id, text) pairs for value, fused across all of its items (best first).
+
+        Each group (e.g., article) is returned once, as the document that ranked best for any item.
+        """
+        texts = query_texts(value)
+        if len(texts) == 0:
+            return list()
+        vectors = self.encode(texts)
+
+        # A single query is searched on the calling thread (there is nothing to overlap it with).
+        rankings = list(self._executor.map(self.ranked, vectors)) if len(texts) > 1 else [self.ranked(vectors[0])]
+        # Each ranking counts a group once (at the rank of its best document), and a group is represented by the
+        # document with the best rank across all rankings.
+        keys, best = list(), dict()
+        for ranking in rankings:
+            seen = dict()
+            for rank, (identifier, text, group) in enumerate(ranking):
+                key = group if group is not None else identifier
+                seen.setdefault(key, rank)
+                if key not in best or rank < best[key][0]:
+                    best[key] = (rank, identifier, text)
+            keys.append(list(seen))
+        fused = reciprocal_rank_fusion(keys)
+        return [best[key][1:] for key in fused[: self.max_results]]
+
+    def __call__(self, value: typing.Union[str, typing.List[str]]) -> typing.List[str]:
+        return [text for _, text in self.fused(value)]
+
+    def as_function(self) -> typing.Callable[..., typing.List[str]]:
+        def _call(**kwargs) -> typing.List[str]:
+            return self(kwargs[self.parameter])
+
+        _call.__signature__ = inspect.Signature(
+            [inspect.Parameter(self.parameter, inspect.Parameter.KEYWORD_ONLY, annotation=self.parameter_type)],
+            return_annotation=typing.List[str],
+        )
+        _call.__annotations__ = {self.parameter: self.parameter_type, "return": typing.List[str]}
+        _call.__name__ = self.name
+        _call.__qualname__ = self.name
+        _call.__doc__ = self.description
+        return _call
+
+
+class SemanticSearchToolBinder:
+    """Swaps generated semantic_search tool functions for ones that are fronted by a SemanticCache.
+
+    Like SQLPPToolBinder, this reads the local tool catalog to learn each tool's vector search configuration and secrets,
+    and is meant to be used in the decorator of an agentc.Provider. Each tool gets its own cache, and caches are kept
+    across refresh() calls (i.e., across catalog versions) as long as the tool's search configuration is unchanged.
+    Tools that declare 'local_index*' annotations (see LocalIndexPolicy) are also served from a LocalVectorIndex, whose
+    snapshot lives in local_index_dir / <tool name>.
+    """
+
+    def __init__(
+        self,
+        catalog_file: typing.Union[str, pathlib.Path],
+        secrets: typing.Dict[str, str],
+        threshold: float = 0.92,
+        max_entries: int = 256,
+        ttl: float = 600.0,
+        max_results: typing.Optional[int] = None,
+        local_index_dir: typing.Union[str, pathlib.Path] = pathlib.Path(".agent-catalog") / "local-index",
+    ):
+        self.catalog_file = pathlib.Path(catalog_file)
+        self.secrets = secrets
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_results = max_results
+        self.local_index_dir = pathlib.Path(local_index_dir)
+        self.tools: typing.Dict[str, SemanticSearchTool] = dict()
+        self._functions: typing.Dict[str, typing.Callable] = dict()
+        self._caches: typing.Dict[typing.Tuple, SemanticCache] = dict()
+        self._local_indexes: typing.Dict[typing.Tuple, vector_index.LocalVectorIndex] = dict()
+        self.refresh()
+
+    def _cache_for(self, name: str, vector_search: typing.Dict) -> typing.Optional[SemanticCache]:
+        if self.max_entries <= 0:
+            return None
+        key = (name, json.dumps(vector_search, sort_keys=True))
+        if key not in self._caches:
+            self._caches[key] = SemanticCache(self.threshold, self.max_entries, self.ttl)
+        return self._caches[key]
+
+    def _local_index_for(
+        self, name: str, vector_search: typing.Dict, annotations: typing.Optional[typing.Dict], cluster_factory
+    ) -> typing.Optional[vector_index.LocalVectorIndex]:
+        policy = vector_index.LocalIndexPolicy.from_annotations(annotations)
+        if policy is None:
+            return None
+        key = (name, json.dumps(vector_search, sort_keys=True), policy)
+        if key not in self._local_indexes:
+            self._local_indexes[key] = vector_index.LocalVectorIndex(
+                self.local_index_dir / name, vector_search, cluster_factory, policy
+            )
+        return self._local_indexes[key]
+
+    def refresh(self) -> None:
+        """(Re-)read our tools from the local catalog file."""
+        tools = dict()
+        if self.catalog_file.exists():
+            with self.catalog_file.open("r") as fp:
+                items = [x for x in json.load(fp)["items"] if x["record_kind"] == "semantic_search"]
+            for item in items:
+                input_schema = item["input"] if isinstance(item["input"], dict) else json.loads(item["input"])
+                properties = input_schema.get("properties", dict())
+                if len(properties) != 1:
+                    logger.debug(f"Tool {item['name']} does not have exactly one input. It will not be rebound.")
+                    continue
+                parameter, schema = next(iter(properties.items()))
+                annotations = search._item_annotations(item)
+                vector_search = item["vector_search"]
+                if "dedupe_field" in annotations:
+                    vector_search = {**vector_search, "dedupe_field": annotations["dedupe_field"]}
+                couchbase_secrets = next(x["couchbase"] for x in item["secrets"] if "couchbase" in x)
+                cluster_factory = functools.partial(connections.cluster_for, couchbase_secrets, self.secrets)
+                tools[item["name"]] = SemanticSearchTool(
+                    name=item["name"],
+                    description=item["description"],
+                    parameter=parameter,
+                    parameter_type=typing.List[str] if schema.get("type") == "array" else str,
+                    vector_search=vector_search,
+                    cluster_factory=cluster_factory,
+                    cache=self._cache_for(item["name"], vector_search),
+                    max_results=self.max_results,
+                    local_index=self._local_index_for(item["name"], vector_search, annotations, cluster_factory),
+                )
+        else:
+            logger.debug(f"No local catalog found at {self.catalog_file}. Semantic search tools will not be rebound.")
+        self.tools = tools
+        self._functions = {name: tool.as_function() for name, tool in tools.items()}
+
+    def warm(self) -> None:
+        # Loading the embedding models of our tools up front keeps this cost off of the first tool call (the same goes
+        # for loading / refreshing our local indexes).
+        for tool in self.tools.values():
+            tool.encode(["warm up"])
+            if tool.local_index is not None:
+                tool.local_index.warm()
+
+    def stats(self) -> typing.Dict[str, typing.Dict[str, typing.Any]]:
+        return {name: tool.cache.stats() for name, tool in self.tools.items() if tool.cache is not None}
+
+    def local_index_stats(self) -> typing.Dict[str, typing.Dict[str, typing.Any]]:
+        return {name: tool.local_index.stats() for name, tool in self.tools.items() if tool.local_index is not None}
+
+    def __call__(self, func: typing.Callable) -> typing.Callable:
+        return self._functions.get(getattr(func, "__name__", None), func)
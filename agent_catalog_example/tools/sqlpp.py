@@ -0,0 +1,212 @@
+import functools
+import inspect
+import json
+import logging
+import pathlib
+import threading
+import time
+import typing
+
+from . import connections
+
+logger = logging.getLogger(__name__)
+
+# How JSON schema types (of a tool's 'input') map to Python annotations.
+_JSON_TYPES = {"string": str, "integer": int, "number": float, "boolean": bool, "array": list, "object": dict}
+
+
+def strip_header(query: str) -> str:
+    """Remove the leading comments (and /* ... */ metadata) of a .sqlpp tool, leaving only the query itself."""
+    if "*/" in query:
+        query = query[query.index("*/") + 2 :]
+    return query.strip().removesuffix(";")
+
+
+class SQLPPTool:
+    """One SQL++ tool, executed either ad hoc or as a prepared statement (i.e., planned once per query node)."""
+
+    def __init__(
+        self, name: str, description: str, query: str, input_schema: typing.Dict, cluster_factory, adhoc: bool
+    ):
+        self.name = name
+        self.description = description
+        self.query = strip_header(query)
+        self.parameters = input_schema.get("properties", dict())
+        self.adhoc = adhoc
+        self.cluster_factory = cluster_factory
+
+        # Our (client-side) counters, updated by the threads our tools run on.
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def _run(self, named_parameters: typing.Dict[str, typing.Any]) -> typing.List[typing.Any]:
+        import couchbase.options
+
+        # With adhoc=False, the SDK prepares our statement once and then only sends EXECUTE requests (so the query
+        # service does not re-parse and re-plan our query on every call).
+        result = self.cluster_factory().query(
+            self.query, couchbase.options.QueryOptions(adhoc=self.adhoc, named_parameters=named_parameters)
+        )
+        return list(result.rows())
+
+    def execute(self, **kwargs) -> typing.List[typing.Any]:
+        start_time, failed = time.perf_counter(), False
+        try:
+            return self._run(kwargs)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            with self._lock:
+                self.calls += 1
+                self.errors += int(failed)
+                self.seconds += time.perf_counter() - start_time
+
+    def stats(self) -> typing.Dict[str, typing.Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "mean_ms": (self.seconds / self.calls * 1e3) if self.calls > 0 else None,
+            }
+
+    def warm(self) -> None:
+        # Executing with all-null parameters prepares the plan (and returns no rows).
+        self._run({name: None for name in self.parameters})
+
+    def as_function(self) -> typing.Callable[..., typing.List[typing.Any]]:
+        def _call(**kwargs) -> typing.List[typing.Any]:
+            return self.execute(**kwargs)
+
+        annotations = {k: _JSON_TYPES.get(v.get("type"), typing.Any) for k, v in self.parameters.items()}
+        _call.__signature__ = inspect.Signature(
+            [inspect.Parameter(k, inspect.Parameter.KEYWORD_ONLY, annotation=v) for k, v in annotations.items()],
+            return_annotation=typing.List[typing.Any],
+        )
+        _call.__annotations__ = {**annotations, "return": typing.List[typing.Any]}
+        _call.__name__ = self.name
+        _call.__qualname__ = self.name
+        _call.__doc__ = self.description
+        return _call
+
+
+class SQLPPToolBinder:
+    """Swaps generated sqlpp_query tool functions for ones that run as prepared statements (by default).
+
+    Like HTTPToolBinder, this reads the local tool catalog to learn each tool's query and secrets, and is meant to be
+    used in the decorator of an agentc.Provider. Call warm() at startup to prepare all plans before the first tool call,
+    and plan_cache_stats() to see how often the query service reused them.
+    """
+
+    def __init__(
+        self,
+        catalog_file: typing.Union[str, pathlib.Path],
+        secrets: typing.Dict[str, str],
+        adhoc: bool = False,
+        stats_ttl: float = 10.0,
+    ):
+        self.catalog_file = pathlib.Path(catalog_file)
+        self.secrets = secrets
+        self.adhoc = adhoc
+        self.stats_ttl = stats_ttl
+        self._prepareds_cache: typing.Tuple[float, typing.Dict] = (float("-inf"), dict())
+        self._prepareds_lock = threading.Lock()
+        self.tools: typing.Dict[str, SQLPPTool] = dict()
+        self._functions: typing.Dict[str, typing.Callable] = dict()
+        self.refresh()
+
+    def _cluster_factory(self, couchbase_secrets: typing.Dict[str, str]) -> typing.Callable:
+        return functools.partial(connections.cluster_for, couchbase_secrets, self.secrets)
+
+    def refresh(self) -> None:
+        """(Re-)read our tools from the local catalog file."""
+        tools = dict()
+        if self.catalog_file.exists():
+            with self.catalog_file.open("r") as fp:
+                for item in json.load(fp)["items"]:
+                    if item["record_kind"] != "sqlpp_query":
+                        continue
+                    input_schema = item["input"] if isinstance(item["input"], dict) else json.loads(item["input"])
+                    couchbase_secrets = next(x["couchbase"] for x in item["secrets"] if "couchbase" in x)
+                    tools[item["name"]] = SQLPPTool(
+                        name=item["name"],
+                        description=item["description"],
+                        query=item["query"],
+                        input_schema=input_schema,
+                        cluster_factory=self._cluster_factory(couchbase_secrets),
+                        adhoc=self.adhoc,
+                    )
+        else:
+            logger.debug(f"No local catalog found at {self.catalog_file}. SQL++ tools will not be rebound.")
+        self.tools = tools
+        self._functions = {name: tool.as_function() for name, tool in tools.items()}
+
+    def warm(self) -> None:
+        if self.adhoc:
+            return
+        for tool in self.tools.values():
+            try:
+                tool.warm()
+            except Exception as e:
+                # A cold plan is not fatal (the first tool call will prepare it instead).
+                logger.warning(f"Could not prepare the plan for {tool.name}: {e}")
+
+    def _prepareds(self) -> typing.Dict[str, typing.Tuple[int, int]]:
+        """The (uses, plans) of each tool's prepared statements, read from system:prepareds with one query per cluster
+        (the SDK names prepared statements itself, so we match them to our tools by their statement)."""
+        import couchbase.options
+
+        by_cluster = dict()
+        for tool in self.tools.values():
+            if tool.calls > 0:
+                cluster = tool.cluster_factory()
+                by_cluster.setdefault(id(cluster), (cluster, list()))[1].append(tool)
+
+        prepareds = dict()
+        for cluster, tools in by_cluster.values():
+            try:
+                rows = cluster.query(
+                    "SELECT p.statement, p.uses FROM system:prepareds p "
+                    "WHERE ANY q IN $queries SATISFIES CONTAINS(p.statement, q) END",
+                    couchbase.options.QueryOptions(named_parameters={"queries": [x.query for x in tools]}),
+                )
+                rows = list(rows.rows())
+            except Exception as e:
+                logger.warning(f"Could not read system:prepareds for {[x.name for x in tools]}: {e}")
+                continue
+            for tool in tools:
+                uses = [row.get("uses") or 0 for row in rows if tool.query in row["statement"]]
+                prepareds[tool.name] = (sum(uses), len(uses))
+        return prepareds
+
+    def plan_cache_stats(self) -> typing.Dict[str, typing.Dict[str, typing.Any]]:
+        """Per-tool call counts, and (if prepared) the plan reuse reported by the query service's system:prepareds.
+
+        The latter is cached for stats_ttl seconds, so that polling this (e.g., /metrics) does not load the cluster.
+        """
+        prepareds = dict()
+        if not self.adhoc:
+            with self._prepareds_lock:
+                fetched, prepareds = self._prepareds_cache
+                if time.monotonic() - fetched >= self.stats_ttl:
+                    prepareds = self._prepareds()
+                    self._prepareds_cache = (time.monotonic(), prepareds)
+
+        stats = dict()
+        for name, tool in self.tools.items():
+            stats[name] = tool.stats()
+            if name in prepareds:
+                uses, plans = prepareds[name]
+                stats[name].update(
+                    {
+                        "prepared_uses": uses,
+                        "prepared_plans": plans,
+                        "plan_cache_hit_rate": (uses - plans) / uses if uses > 0 else None,
+                    }
+                )
+        return stats
+
+    def __call__(self, func: typing.Callable) -> typing.Callable:
+        return self._functions.get(getattr(func, "__name__", None), func)
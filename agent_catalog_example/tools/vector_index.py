@@ -0,0 +1,593 @@
+import heapq
+import json
+import logging
+import math
+import numpy
+import os
+import pathlib
+import threading
+import time
+import typing
+
+logger = logging.getLogger(__name__)
+
+# How a local index searches its vectors: by brute force (exact), or by walking an HNSW graph (approximate, but
+# sub-linear). 'auto' picks 'exact' up to EXACT_MAX_ROWS documents (where one matrix-vector product is fast enough).
+KINDS = {"exact", "hnsw", "auto"}
+SIMILARITIES = {"dot_product", "l2_norm"}
+EXACT_MAX_ROWS = 20_000
+
+# A local index is persisted as a snapshot directory, holding the following files:
+# 1. vectors.npy -- an (N x D) float32 matrix, where row i holds the vector of document i.
+# 2. links.npy -- an (N x 2M) int32 matrix, where row i holds the level 0 neighbors of row i (-1 padded, HNSW only).
+# 3. documents.json -- the (id, text, group) triple of each row (see VectorIndex).
+# 4. meta.json -- everything else (e.g., the rows of updated / deleted documents, our watermark), written last.
+# Both .npy files are memory-mapped on load, and are only copied into memory once the index is updated.
+
+
+class LocalIndexPolicy(typing.NamedTuple):
+    """How a semantic_search tool is served locally, declared with the 'local_index*' annotations of the tool, e.g.:
+
+    annotations:
+      local_index: "auto"                      # exact, hnsw, or auto (mandatory, this enables the local index)
+      local_index_max_staleness: "300"         # seconds (optional, defaults to 300)
+      local_index_similarity: "l2_norm"        # should match the FTS index (optional, defaults to dot_product)
+    """
+
+    kind: str
+    max_staleness: float
+    similarity: str
+
+    @staticmethod
+    def from_annotations(annotations: typing.Optional[typing.Dict[str, str]]) -> typing.Optional["LocalIndexPolicy"]:
+        if annotations is None or "local_index" not in annotations:
+            return None
+        policy = LocalIndexPolicy(
+            kind=annotations["local_index"],
+            max_staleness=float(annotations.get("local_index_max_staleness", 300)),
+            similarity=annotations.get("local_index_similarity", "dot_product"),
+        )
+        if policy.kind not in KINDS:
+            raise ValueError(f"Unknown local index kind '{policy.kind}' (expected one of {KINDS}).")
+        if policy.similarity not in SIMILARITIES:
+            raise ValueError(f"Unknown similarity '{policy.similarity}' (expected one of {SIMILARITIES}).")
+        return policy
+
+
+class VectorStore:
+    """A growable (N x D) float32 matrix, which scores its rows against a query (higher is more similar).
+
+    For 'l2_norm', a row x is scored with 2 * x.q - |x|^2 (i.e., -|x - q|^2 up to a constant), so both similarities
+    rank rows in the same order as FTS would.
+    """
+
+    def __init__(self, dims: int, similarity: str = "dot_product", vectors: typing.Optional[numpy.ndarray] = None):
+        self.dims = dims
+        self.similarity = similarity
+        self._data = vectors if vectors is not None else numpy.zeros((0, dims), dtype=numpy.float32)
+        self.count = len(self._data)
+        self._norms = (self._data**2).sum(axis=1) if similarity == "l2_norm" else None
+
+    @property
+    def matrix(self) -> numpy.ndarray:
+        return self._data[: self.count]
+
+    def vector(self, row: int) -> numpy.ndarray:
+        return numpy.array(self._data[row])
+
+    def append(self, vectors: numpy.ndarray) -> int:
+        """Append vectors (copying a memory-mapped matrix first), returning the row of the first one."""
+        vectors = numpy.asarray(vectors, dtype=numpy.float32).reshape(-1, self.dims)
+        first = self.count
+        if self.count + len(vectors) > len(self._data) or not self._data.flags.writeable:
+            capacity = max(2 * len(self._data), self.count + len(vectors), 64)
+            data = numpy.zeros((capacity, self.dims), dtype=numpy.float32)
+            data[: self.count] = self._data[: self.count]
+            self._data = data
+            if self._norms is not None:
+                norms = numpy.zeros(capacity, dtype=numpy.float32)
+                norms[: self.count] = self._norms[: self.count]
+                self._norms = norms
+        self._data[first : first + len(vectors)] = vectors
+        if self._norms is not None:
+            self._norms[first : first + len(vectors)] = (vectors**2).sum(axis=1)
+        self.count += len(vectors)
+        return first
+
+    def scores(self, query: numpy.ndarray, rows: typing.Optional[typing.List[int]] = None) -> numpy.ndarray:
+        vectors = self._data[: self.count] if rows is None else self._data[rows]
+        scores = vectors @ query
+        if self._norms is not None:
+            norms = self._norms[: self.count] if rows is None else self._norms[rows]
+            scores = 2 * scores - norms
+        return scores
+
+    def similarities(self, query: numpy.ndarray, rows: typing.List[int]) -> numpy.ndarray:
+        # Unlike scores(), these can be compared across queries (for 'l2_norm', they are negated squared distances).
+        scores = self.scores(query, rows)
+        return scores - float(query @ query) if self._norms is not None else scores
+
+    def pairwise(self, rows: typing.List[int]) -> numpy.ndarray:
+        # The similarities of all pairs of rows (comparable like those of similarities()).
+        vectors = self._data[rows]
+        similarities = vectors @ vectors.T
+        if self._norms is not None:
+            norms = self._norms[rows]
+            similarities = 2 * similarities - norms[:, None] - norms[None, :]
+        return similarities
+
+
+class HNSWGraph:
+    """A hierarchical navigable small world graph over the rows of a VectorStore (see Malkov & Yashunin, 2016).
+
+    Every row is a node of level 0, and a row reaches each higher level with probability 1 / m. A search descends
+    greedily from the top level, and then runs a best-first (beam) search of width ef over level 0. Level 0 neighbors
+    (at most 2m per node) live in one int32 matrix, so they can be persisted and memory-mapped like our vectors. The
+    (few) nodes of the higher levels live in dictionaries.
+    """
+
+    def __init__(self, store: VectorStore, m: int = 16, ef_construction: int = 100, seed: int = 0):
+        self.store = store
+        self.m = m
+        self.ef_construction = ef_construction
+        self.entry: typing.Optional[int] = None
+        self.max_level = 0
+        self.upper: typing.List[typing.Dict[int, typing.List[int]]] = list()
+        self._links = numpy.full((0, 2 * m), -1, dtype=numpy.int32)
+        self._random = numpy.random.default_rng(seed)
+
+    def _degree(self, level: int) -> int:
+        return 2 * self.m if level == 0 else self.m
+
+    def neighbors(self, node: int, level: int) -> typing.List[int]:
+        if level == 0:
+            links = self._links[node]
+            return links[links >= 0].tolist()
+        return self.upper[level - 1][node]
+
+    def _set_neighbors(self, node: int, level: int, neighbors: typing.List[int]) -> None:
+        if level == 0:
+            self._links[node] = -1
+            self._links[node, : len(neighbors)] = neighbors
+        else:
+            self.upper[level - 1][node] = neighbors
+
+    def _search_layer(
+        self, query: numpy.ndarray, entries: typing.List[int], ef: int, level: int
+    ) -> typing.List[typing.Tuple[float, int]]:
+        scores = self.store.scores(query, entries).tolist()
+        visited = set(entries)
+        candidates = [(-score, node) for score, node in zip(scores, entries, strict=True)]
+        heapq.heapify(candidates)
+        results = heapq.nlargest(ef, zip(scores, entries, strict=True))
+        heapq.heapify(results)
+        while len(candidates) > 0:
+            negative_score, node = heapq.heappop(candidates)
+            if len(results) >= ef and -negative_score < results[0][0]:
+                break
+            unvisited = [x for x in self.neighbors(node, level) if x not in visited]
+            if len(unvisited) == 0:
+                continue
+            visited.update(unvisited)
+            for score, neighbor in zip(self.store.scores(query, unvisited).tolist(), unvisited, strict=True):
+                if len(results) < ef or score > results[0][0]:
+                    heapq.heappush(candidates, (-score, neighbor))
+                    heapq.heappush(results, (score, neighbor))
+                    if len(results) > ef:
+                        heapq.heappop(results)
+        return sorted(results, reverse=True)
+
+    def _select(self, vector: numpy.ndarray, candidates: typing.List[int], m: int) -> typing.List[int]:
+        # The paper's heuristic: a candidate (closest first) is only linked if it is closer to vector than to any
+        # neighbor selected so far, so that links point in diverse directions. Remaining slots go to the closest of the
+        # skipped candidates.
+        similarities = self.store.similarities(vector, candidates)
+        pairwise = self.store.pairwise(candidates)
+        closest = numpy.full(len(candidates), -numpy.inf)
+        selected, skipped = list(), list()
+        for i in numpy.argsort(-similarities).tolist():
+            if len(selected) >= m:
+                break
+            if similarities[i] > closest[i]:
+                selected.append(i)
+                closest = numpy.maximum(closest, pairwise[i])
+            else:
+                skipped.append(i)
+        return [candidates[i] for i in selected + skipped[: m - len(selected)]]
+
+    def _connect(self, node: int, new: int, level: int) -> None:
+        neighbors = self.neighbors(node, level) + [new]
+        if len(neighbors) > self._degree(level):
+            neighbors = self._select(self.store.vector(node), neighbors, self._degree(level))
+        self._set_neighbors(node, level, neighbors)
+
+    def add(self, row: int) -> None:
+        if row >= len(self._links) or not self._links.flags.writeable:
+            links = numpy.full((max(2 * len(self._links), row + 1, 64), 2 * self.m), -1, dtype=numpy.int32)
+            links[: len(self._links)] = self._links
+            self._links = links
+        vector = self.store.vector(row)
+        level = int(-math.log(1.0 - self._random.random()) / math.log(self.m))
+        while len(self.upper) < level:
+            self.upper.append(dict())
+        for i in range(1, level + 1):
+            self.upper[i - 1][row] = list()
+        if self.entry is None:
+            self.entry, self.max_level = row, level
+            return
+
+        entries = [self.entry]
+        for i in range(self.max_level, level, -1):
+            entries = [self._search_layer(vector, entries, 1, i)[0][1]]
+        for i in range(min(level, self.max_level), -1, -1):
+            found = self._search_layer(vector, entries, self.ef_construction, i)
+            selected = self._select(vector, [node for _, node in found if node != row], self.m)
+            self._set_neighbors(row, i, selected)
+            for node in selected:
+                self._connect(node, row, i)
+            entries = [node for _, node in found]
+        if level > self.max_level:
+            self.entry, self.max_level = row, level
+
+    def search(self, query: numpy.ndarray, k: int, ef: int) -> typing.List[typing.Tuple[float, int]]:
+        if self.entry is None:
+            return list()
+        entries = [self.entry]
+        for i in range(self.max_level, 0, -1):
+            entries = [self._search_layer(query, entries, 1, i)[0][1]]
+        return self._search_layer(query, entries, max(ef, k), 0)[:k]
+
+    def save(self, directory: pathlib.Path) -> typing.Dict:
+        _save_array(directory / "links.npy", self._links[: self.store.count])
+        return {
+            "m": self.m,
+            "ef_construction": self.ef_construction,
+            "entry": self.entry,
+            "max_level": self.max_level,
+            "upper": [{str(node): links for node, links in level.items()} for level in self.upper],
+        }
+
+    @staticmethod
+    def load(store: VectorStore, directory: pathlib.Path, meta: typing.Dict) -> "HNSWGraph":
+        graph = HNSWGraph(store, m=meta["m"], ef_construction=meta["ef_construction"])
+        graph._links = numpy.load(directory / "links.npy", mmap_mode="r")
+        graph.entry, graph.max_level = meta["entry"], meta["max_level"]
+        graph.upper = [{int(node): links for node, links in level.items()} for level in meta["upper"]]
+        return graph
+
+
+def _save_array(path: pathlib.Path, array: numpy.ndarray) -> None:
+    # We write to a temporary file first, so that a reader never maps a half-written file.
+    with path.with_suffix(".tmp").open("wb") as fp:
+        numpy.save(fp, array)
+    os.replace(path.with_suffix(".tmp"), path)
+
+
+class VectorIndex:
+    """An in-process vector index over (document id, text, vector) triples, searched exactly or through an HNSWGraph.
+
+    Each document may also carry a group (e.g., the URL of the article a chunk was cut from), see group().
+
+    An updated document gets a new row, and its previous row (like the row of a deleted document) is only marked dead.
+    Dead rows are skipped by searches until the index is rebuilt.
+    """
+
+    def __init__(
+        self,
+        dims: int,
+        kind: str = "exact",
+        similarity: str = "dot_product",
+        m: int = 16,
+        ef_construction: int = 100,
+        ef_search: int = 64,
+    ):
+        self.kind = kind
+        self.ef_search = ef_search
+        self.store = VectorStore(dims, similarity)
+        self.graph = HNSWGraph(self.store, m, ef_construction) if kind == "hnsw" else None
+        self.identifiers: typing.List[str] = list()
+        self.texts: typing.List[str] = list()
+        self.groups: typing.List[typing.Optional[str]] = list()
+        self.dead: typing.Set[int] = set()
+        self._rows: typing.Dict[str, int] = dict()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def upsert(
+        self,
+        identifiers: typing.List[str],
+        texts: typing.List[str],
+        vectors: numpy.ndarray,
+        groups: typing.Optional[typing.List[typing.Optional[str]]] = None,
+    ) -> None:
+        first = self.store.append(vectors)
+        groups = groups if groups is not None else [None] * len(identifiers)
+        for row, (identifier, text, group) in enumerate(zip(identifiers, texts, groups, strict=True), start=first):
+            if identifier in self._rows:
+                self.dead.add(self._rows[identifier])
+            self._rows[identifier] = row
+            self.identifiers.append(identifier)
+            self.texts.append(text)
+            self.groups.append(group)
+            if self.graph is not None:
+                self.graph.add(row)
+
+    def delete(self, identifiers: typing.Iterable[str]) -> None:
+        for identifier in identifiers:
+            if identifier in self._rows:
+                self.dead.add(self._rows.pop(identifier))
+
+    def group(self, identifier: str) -> typing.Optional[str]:
+        row = self._rows.get(identifier)
+        return self.groups[row] if row is not None else None
+
+    def search(self, vector: numpy.ndarray, k: int) -> typing.List[typing.Tuple[str, str, float]]:
+        """Return the (document id, text, score) triples of the k nearest (live) documents (best first)."""
+        query = numpy.asarray(vector, dtype=numpy.float32).reshape(-1)
+        k = min(k, len(self))
+        if k <= 0:
+            return list()
+        if self.graph is None:
+            scores = self.store.scores(query)
+            if len(self.dead) > 0:
+                scores[list(self.dead)] = -numpy.inf
+            top = numpy.argpartition(-scores, k - 1)[:k]
+            found = [(float(scores[row]), int(row)) for row in top[numpy.argsort(-scores[top])]]
+        else:
+            # Dead rows still route the search, so we widen the beam until we have k live rows (or all of them).
+            ef = self.ef_search
+            while True:
+                found = [x for x in self.graph.search(query, k + len(self.dead), ef) if x[1] not in self.dead]
+                if len(found) >= k or ef >= self.store.count:
+                    break
+                ef *= 2
+        return [(self.identifiers[row], self.texts[row], score) for score, row in found[:k]]
+
+    def save(self, directory: pathlib.Path, **extra) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+        _save_array(directory / "vectors.npy", self.store.matrix)
+        meta = {
+            "kind": self.kind,
+            "similarity": self.store.similarity,
+            "dims": self.store.dims,
+            "count": self.store.count,
+            "ef_search": self.ef_search,
+            "dead": sorted(self.dead),
+            "graph": self.graph.save(directory) if self.graph is not None else None,
+            **extra,
+        }
+        with (directory / "documents.tmp").open("w") as fp:
+            json.dump([list(x) for x in zip(self.identifiers, self.texts, self.groups, strict=True)], fp)
+        os.replace(directory / "documents.tmp", directory / "documents.json")
+        with (directory / "meta.tmp").open("w") as fp:
+            json.dump(meta, fp)
+        os.replace(directory / "meta.tmp", directory / "meta.json")
+
+    @staticmethod
+    def load(directory: pathlib.Path) -> typing.Tuple["VectorIndex", typing.Dict]:
+        """Load the snapshot in directory, returning the index and the snapshot's metadata."""
+        with (directory / "meta.json").open("r") as fp:
+            meta = json.load(fp)
+        with (directory / "documents.json").open("r") as fp:
+            documents = json.load(fp)[: meta["count"]]
+
+        index = VectorIndex(meta["dims"], meta["kind"], meta["similarity"], ef_search=meta["ef_search"])
+        index.store = VectorStore(
+            meta["dims"], meta["similarity"], numpy.load(directory / "vectors.npy", mmap_mode="r")[: meta["count"]]
+        )
+        if meta["graph"] is not None:
+            index.graph = HNSWGraph.load(index.store, directory, meta["graph"])
+        index.identifiers = [x[0] for x in documents]
+        index.texts = [x[1] for x in documents]
+        index.groups = [x[2] if len(x) > 2 else None for x in documents]
+        index.dead = set(meta["dead"])
+        index._rows = {x: row for row, x in enumerate(index.identifiers) if row not in index.dead}
+        return index, meta
+
+
+class LocalVectorIndex:
+    """A VectorIndex that mirrors the vectors of a semantic_search tool's collection, so searches skip the FTS service.
+
+    The index is built from (and refreshed against) the documents of the tool's vector_search configuration. A refresh
+    only fetches the documents whose CAS is above our watermark (i.e., that changed since the last refresh), and only
+    rebuilds the index when documents were deleted or too many rows are dead. CAS values come from per-vBucket (hybrid
+    logical) clocks, so a document written on a vBucket whose clock lags behind can get a CAS below our watermark: each
+    refresh also re-fetches the last cas_skew seconds below the watermark, and skips the documents it already has. The index is persisted as a snapshot after
+    every refresh, so a restarted process can serve from it right away.
+    search() returns None if the index is older than max_staleness (the caller should then fall back to FTS). An index
+    that is more than half as old is refreshed in the background.
+    """
+
+    def __init__(
+        self,
+        directory: typing.Union[str, pathlib.Path],
+        vector_search: typing.Dict,
+        cluster_factory: typing.Callable,
+        policy: LocalIndexPolicy,
+        exact_max_rows: int = EXACT_MAX_ROWS,
+        max_dead_ratio: float = 0.25,
+        retry_after: float = 30.0,
+        cas_skew: float = 60.0,
+    ):
+        self.directory = pathlib.Path(directory)
+        self.vector_search = vector_search
+        self.cluster_factory = cluster_factory
+        self.policy = policy
+        self.exact_max_rows = exact_max_rows
+        self.max_dead_ratio = max_dead_ratio
+        self.retry_after = retry_after
+        self.cas_skew = cas_skew
+        self.index: typing.Optional[VectorIndex] = None
+        self.watermark = 0
+        self.recent: typing.Dict[str, int] = dict()
+        self.refreshed_at = -math.inf
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refresher: typing.Optional[threading.Thread] = None
+        self._retry_at = -math.inf
+
+        # Our metrics.
+        self.searches = 0
+        self.fallbacks = 0
+        self.refreshes = 0
+        self.rebuilds = 0
+        self.failed_refreshes = 0
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.refreshed_at
+
+    def is_fresh(self) -> bool:
+        return self.index is not None and self.age <= self.policy.max_staleness
+
+    def load(self) -> bool:
+        """Load our snapshot (if we have one and it was built for the same configuration)."""
+        if not (self.directory / "meta.json").exists():
+            return False
+        try:
+            index, meta = VectorIndex.load(self.directory)
+            watermark, refreshed_at, recent = meta["watermark"], meta["refreshed_at"], meta.get("recent", dict())
+        except (OSError, ValueError, KeyError, IndexError) as e:
+            # A corrupt (or partially written) snapshot is rebuilt from the collection by our next refresh.
+            logger.warning(f"Ignoring the local index snapshot in {self.directory} (it could not be loaded): {e}")
+            return False
+        if meta.get("vector_search") != self.vector_search or meta["similarity"] != self.policy.similarity:
+            logger.debug(f"Ignoring the local index snapshot in {self.directory} (its configuration has changed).")
+            return False
+        with self._lock:
+            self.index, self.watermark, self.refreshed_at, self.recent = index, watermark, refreshed_at, recent
+        return True
+
+    def _source(self) -> str:
+        config = self.vector_search
+        return f"`{config['bucket']}`.`{config['scope']}`.`{config['collection']}` AS d"
+
+    def _fetch(self, cluster, watermark: int) -> typing.List[typing.Dict]:
+        import couchbase.options
+
+        config = self.vector_search
+        group = f"d.`{config['dedupe_field']}`" if config.get("dedupe_field") else "NULL"
+        statement = (
+            f"SELECT META(d).id AS id, META(d).cas AS cas, d.`{config['vector_field']}` AS vec, "
+            f"d.`{config['text_field']}` AS text, {group} AS `group` FROM {self._source()} "
+            f"WHERE d.`{config['vector_field']}` IS VALUED AND META(d).cas > $watermark"
+        )
+        options = couchbase.options.QueryOptions(named_parameters={"watermark": watermark})
+        return list(cluster.query(statement, options).rows())
+
+    def _count(self, cluster) -> int:
+        statement = (
+            f"SELECT RAW COUNT(*) FROM {self._source()} WHERE d.`{self.vector_search['vector_field']}` IS VALUED"
+        )
+        return next(iter(cluster.query(statement).rows()))
+
+    def _new_index(self, count: int, dims: int) -> VectorIndex:
+        kind = self.policy.kind
+        if kind == "auto":
+            kind = "exact" if count <= self.exact_max_rows else "hnsw"
+        return VectorIndex(dims, kind, self.policy.similarity)
+
+    def refresh(self) -> None:
+        """Bring our index up to date with the collection (and persist it)."""
+        with self._refresh_lock:
+            try:
+                cluster = self.cluster_factory()
+                index, watermark, recent = self.index, self.watermark, dict(self.recent)
+                skew = int(self.cas_skew * 1e9)  # CAS values are in nanoseconds.
+                rebuild = index is None or len(index.dead) > self.max_dead_ratio * max(len(index), 1)
+                rows = self._fetch(cluster, 0 if rebuild else max(watermark - skew, 0))
+                if not rebuild:
+                    # Our overlap window returns the documents we fetched last time as well, which we do not re-add.
+                    rows = [x for x in rows if recent.get(x["id"]) != x["cas"]]
+                if not rebuild and len(rows) > 0:
+                    with self._lock:
+                        index.upsert(
+                            [x["id"] for x in rows],
+                            [x["text"] for x in rows],
+                            numpy.asarray([x["vec"] for x in rows], dtype=numpy.float32),
+                            [x.get("group") for x in rows],
+                        )
+                    watermark = max(watermark, *(x["cas"] for x in rows))
+                    recent.update((x["id"], x["cas"]) for x in rows)
+
+                # A deletion does not leave a CAS behind, so we only notice it by counting.
+                if not rebuild and self._count(cluster) != len(index):
+                    rebuild, rows = True, self._fetch(cluster, 0)
+                if rebuild:
+                    dims = len(rows[0]["vec"]) if len(rows) > 0 else 0
+                    index = self._new_index(len(rows), dims)
+                    if len(rows) > 0:
+                        index.upsert(
+                            [x["id"] for x in rows],
+                            [x["text"] for x in rows],
+                            numpy.asarray([x["vec"] for x in rows], dtype=numpy.float32),
+                            [x.get("group") for x in rows],
+                        )
+                    watermark = max((x["cas"] for x in rows), default=0)
+                    recent = {x["id"]: x["cas"] for x in rows}
+                    self.rebuilds += 1
+                recent = {k: v for k, v in recent.items() if v > watermark - skew}
+
+                refreshed_at = time.time()
+                if rebuild or len(rows) > 0:
+                    index.save(
+                        self.directory,
+                        vector_search=self.vector_search,
+                        watermark=watermark,
+                        recent=recent,
+                        refreshed_at=refreshed_at,
+                    )
+                with self._lock:
+                    self.index, self.watermark, self.refreshed_at, self.recent = index, watermark, refreshed_at, recent
+                self.refreshes += 1
+                logger.debug(f"Refreshed the local index in {self.directory} ({len(index)} documents).")
+            except Exception as e:
+                self.failed_refreshes += 1
+                self._retry_at = time.monotonic() + self.retry_after
+                logger.warning(f"Could not refresh the local index in {self.directory}: {e}")
+
+    def warm(self) -> None:
+        if not self.load() or self.age > self.policy.max_staleness / 2:
+            self.refresh()
+
+    def refresh_in_background(self) -> None:
+        # After a failed refresh, we wait a little before asking the cluster again.
+        if time.monotonic() < self._retry_at:
+            return
+        if self._refresher is None or not self._refresher.is_alive():
+            self._refresher = threading.Thread(target=self.refresh, name="local-index-refresh", daemon=True)
+            self._refresher.start()
+
+    def search(
+        self, vector: numpy.ndarray, k: int
+    ) -> typing.Optional[typing.List[typing.Tuple[str, str, typing.Optional[str]]]]:
+        """Return the (document id, text, group) triples of the k nearest documents, or None if our index is stale.
+
+        The group of a document is the value of its vector_search 'dedupe_field' (None if there is no such field).
+        """
+        if self.index is None or self.age > self.policy.max_staleness / 2:
+            self.refresh_in_background()
+        if not self.is_fresh():
+            self.fallbacks += 1
+            return None
+        with self._lock:
+            results = [
+                (identifier, text, self.index.group(identifier)) for identifier, text, _ in self.index.search(vector, k)
+            ]
+        self.searches += 1
+        return results
+
+    def stats(self) -> typing.Dict[str, typing.Any]:
+        index = self.index
+        return {
+            "kind": index.kind if index is not None else None,
+            "documents": len(index) if index is not None else 0,
+            "dead_rows": len(index.dead) if index is not None else 0,
+            "age_seconds": self.age if index is not None else None,
+            "searches": self.searches,
+            "fallbacks": self.fallbacks,
+            "refreshes": self.refreshes,
+            "rebuilds": self.rebuilds,
+            "failed_refreshes": self.failed_refreshes,
+        }
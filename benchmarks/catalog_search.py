@@ -0,0 +1,113 @@
+import argparse
+import functools
+import json
+import numpy
+import pathlib
+import tempfile
+import time
+import typing
+
+from agent_catalog_example.catalog import search
+from agent_catalog_example.catalog import sidecar
+
+# Usage (from the repository root): python -m benchmarks.catalog_search [--sizes 10 100 1000]
+
+# Synthetic annotations, roughly in the spirit of the ones used by our examples.
+_FRAMEWORKS = ["controlflow", "langgraph", "llamaindex", "crewai"]
+_BOOLEANS = ["true", "false"]
+
+
+def make_catalog(n: int, dims: int, rng: numpy.random.Generator) -> typing.Dict:
+    vectors = rng.standard_normal((n, dims), dtype=numpy.float32)
+    vectors /= numpy.linalg.norm(vectors, axis=1, keepdims=True)
+    items = list()
+    for i in range(n):
+        items.append(
+            {
+                "identifier": f"synthetic/item_{i}.prompt:item_{i}:git_0",
+                "name": f"item_{i}",
+                "description": f"Synthetic catalog item #{i}.",
+                "record_kind": "raw_prompt",
+                "annotations": {
+                    "framework": _FRAMEWORKS[rng.integers(len(_FRAMEWORKS))],
+                    "gdpr_2016_compliant": _BOOLEANS[rng.integers(2)],
+                },
+                "embedding": vectors[i].tolist(),
+            }
+        )
+    return {"embedding_model": "synthetic", "kind": "prompt", "items": items}
+
+
+def naive_search(
+    items: typing.List[typing.Dict], query: numpy.ndarray, annotations: typing.Dict[str, str], limit: int
+) -> typing.List[typing.Dict]:
+    # This mirrors a per-item search: filter in Python, then compute one cosine similarity per surviving item.
+    candidates = [x for x in items if all(x["annotations"].get(k) == v for k, v in annotations.items())]
+    scored = list()
+    for item in candidates:
+        vector = numpy.asarray(item["embedding"])
+        scored.append((float(vector @ query / (numpy.linalg.norm(vector) * numpy.linalg.norm(query))), item))
+    return [x[1] for x in sorted(scored, key=lambda s: s[0], reverse=True)[:limit]]
+
+
+def time_per_call(fn: typing.Callable, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare naive and indexed catalog search as the catalog grows.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1_000, 10_000, 50_000])
+    parser.add_argument("--dims", type=int, default=384)
+    parser.add_argument("--limit", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=64, help="Number of queries in the batched search.")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    annotations = {"framework": "controlflow", "gdpr_2016_compliant": "true"}
+    rng = numpy.random.default_rng(42)
+    print(
+        f"{'items':>8} | {'load json (ms)':>14} | {'load sidecar (ms)':>17} | {'naive (ms)':>10} | "
+        f"{'indexed (ms)':>12} | {'batched / query (ms)':>20} | {'speedup':>7}"
+    )
+    for size in args.sizes:
+        catalog = make_catalog(size, args.dims, rng)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            catalog_file = pathlib.Path(temp_dir) / "prompt-catalog.json"
+            with catalog_file.open("w") as fp:
+                json.dump(catalog, fp)
+            sidecar.write_sidecar(catalog_file)
+
+            start = time.perf_counter()
+            with catalog_file.open("r") as fp:
+                numpy.array([x["embedding"] for x in json.load(fp)["items"]], dtype=numpy.float32)
+            load_json_time = time.perf_counter() - start
+            start = time.perf_counter()
+            sidecar.load_sidecar(catalog_file, check_freshness=False)
+            load_sidecar_time = time.perf_counter() - start
+
+            index = search.CatalogIndex.from_catalog(catalog_file)
+            index.search(rng.standard_normal(args.dims, dtype=numpy.float32), annotations, args.limit)
+            queries = rng.standard_normal((args.queries, args.dims), dtype=numpy.float32)
+            naive_time = time_per_call(
+                functools.partial(naive_search, catalog["items"], queries[0], annotations, args.limit),
+                max(1, args.repeat // 10) if size >= 10_000 else args.repeat,
+            )
+            indexed_time = time_per_call(
+                functools.partial(index.search, queries[0], annotations, args.limit), args.repeat
+            )
+            batched_time = time_per_call(
+                functools.partial(index.search_vectors, queries, annotations, args.limit), args.repeat
+            ) / len(queries)
+
+            # Sanity check: both approaches should agree.
+            expected = [x["name"] for x in naive_search(catalog["items"], queries[0], annotations, args.limit)]
+            actual = [x.item["name"] for x in index.search(queries[0], annotations, args.limit)]
+            assert expected == actual, f"Indexed search disagrees with naive search: {expected} vs. {actual}"
+            print(
+                f"{size:>8} | {load_json_time * 1e3:>14.2f} | {load_sidecar_time * 1e3:>17.2f} | "
+                f"{naive_time * 1e3:>10.3f} | {indexed_time * 1e3:>12.3f} | {batched_time * 1e3:>20.4f} | "
+                f"{naive_time / indexed_time:>6.1f}x"
+            )
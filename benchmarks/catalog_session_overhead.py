@@ -0,0 +1,94 @@
+import argparse
+import hashlib
+import numpy
+import pathlib
+import statistics
+import time
+import typing
+
+from agent_catalog_example.catalog import cache
+from agent_catalog_example.catalog import provider
+
+# Usage (from the repository root): python -m benchmarks.catalog_session_overhead --catalog travel_agent/.agent-catalog
+
+# The prompt lookups made by one "trip planning" session of our travel agent (see travel_agent/src/agent/agent_c.py).
+_SESSION_QUERIES = [
+    "getting user intent",
+    "suggesting destination",
+    "getting closest airport",
+    "getting user location",
+    "getting closest airport",
+    "finding travel routes",
+    "formatting flight plan",
+    "returning flight plan",
+    "after addressing a user's request.",
+]
+
+
+class ByNameProvider:
+    """Stands in for agentc.Provider's fetch-by-name (which does not touch the embedding model)."""
+
+    def __init__(self, index: provider.IndexedProvider):
+        self.items = {x["name"]: x for x in index.prompt_index.items}
+
+    def get_prompt_for(self, query: str = None, name: str = None, **kwargs):
+        return self.items[name]
+
+
+def hash_encoder(dims: int) -> typing.Callable[[typing.List[str]], numpy.ndarray]:
+    # A (free) deterministic encoder, for measuring everything but the embedding model.
+    def _encode(texts: typing.List[str]) -> numpy.ndarray:
+        seeds = [int.from_bytes(hashlib.sha256(t.encode("utf-8")).digest()[:8], "little") for t in texts]
+        return numpy.stack([numpy.random.default_rng(s).standard_normal(dims) for s in seeds]).astype(numpy.float32)
+
+    return _encode
+
+
+def run_session(p) -> float:
+    start = time.perf_counter()
+    for query in _SESSION_QUERIES:
+        p.get_prompt_for(query=query)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the catalog lookup overhead of one agent session.")
+    parser.add_argument("--catalog", type=pathlib.Path, default=pathlib.Path("travel_agent/.agent-catalog"))
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--hash-encoder", action="store_true", help="Skip the embedding model (i.e., search only).")
+    args = parser.parse_args()
+
+    indexed = provider.IndexedProvider(provider=None, catalog_path=args.catalog)
+    if args.hash_encoder:
+        indexed = provider.IndexedProvider(
+            provider=None, catalog_path=args.catalog, encoder=hash_encoder(indexed.prompt_index.vectors.shape[1])
+        )
+    indexed.provider = ByNameProvider(indexed)
+    indexed.encode(["warm up the embedding model"])
+
+    # 1. Today's behavior: every lookup embeds the query and searches the catalog.
+    uncached = [run_session(indexed) for _ in range(args.sessions)]
+
+    # 2. A cache that is shared across sessions, starting cold (the first session populates it)...
+    caching = cache.CachingProvider(indexed)
+    cold = run_session(caching)
+    shared = [run_session(caching) for _ in range(args.sessions - 1)]
+
+    # 3. ...and a cache that is pre-populated at server startup.
+    prewarmed = cache.CachingProvider(indexed)
+    start = time.perf_counter()
+    prewarmed.warm(prompt_queries=set(_SESSION_QUERIES))
+    warm_time = time.perf_counter() - start
+    warmed = [run_session(prewarmed) for _ in range(args.sessions)]
+
+    print(f"{len(_SESSION_QUERIES)} catalog lookups per session, {args.sessions} sessions.")
+    print(f"{'configuration':>28} | {'mean / session (ms)':>19} | {'p99 / session (ms)':>18}")
+    for label, timings in [
+        ("embed + search every call", uncached),
+        ("shared cache (from cold)", [cold] + shared),
+        ("shared cache (pre-warmed)", warmed),
+    ]:
+        p99 = numpy.percentile(timings, 99)
+        print(f"{label:>28} | {statistics.mean(timings) * 1e3:>19.3f} | {p99 * 1e3:>18.3f}")
+    print(f"One-time startup cost of pre-warming: {warm_time * 1e3:.3f} ms.")
+    print(f"Resolution cache stats: {prewarmed.cache.stats()}")
@@ -0,0 +1,139 @@
+import argparse
+import dotenv
+import functools
+import numpy
+import os
+import pathlib
+import tempfile
+import time
+import typing
+import yaml
+
+from agent_catalog_example.embedding import backends
+from agent_catalog_example.tools import connections
+from agent_catalog_example.tools import semantic
+from agent_catalog_example.tools import vector_index
+
+# Usage (from the repository root): python -m benchmarks.display_index [--synthetic 100000]
+
+_TOOL = pathlib.Path("recommendation_system/tools/get_relevant_display.yaml")
+
+# Display requirements, in the spirit of what users tell our recommendation agent.
+_QUERIES = [
+    "large display",
+    "120 Hz refresh rate",
+    "AMOLED screen with punch hole",
+    "small compact screen",
+    "high resolution 1440p display",
+    "water drop notch",
+    "foldable dual display",
+    "6.7 inch screen",
+    "90 Hz display",
+    "full HD plus",
+    "bright screen for outdoor use",
+    "curved edges",
+]
+
+
+def measure(
+    search: typing.Callable[[numpy.ndarray], typing.List[str]], queries: numpy.ndarray, truth: typing.List[set], k: int
+) -> typing.Tuple[float, float, float]:
+    latencies, recalls = list(), list()
+    for query, expected in zip(queries, truth, strict=True):
+        start = time.perf_counter()
+        found = search(query)
+        latencies.append(time.perf_counter() - start)
+        recalls.append(len(set(found[:k]) & expected) / len(expected))
+    return float(numpy.mean(recalls)), float(numpy.percentile(latencies, 50)), float(numpy.percentile(latencies, 99))
+
+
+def report(name: str, build: typing.Optional[float], recall: float, p50: float, p99: float) -> None:
+    build = f"{build:>9.2f}" if build is not None else f"{'-':>9}"
+    print(f"{name:>14} | {build} | {recall:>9.1%} | {p50 * 1e3:>8.3f} | {p99 * 1e3:>8.3f}")
+
+
+def clustered_vectors(documents: int, dims: int, queries: int) -> typing.Tuple[numpy.ndarray, numpy.ndarray]:
+    # Like real embeddings, our (normalized) random vectors are clustered: uniformly random vectors of this many
+    # dimensions are all about equally far apart, so no graph index can tell their nearest neighbors apart.
+    random = numpy.random.default_rng(0)
+    centers = random.standard_normal((max(documents // 50, 1), dims))
+    vectors = centers[random.integers(0, len(centers), documents)] + 0.5 * random.standard_normal((documents, dims))
+    vectors = (vectors / numpy.linalg.norm(vectors, axis=1, keepdims=True)).astype(numpy.float32)
+    query_vectors = centers[random.integers(0, len(centers), queries)] + 0.5 * random.standard_normal((queries, dims))
+    return vectors, query_vectors.astype(numpy.float32)
+
+
+def run_synthetic(documents: int, dims: int, queries: int, k: int) -> None:
+    vectors, query_vectors = clustered_vectors(documents, dims, queries)
+    identifiers = [str(i) for i in range(documents)]
+
+    indexes, builds = dict(), dict()
+    for kind in ["exact", "hnsw"]:
+        start = time.perf_counter()
+        indexes[kind] = vector_index.VectorIndex(dims, kind, "l2_norm")
+        indexes[kind].upsert(identifiers, identifiers, vectors)
+        builds[kind] = time.perf_counter() - start
+    truth = [{x for x, _, _ in indexes["exact"].search(q, k)} for q in query_vectors]
+    for kind, index in indexes.items():
+        report(
+            kind, builds[kind], *measure(lambda q, i=index: [x for x, _, _ in i.search(q, k)], query_vectors, truth, k)
+        )
+
+
+def run_cluster(k: int) -> None:
+    with _TOOL.open("r") as fp:
+        tool = yaml.safe_load(fp)
+    vector_search = {**tool["vector_search"], "num_candidates": k}
+    couchbase_secrets = next(x["couchbase"] for x in tool["secrets"] if "couchbase" in x)
+    cluster_factory = functools.partial(connections.cluster_for, couchbase_secrets, dict(os.environ))
+    encoder = backends.load_encoder(vector_search["embedding_model"])
+    query_vectors = encoder.encode(_QUERIES)
+
+    searches, builds = dict(), dict()
+    for kind in ["exact", "hnsw"]:
+        local = vector_index.LocalVectorIndex(
+            tempfile.mkdtemp(prefix=f"display-{kind}-"),
+            vector_search,
+            cluster_factory,
+            vector_index.LocalIndexPolicy(kind, max_staleness=3600, similarity="l2_norm"),
+        )
+        start = time.perf_counter()
+        local.refresh()
+        builds[kind] = time.perf_counter() - start
+        if local.index is None:
+            raise RuntimeError(f"Could not build the {kind} index (is the cluster reachable?).")
+        searches[kind] = lambda q, i=local: [x for x, _, _ in i.search(q, k)]
+
+    fts = semantic.SemanticSearchTool(
+        name=tool["name"],
+        description=tool["description"],
+        parameter="display",
+        parameter_type=str,
+        vector_search=vector_search,
+        cluster_factory=cluster_factory,
+        cache=None,
+    )
+    searches["fts"] = lambda q: [x for x, _, _ in fts.search_fts(q)]
+    searches["fts"](query_vectors[0])
+
+    # Our ground truth is the exact top-k (with the similarity of mobile-index).
+    truth = [set(searches["exact"](q)) for q in query_vectors]
+    for name, search in searches.items():
+        report(name, builds.get(name), *measure(search, query_vectors, truth, k))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the local display index (exact / HNSW) against FTS.")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--env", type=pathlib.Path, default=pathlib.Path("recommendation_system/.env"))
+    parser.add_argument("--synthetic", type=int, help="Use this many random vectors instead of the cluster.")
+    parser.add_argument("--dims", type=int, default=384, help="Dimensions of the --synthetic vectors.")
+    parser.add_argument("--queries", type=int, default=200, help="Number of --synthetic queries.")
+    args = parser.parse_args()
+
+    print(f"{'index':>14} | {'build (s)':>9} | {f'recall@{args.k}':>9} | {'p50 (ms)':>8} | {'p99 (ms)':>8}")
+    if args.synthetic is not None:
+        run_synthetic(args.synthetic, args.dims, args.queries, args.k)
+    else:
+        dotenv.load_dotenv(args.env)
+        run_cluster(args.k)
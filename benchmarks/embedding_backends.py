@@ -0,0 +1,113 @@
+import argparse
+import csv
+import json
+import numpy
+import pathlib
+import time
+import typing
+
+from agent_catalog_example.embedding import backends
+
+# Usage (from the repository root): python -m benchmarks.embedding_backends [--articles articles.jsonl]
+
+_PHONES = pathlib.Path("recommendation_system/dataset/smartphones.csv")
+
+# Queries in the spirit of what our agents ask each corpus.
+_PHONE_QUERIES = [
+    "large display",
+    "120 Hz refresh rate",
+    "AMOLED screen with punch hole",
+    "small compact screen",
+    "high resolution 1440p display",
+    "water drop notch",
+    "foldable dual display",
+    "6.7 inch screen",
+    "90 Hz display",
+    "full HD plus",
+]
+_ARTICLE_QUERIES = [
+    "beaches",
+    "hiking",
+    "museums",
+    "street food",
+    "nightlife",
+    "skiing",
+    "wildlife",
+    "architecture",
+    "wine tasting",
+    "national parks",
+]
+_DEFAULT_CANDIDATES = [
+    "sentence-transformers/all-MiniLM-L6-v2",
+    "onnx:sentence-transformers/all-MiniLM-L12-v2",
+    "int8:sentence-transformers/all-MiniLM-L12-v2",
+    "sentence-transformers/all-MiniLM-L12-v2@256",
+    "mixedbread-ai/mxbai-embed-xsmall-v1@256",
+]
+
+
+def load_phones() -> typing.List[str]:
+    with _PHONES.open("r", encoding="utf-8") as fp:
+        return sorted({row["display"] for row in csv.DictReader(fp) if row["display"]})
+
+
+def load_articles(path: pathlib.Path) -> typing.List[str]:
+    # One JSON document per line (e.g., an export of travel-sample.inventory.article), each with a 'text' field.
+    with path.open("r", encoding="utf-8") as fp:
+        return [json.loads(line)["text"] for line in fp if line.strip()]
+
+
+def top_k(corpus: numpy.ndarray, queries: numpy.ndarray, k: int) -> numpy.ndarray:
+    scores = queries @ corpus.T
+    return numpy.argsort(-scores, axis=1)[:, :k]
+
+
+def measure(
+    spec: str, corpus: typing.List[str], queries: typing.List[str], k: int
+) -> typing.Tuple[numpy.ndarray, float, float, int]:
+    encoder = backends.load_encoder(spec)
+    encoder.encode(queries[:2])
+
+    start = time.perf_counter()
+    vectors = encoder.encode(corpus)
+    throughput = len(corpus) / (time.perf_counter() - start)
+    latencies = list()
+    for query in queries:
+        start = time.perf_counter()
+        encoder.encode([query])
+        latencies.append(time.perf_counter() - start)
+
+    vectors /= numpy.maximum(numpy.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    query_vectors = encoder.encode(queries)
+    query_vectors /= numpy.maximum(numpy.linalg.norm(query_vectors, axis=1, keepdims=True), 1e-12)
+    return top_k(vectors, query_vectors, k), throughput, float(numpy.percentile(latencies, 50)), encoder.dims
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare encoder backends on encode throughput and recall@k.")
+    parser.add_argument("--baseline", default="sentence-transformers/all-MiniLM-L12-v2")
+    parser.add_argument("--candidates", nargs="+", default=_DEFAULT_CANDIDATES, help="Encoder specs to compare.")
+    parser.add_argument("--articles", type=pathlib.Path, help="A JSONL file of article chunks (skipped if not given).")
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    corpora = {"phones": (load_phones(), _PHONE_QUERIES)}
+    if args.articles is not None:
+        corpora["articles"] = (load_articles(args.articles), _ARTICLE_QUERIES)
+    else:
+        print("No --articles file given, so only the phone corpus is used.")
+
+    for name, (corpus, queries) in corpora.items():
+        print(f"\n{name}: {len(corpus)} documents, {len(queries)} queries, recall@{args.k} against {args.baseline}.")
+        print(f"{'encoder':>48} | {'dims':>4} | {'docs / s':>8} | {'query p50 (ms)':>14} | {f'recall@{args.k}':>9}")
+        reference, *baseline = measure(args.baseline, corpus, queries, args.k)
+        for spec in [args.baseline, *args.candidates]:
+            try:
+                results, throughput, latency, dims = (
+                    (reference, *baseline) if spec == args.baseline else measure(spec, corpus, queries, args.k)
+                )
+            except Exception as e:
+                print(f"{spec:>48} | failed to load ({e.__class__.__name__}: {e})")
+                continue
+            recall = numpy.mean([len(set(a) & set(b)) / args.k for a, b in zip(results, reference, strict=True)])
+            print(f"{spec:>48} | {dims:>4} | {throughput:>8.1f} | {latency * 1e3:>14.2f} | {recall:>9.1%}")
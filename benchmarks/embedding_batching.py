@@ -0,0 +1,95 @@
+import argparse
+import numpy
+import threading
+import time
+import typing
+
+from agent_catalog_example.embedding import backends
+from agent_catalog_example.embedding import batching
+
+# Usage (from the repository root): python -m benchmarks.embedding_batching [--synthetic] [--callers 1 10 100]
+
+# A pool of short queries, roughly like the ones our agents embed (tool / prompt lookups and user interests).
+_QUERIES = [
+    "getting user intent",
+    "finding travel routes",
+    "suggesting destination",
+    "beaches",
+    "hiking",
+    "street food",
+    "find the mobiles with the best camera",
+    "a phone with a large battery",
+    "museums and architecture",
+    "managing rewards",
+]
+
+
+def synthetic_encoder(call_overhead: float, per_text: float, dims: int) -> typing.Callable:
+    # Burns CPU (holding the GIL, like a forward pass would mostly do) for a fixed cost per call plus a cost per text.
+    def _encode(texts: typing.List[str]) -> numpy.ndarray:
+        deadline = time.perf_counter() + call_overhead + per_text * len(texts)
+        while time.perf_counter() < deadline:
+            pass
+        return numpy.ones((len(texts), dims), dtype=numpy.float32)
+
+    return _encode
+
+
+def run(encode: typing.Callable, callers: int, duration: float) -> typing.Tuple[int, typing.List[float]]:
+    latencies = [list() for _ in range(callers)]
+    start_barrier = threading.Barrier(callers + 1)
+    stop = threading.Event()
+
+    def _caller(i: int):
+        start_barrier.wait()
+        j = i
+        while not stop.is_set():
+            query = f"{_QUERIES[j % len(_QUERIES)]} #{j}"
+            start = time.perf_counter()
+            encode([query])
+            latencies[i].append(time.perf_counter() - start)
+            j += callers
+
+    threads = [threading.Thread(target=_caller, args=(i,), daemon=True) for i in range(callers)]
+    for thread in threads:
+        thread.start()
+    start_barrier.wait()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    flat = [x for per_caller in latencies for x in per_caller]
+    return len(flat), flat
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare per-call and micro-batched query encoding under load.")
+    parser.add_argument("--callers", type=int, nargs="+", default=[1, 10, 50, 100, 200])
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per (mode, callers) run.")
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L12-v2", help="An encoder spec.")
+    parser.add_argument("--synthetic", action="store_true", help="Use a synthetic encoder instead of --model.")
+    parser.add_argument("--max-batch-size", type=int, default=batching.DEFAULT_MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=batching.DEFAULT_MAX_WAIT * 1e3)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        encode = synthetic_encoder(call_overhead=5e-3, per_text=0.2e-3, dims=384)
+    else:
+        encode = backends.load_encoder(args.model).encode
+        encode(_QUERIES)
+
+    print(f"{'callers':>7} | {'mode':>7} | {'QPS':>8} | {'p50 (ms)':>8} | {'p99 (ms)':>9} | {'mean batch':>10}")
+    for callers in args.callers:
+        for mode in ["direct", "batched"]:
+            service = None
+            if mode == "batched":
+                service = batching.EmbeddingService(encode, args.max_batch_size, args.max_wait_ms / 1e3)
+            count, latencies = run(service.encode if service is not None else encode, callers, args.duration)
+            mean_batch = service.stats()["mean_batch_size"] if service is not None else 1.0
+            if service is not None:
+                service.close()
+            print(
+                f"{callers:>7} | {mode:>7} | {count / args.duration:>8.1f} | "
+                f"{numpy.percentile(latencies, 50) * 1e3:>8.2f} | {numpy.percentile(latencies, 99) * 1e3:>9.2f} | "
+                f"{mean_batch:>10.1f}"
+            )
@@ -0,0 +1,72 @@
+import argparse
+import asyncio
+import sys
+import time
+
+from agent_catalog_example.tools import offload
+
+# Usage (from the repository root): python -m benchmarks.event_loop_lag [--threshold-ms 50]
+
+
+def encode_blog_query(cost: float) -> int:
+    # Stands in for a CPU-bound tool (e.g., a sentence embedding): pure Python work that holds the GIL throughout.
+    deadline, spins = time.perf_counter() + cost, 0
+    while time.perf_counter() < deadline:
+        spins += 1
+    return spins
+
+
+async def saturate(pool: offload.OffloadPool, tool, callers: int, duration: float, cost: float) -> int:
+    stop_at = time.perf_counter() + duration
+    calls = 0
+
+    async def _caller():
+        nonlocal calls
+        while time.perf_counter() < stop_at:
+            await tool(cost)
+            calls += 1
+            # Give other coroutines (e.g., our lag monitor) a chance to run between calls, like a real session would.
+            await asyncio.sleep(0)
+
+    await asyncio.gather(*(_caller() for _ in range(callers)))
+    return calls
+
+
+async def measure(target: str, processes: int, callers: int, duration: float, cost: float):
+    pool = offload.OffloadPool(processes=processes, threads=callers, rules=f"*={target}")
+    tool = pool(encode_blog_query)
+    pool.start()
+    monitor = offload.LoopLagMonitor(interval=0.005, window=100_000)
+    monitor.start()
+    calls = await saturate(pool, tool, callers, duration, cost)
+    monitor.stop()
+    pool.close()
+    return calls, monitor.stats()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure event loop lag while CPU-bound tool calls saturate a pool.")
+    parser.add_argument(
+        "--targets", nargs="+", choices=sorted(offload.TARGETS), default=["inline", "thread", "process"]
+    )
+    parser.add_argument("--processes", type=int, default=2)
+    parser.add_argument("--callers", type=int, default=8, help="Number of concurrent (always busy) tool callers.")
+    parser.add_argument("--cost-ms", type=float, default=50.0, help="Duration of one (CPU-bound) tool call.")
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--threshold-ms", type=float, default=50.0, help="Maximum p99 lag allowed for 'process'.")
+    args = parser.parse_args()
+
+    print(f"{args.callers} callers, {args.cost_ms:.0f}ms of CPU per call, {args.processes} worker processes.")
+    print(f"{'target':>8} | {'calls / s':>9} | {'lag p50 (ms)':>12} | {'lag p99 (ms)':>12} | {'lag max (ms)':>12}")
+    failed = False
+    for target in args.targets:
+        calls, lag = asyncio.run(measure(target, args.processes, args.callers, args.duration, args.cost_ms / 1e3))
+        print(
+            f"{target:>8} | {calls / args.duration:>9.1f} | {lag['p50_ms']:>12.2f} | {lag['p99_ms']:>12.2f} | "
+            f"{lag['max_ms']:>12.2f}"
+        )
+        if target == "process" and lag["p99_ms"] > args.threshold_ms:
+            failed = True
+    if failed:
+        print(f"FAILED: p99 event loop lag with process offload is above {args.threshold_ms}ms.")
+        sys.exit(1)
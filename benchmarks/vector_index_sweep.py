@@ -0,0 +1,173 @@
+import argparse
+import dotenv
+import itertools
+import numpy
+import os
+import pathlib
+import time
+import typing
+
+from agent_catalog_example.tools import search_index
+from agent_catalog_example.tools import vector_index
+from benchmarks.display_index import clustered_vectors
+from benchmarks.display_index import measure
+
+# Usage (from the repository root):
+#   python -m benchmarks.vector_index_sweep --tool recommendation_system/tools/get_relevant_display.yaml
+#   python -m benchmarks.vector_index_sweep --local [--synthetic 2000]
+
+# The local stand-in for FTS's 'vector_index_optimized_for' setting: the degree of our HNSW graph (FTS builds its
+# vector indexes with FAISS, whose 'latency' / 'memory-efficient' variants similarly trade recall for speed / size).
+_LOCAL_DEGREES = {"recall": 16, "latency": 8, "memory-efficient": 4}
+
+
+class Config(typing.NamedTuple):
+    similarity: str
+    optimized_for: str
+    partitions: int
+
+
+def exact_top_k(vectors: numpy.ndarray, queries: numpy.ndarray, similarity: str, k: int) -> numpy.ndarray:
+    # Our ground truth: the exact top-k rows of each query, under the index's similarity.
+    scores = queries @ vectors.T
+    if similarity == "l2_norm":
+        scores = 2 * scores - (vectors**2).sum(axis=1)[None, :]
+    return numpy.argsort(-scores, axis=1)[:, :k]
+
+
+def perturbed_queries(vectors: numpy.ndarray, count: int, noise: float) -> numpy.ndarray:
+    # Queries near (but not at) stored vectors, so that each query has a neighborhood of similar documents.
+    random = numpy.random.default_rng(1)
+    queries = vectors[random.choice(len(vectors), size=count, replace=count > len(vectors))]
+    scale = numpy.linalg.norm(queries, axis=1, keepdims=True) / numpy.sqrt(vectors.shape[1])
+    return (queries + noise * scale * random.standard_normal(queries.shape)).astype(numpy.float32)
+
+
+def fetch_vectors(manager: search_index.SearchIndexManager, spec: search_index.VectorIndexSpec):
+    statement = (
+        f"SELECT META(d).id AS id, d.`{spec.vector_field}` AS vec "
+        f"FROM `{spec.bucket}`.`{spec.scope}`.`{spec.collection}` AS d WHERE d.`{spec.vector_field}` IS VALUED"
+    )
+    rows = list(manager.cluster().query(statement).rows())
+    return [x["id"] for x in rows], numpy.asarray([x["vec"] for x in rows], dtype=numpy.float32)
+
+
+def sweep_local(
+    vectors: numpy.ndarray, queries: numpy.ndarray, configs: typing.List[Config], candidates: typing.List[int], k: int
+) -> typing.Iterable[typing.Tuple]:
+    # Partitions become shards (rows are dealt round-robin), which are all searched and then merged, like FTS does.
+    identifiers = [str(i) for i in range(len(vectors))]
+    for config in configs:
+        start = time.perf_counter()
+        shards = list()
+        for shard in range(config.partitions):
+            index = vector_index.VectorIndex(
+                vectors.shape[1], "hnsw", config.similarity, m=_LOCAL_DEGREES[config.optimized_for]
+            )
+            rows = range(shard, len(vectors), config.partitions)
+            index.upsert([identifiers[i] for i in rows], [""] * len(rows), vectors[shard :: config.partitions])
+            shards.append(index)
+        build = time.perf_counter() - start
+        truth = [{str(i) for i in row} for row in exact_top_k(vectors, queries, config.similarity, k)]
+
+        for num_candidates in candidates:
+            for index in shards:
+                index.ef_search = num_candidates
+
+            def _search(query: numpy.ndarray, shards: typing.List = shards) -> typing.List[str]:
+                found = [x for index in shards for x in index.search(query, k)]
+                return [identifier for identifier, _, _ in sorted(found, key=lambda x: -x[2])]
+
+            yield config, num_candidates, build, *measure(_search, queries, truth, k)
+
+
+def sweep_fts(
+    manager: search_index.SearchIndexManager,
+    spec: search_index.VectorIndexSpec,
+    identifiers: typing.List[str],
+    vectors: numpy.ndarray,
+    queries: numpy.ndarray,
+    configs: typing.List[Config],
+    candidates: typing.List[int],
+    k: int,
+    keep: bool,
+) -> typing.Iterable[typing.Tuple]:
+    import couchbase.options
+    import couchbase.search
+    import couchbase.vector_search
+
+    scope = manager.cluster().bucket(spec.bucket).scope(spec.scope)
+    for config in configs:
+        # Each configuration gets its own (scratch) index, next to the one our tool uses.
+        scratch = spec._replace(
+            name=f"{spec.name}-sweep-{config.similarity}-{config.optimized_for}-{config.partitions}",
+            similarity=config.similarity,
+            optimized_for=config.optimized_for,
+            partitions=config.partitions,
+        )
+        start = time.perf_counter()
+        manager.apply(scratch)
+        build = time.perf_counter() - start
+        truth = [{identifiers[i] for i in row} for row in exact_top_k(vectors, queries, config.similarity, k)]
+
+        for num_candidates in candidates:
+
+            def _search(query: numpy.ndarray, n: int = num_candidates, name: str = scratch.name) -> typing.List[str]:
+                vector_request = couchbase.vector_search.VectorSearch.from_vector_query(
+                    couchbase.vector_search.VectorQuery(spec.vector_field, query.astype("float64").tolist(), n)
+                )
+                request = couchbase.search.SearchRequest.create(couchbase.search.MatchNoneQuery()).with_vector_search(
+                    vector_request
+                )
+                result = scope.search(name, request, couchbase.options.SearchOptions(limit=k))
+                return [row.id for row in result.rows()]
+
+            _search(queries[0])
+            yield config, num_candidates, build, *measure(_search, queries, truth, k)
+        if not keep:
+            manager.drop(scratch)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep vector index settings, reporting recall@k against latency.")
+    parser.add_argument("--tool", type=pathlib.Path, default="recommendation_system/tools/get_relevant_display.yaml")
+    parser.add_argument("--env", type=pathlib.Path, default=pathlib.Path("recommendation_system/.env"))
+    parser.add_argument("--local", action="store_true", help="Sweep our local HNSW stand-in instead of FTS.")
+    parser.add_argument("--synthetic", type=int, help="(With --local) use this many random vectors, not the cluster.")
+    parser.add_argument("--similarities", nargs="+", default=["dot_product", "l2_norm"])
+    parser.add_argument("--optimized-for", nargs="+", default=["recall", "latency"], choices=sorted(_LOCAL_DEGREES))
+    parser.add_argument("--partitions", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--num-candidates", type=int, nargs="+", default=[10, 20, 50, 100])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=0.5, help="Query distance from their stored vectors.")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch indexes (FTS only).")
+    args = parser.parse_args()
+
+    configs = [Config(*x) for x in itertools.product(args.similarities, args.optimized_for, args.partitions)]
+    if args.synthetic is not None:
+        vectors, queries = clustered_vectors(args.synthetic, 384, args.queries)
+        rows = list(sweep_local(vectors, queries, configs, args.num_candidates, args.k))
+    else:
+        dotenv.load_dotenv(args.env)
+        manager = search_index.SearchIndexManager.from_env(os.environ)
+        spec = search_index.VectorIndexSpec.from_tool(args.tool)
+        identifiers, vectors = fetch_vectors(manager, spec)
+        queries = perturbed_queries(vectors, args.queries, args.noise)
+        if args.local:
+            rows = list(sweep_local(vectors, queries, configs, args.num_candidates, args.k))
+        else:
+            rows = list(
+                sweep_fts(manager, spec, identifiers, vectors, queries, configs, args.num_candidates, args.k, args.keep)
+            )
+
+    print(f"\n{len(vectors)} documents, {len(queries)} queries, recall@{args.k} against the exact top-{args.k}.")
+    print(
+        f"{'similarity':>11} | {'optimized for':>16} | {'partitions':>10} | {'candidates':>10} | {'build (s)':>9} | "
+        f"{f'recall@{args.k}':>9} | {'p50 (ms)':>8} | {'p99 (ms)':>8}"
+    )
+    for config, num_candidates, build, recall, p50, p99 in rows:
+        print(
+            f"{config.similarity:>11} | {config.optimized_for:>16} | {config.partitions:>10} | {num_candidates:>10} | "
+            f"{build:>9.2f} | {recall:>9.1%} | {p50 * 1e3:>8.3f} | {p99 * 1e3:>8.3f}"
+        )
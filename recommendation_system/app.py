@@ -1,3 +1,8 @@
+import agent_catalog_example.catalog.provider
+import agent_catalog_example.tools.cache
+import agent_catalog_example.tools.openapi
+import agent_catalog_example.tools.semantic
+import agent_catalog_example.tools.sqlpp
 import agentc
 import controlflow as cf
 import controlflow.events
@@ -9,14 +14,36 @@ import os
 
 dotenv.load_dotenv()
 
-# provider class instantiation
-provider = agentc.Provider(
-    decorator=lambda t: controlflow.tools.Tool.from_function(t.func),
-    secrets={
-        "CB_CONN_STRING": os.getenv("CB_CONN_STRING"),
-        "CB_USERNAME": os.getenv("CB_USERNAME"),
-        "CB_PASSWORD": os.getenv("CB_PASSWORD"),
-    },
+# http_request tools are rebound to precompiled templates that share one pooled HTTP client
+http_tools = agent_catalog_example.tools.openapi.HTTPToolBinder(".agent-catalog/tool-catalog.json")
+
+# sqlpp_query tools run as prepared statements (their plans are prepared here, before the first tool call)
+secrets = {
+    "CB_CONN_STRING": os.getenv("CB_CONN_STRING"),
+    "CB_USERNAME": os.getenv("CB_USERNAME"),
+    "CB_PASSWORD": os.getenv("CB_PASSWORD"),
+}
+sqlpp_tools = agent_catalog_example.tools.sqlpp.SQLPPToolBinder(".agent-catalog/tool-catalog.json", secrets=secrets)
+sqlpp_tools.warm()
+
+# semantic_search tools are fronted by a semantic cache, and get_relevant_display is served from a local vector index
+# of our phones (refreshed from ecommerce.devices.smartphones, falling back to FTS while the index is stale)
+semantic_tools = agent_catalog_example.tools.semantic.SemanticSearchToolBinder(
+    ".agent-catalog/tool-catalog.json", secrets=secrets
+)
+semantic_tools.warm()
+
+# tools that declare 'cache_*' annotations have their results cached (data_setup.py invalidates these caches)
+cached_tools = agent_catalog_example.tools.cache.CachingToolBinder(".agent-catalog/tool-catalog.json")
+
+# provider class instantiation (queries are resolved against our local catalog index, then fetched by name)
+provider = agent_catalog_example.catalog.provider.IndexedProvider(
+    agentc.Provider(
+        decorator=lambda t: controlflow.tools.Tool.from_function(
+            cached_tools(semantic_tools(sqlpp_tools(http_tools(t.func))))
+        ),
+        secrets=secrets,
+    )
 )
 
 
@@ -1,74 +1,16 @@
+import agent_catalog_example.tools.search_index
 import dotenv
 import os
-import requests
 
-
-def create_vector_index() -> int:
-    hostname = os.getenv("CB_CONN_STRING").replace("couchbase", "http")
-    response = requests.put(
-        f"{hostname}:8094/api/bucket/ecommerce/scope/devices/index/mobile-index",
-        headers={"Content-Type": "application/json"},
-        auth=(
-            os.getenv("CB_USERNAME"),
-            os.getenv("CB_PASSWORD"),
-        ),
-        json={
-            "name": "mobile-index",
-            "type": "fulltext-index",
-            "params": {
-                "doc_config": {
-                    "docid_prefix_delim": "",
-                    "docid_regexp": "",
-                    "mode": "scope.collection.type_field",
-                    "type_field": "type",
-                },
-                "mapping": {
-                    "default_analyzer": "standard",
-                    "default_datetime_parser": "dateTimeOptional",
-                    "default_field": "_all",
-                    "default_mapping": {"dynamic": False, "enabled": False},
-                    "default_type": "_default",
-                    "docvalues_dynamic": False,
-                    "index_dynamic": False,
-                    "store_dynamic": False,
-                    "type_field": "_type",
-                    "types": {
-                        "devices.smartphones": {
-                            "dynamic": False,
-                            "enabled": True,
-                            "properties": {
-                                "vec": {
-                                    "enabled": True,
-                                    "dynamic": False,
-                                    "fields": [
-                                        {
-                                            "dims": 384,
-                                            "index": True,
-                                            "name": "vec",
-                                            "similarity": "l2_norm",
-                                            "type": "vector",
-                                            "vector_index_optimized_for": "recall",
-                                        }
-                                    ],
-                                }
-                            },
-                        }
-                    },
-                },
-                "store": {"indexType": "scorch", "segmentVersion": 16},
-            },
-            "sourceType": "gocbcore",
-            "sourceName": "ecommerce",
-            "sourceParams": {},
-            "planParams": {"maxPartitionsPerPIndex": 1024, "indexPartitions": 1, "numReplicas": 0},
-        },
-    )
-    return response.status_code
+# Our vector index (including its dims) follows the configuration of the display tool that queries it.
+DISPLAY_TOOL = "tools/get_relevant_display.yaml"
 
 
 if __name__ == "__main__":
     dotenv.load_dotenv(".env")
-    if create_vector_index() == 200:
-        print("Vector index (mobile-index) created successfully\n")
-    else:
-        print("Vector index (mobile-index) creation failed\n")
+
+    # This creates (or updates) mobile-index only if needed, and then waits until all of our phones are indexed.
+    manager = agent_catalog_example.tools.search_index.SearchIndexManager.from_env(os.environ)
+    manager.apply(
+        agent_catalog_example.tools.search_index.VectorIndexSpec.from_tool(DISPLAY_TOOL, similarity="l2_norm")
+    )
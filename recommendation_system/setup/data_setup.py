@@ -1,3 +1,4 @@
+import agent_catalog_example.tools.cache
 import csv
 import dotenv
 import os
@@ -58,3 +59,6 @@ with open("./dataset/smartphones.csv", "r") as file:
             upsert_document(result)
         except Exception:
             pass
+
+# Our smartphones have changed, so any cached tool results (e.g., of find_relevant_mobiles) are now stale.
+agent_catalog_example.tools.cache.bump_epoch()
@@ -1,3 +1,4 @@
+import agent_catalog_example.embedding.backends
 import dotenv
 import os
 
@@ -9,13 +10,15 @@ from couchbase.cluster import Cluster
 # needed for options -- cluster, timeout, SQL++ (N1QL) query, etc.
 from couchbase.options import ClusterOptions
 from datetime import timedelta
-from sentence_transformers import SentenceTransformer
-
-model = SentenceTransformer("all-MiniLM-L12-v2")
-
 
 dotenv.load_dotenv()
 
+# Our phones must be encoded with the same encoder as the queries of our display tool (see EncoderSpec), which is also
+# the encoder create_index takes its vector dims from. Hence, we only take it from the tool's spec.
+model = agent_catalog_example.embedding.backends.load_encoder(
+    agent_catalog_example.embedding.backends.tool_embedding_model("tools/get_relevant_display.yaml")
+)
+
 username = os.getenv("CB_USERNAME")
 password = os.getenv("CB_PASSWORD")
 bucket_name = "ecommerce"
@@ -47,7 +50,7 @@ for doc in result:
         key = doc["id"]
         result = cb_coll.get(key).content_as[dict]
         description = result["display"]
-        vector = model.encode(description).astype(float).tolist()
+        vector = model.encode([description])[0].astype(float).tolist()
         result["vec"] = vector
         cb_coll.upsert(key, result)
         print(f"Doc number {counter} upserted successfully")
@@ -0,0 +1,94 @@
+import argparse
+import asyncio
+import dotenv
+import json
+import numpy
+import os
+import time
+import typing
+import websockets
+
+# Usage (from the travel_agent folder, with the agent server running): python -m benchmarks.assistant_streaming
+# Note: set LLM_CACHE=off on the agent server, or repeated sessions are served from our response cache.
+dotenv.load_dotenv()
+
+# Our replies to the agent, in order (whatever it asks). These plan a trip, which ends with our longest message: the
+# Markdown flight plan of return_flight_plan.
+REPLIES = [
+    "I'd like to plan a trip somewhere with good beaches.",
+    "I like surfing and seafood, and I'd like to stay in the United States.",
+    "San Diego sounds perfect!",
+    "I live in New York City.",
+    "That looks great, thank you.",
+    "No, that's all I needed.",
+]
+
+
+class Timing(typing.NamedTuple):
+    characters: int
+    deltas: int
+    first_delta: float
+    full_message: float
+
+
+async def session(url: str, replies: typing.List[str]) -> typing.List[Timing]:
+    # Each time is measured from our last frame (i.e., our reply, or the start of the session) to the assistant frame.
+    timings = list()
+    async with websockets.connect(url, max_size=None) as websocket:
+        await websocket.recv()
+        replies, start, first_delta, deltas = iter(replies), time.perf_counter(), None, 0
+        async for frame in websocket:
+            message = json.loads(frame)
+            if message["role"] == "assistant_delta":
+                first_delta = first_delta or time.perf_counter()
+                deltas += 1
+            elif message["role"] == "assistant":
+                full_message = time.perf_counter()
+                timings.append(
+                    Timing(
+                        characters=len(message["content"]),
+                        deltas=deltas,
+                        first_delta=(first_delta or full_message) - start,
+                        full_message=full_message - start,
+                    )
+                )
+                reply = next(replies, None)
+                if reply is None:
+                    break
+                await websocket.send(json.dumps({"role": "human", "content": reply}))
+                start, first_delta, deltas = time.perf_counter(), None, 0
+    return timings
+
+
+async def main(args: argparse.Namespace):
+    timings = list()
+    for _ in range(args.sessions):
+        timings.extend(await session(args.url, args.replies))
+
+    print(f"{args.sessions} session(s), {len(timings)} assistant messages.")
+    print(f"{'message':>7} | {'characters':>10} | {'deltas':>6} | {'first delta (ms)':>16} | {'full message (ms)':>17}")
+    for i, timing in enumerate(timings):
+        print(
+            f"{i:>7} | {timing.characters:>10} | {timing.deltas:>6} | {timing.first_delta * 1e3:>16.0f} | "
+            f"{timing.full_message * 1e3:>17.0f}"
+        )
+
+    # Without streaming, users wait for the full message.
+    long_timings = [x for x in timings if x.characters >= args.long]
+    if len(long_timings) > 0:
+        first_delta = numpy.median([x.first_delta for x in long_timings]) * 1e3
+        full_message = numpy.median([x.full_message for x in long_timings]) * 1e3
+        print(
+            f"\nMessages of at least {args.long} characters ({len(long_timings)}): first delta after {first_delta:.0f} "
+            f"ms, full message after {full_message:.0f} ms (median), i.e., {full_message - first_delta:.0f} ms sooner."
+        )
+
+
+if __name__ == "__main__":
+    default_url = f"ws://{os.getenv('AGENT_CONN_DOMAIN', 'localhost')}:{os.getenv('AGENT_CONN_PORT', '10000')}/chat"
+    parser = argparse.ArgumentParser(description="Measure the time to the first delta vs. the full assistant message.")
+    parser.add_argument("--url", default=default_url)
+    parser.add_argument("--sessions", type=int, default=3)
+    parser.add_argument("--replies", nargs="+", default=REPLIES)
+    parser.add_argument("--long", type=int, default=500, help="The characters of a 'long' assistant message.")
+    asyncio.run(main(parser.parse_args()))
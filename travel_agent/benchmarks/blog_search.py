@@ -0,0 +1,100 @@
+import agent_catalog_example.tools.semantic
+import argparse
+import couchbase.auth
+import couchbase.cluster
+import couchbase.options
+import dotenv
+import numpy
+import os
+import time
+import typing
+import yaml
+
+# Usage (from the travel_agent folder, after ingesting our blogs): python -m benchmarks.blog_search
+dotenv.load_dotenv()
+
+# A fixed set of interest lists, so runs are comparable across changes.
+INTEREST_SETS = [
+    ["beaches", "hiking"],
+    ["museums", "street food", "nightlife"],
+    ["skiing", "spas"],
+    ["wildlife", "photography", "camping", "kayaking"],
+    ["architecture", "wine"],
+    ["surfing", "yoga", "vegan food"],
+    ["castles", "history", "trains"],
+    ["shopping", "theme parks"],
+]
+
+
+def joined(tool: agent_catalog_example.tools.semantic.SemanticSearchTool, interests: typing.List[str]) -> typing.List:
+    # What our blog tool used to do: one query for all interests.
+    return [identifier for identifier, _, _ in tool.search(tool.encode([",".join(interests)])[0])]
+
+
+def fused(tool: agent_catalog_example.tools.semantic.SemanticSearchTool, interests: typing.List[str]) -> typing.List:
+    return [identifier for identifier, _ in tool.fused(interests)]
+
+
+def coverage(results: typing.List[str], per_interest: typing.Dict[str, typing.Set[str]]) -> typing.Tuple[float, float]:
+    # 1. The fraction of interests that are represented (by at least one of their own top documents) in our results.
+    # 2. The mean fraction of each interest's own top documents that made it into our results.
+    results = set(results)
+    represented = [len(results & top) > 0 for top in per_interest.values()]
+    recovered = [len(results & top) / len(top) for top in per_interest.values() if len(top) > 0]
+    return float(numpy.mean(represented)), float(numpy.mean(recovered))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare joined-interest and fused per-interest blog searches.")
+    parser.add_argument("--repeat", type=int, default=10, help="Number of runs per interest set.")
+    parser.add_argument("--tool", default="src/resources/agent_c/tools/blogs_from_interests.yaml")
+    args = parser.parse_args()
+
+    with open(args.tool) as fp:
+        vector_search = yaml.safe_load(fp)["vector_search"]
+    cluster = couchbase.cluster.Cluster(
+        os.getenv("CB_CONN_STRING"),
+        couchbase.options.ClusterOptions(
+            couchbase.auth.PasswordAuthenticator(username=os.getenv("CB_USERNAME"), password=os.getenv("CB_PASSWORD"))
+        ),
+    )
+    tool = agent_catalog_example.tools.semantic.SemanticSearchTool(
+        name="blog_search",
+        description="",
+        parameter="user_interests",
+        parameter_type=list,
+        vector_search=vector_search,
+        cluster_factory=lambda: cluster,
+        cache=None,
+    )
+
+    # Our reference: the top documents of each interest, searched on its own.
+    tool.encode(["warm up"])
+    reference = {
+        interest: {identifier for identifier, _, _ in tool.search(tool.encode([interest])[0])}
+        for interests in INTEREST_SETS
+        for interest in agent_catalog_example.tools.semantic.query_texts(interests)
+    }
+
+    print(f"{len(INTEREST_SETS)} interest sets, {args.repeat} runs per set (no semantic cache).")
+    print(
+        f"{'mode':>8} | {'p50 (ms)':>8} | {'p99 (ms)':>8} | {'results':>7} | "
+        f"{'interests covered':>17} | {'top docs recovered':>18}"
+    )
+    for name, search in [("joined", joined), ("fused", fused)]:
+        latencies, sizes, represented, recovered = list(), list(), list(), list()
+        for interests in INTEREST_SETS:
+            per_interest = {x: reference[x] for x in agent_catalog_example.tools.semantic.query_texts(interests)}
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                results = search(tool, interests)
+                latencies.append(time.perf_counter() - start)
+            sizes.append(len(results))
+            a, b = coverage(results, per_interest)
+            represented.append(a)
+            recovered.append(b)
+        print(
+            f"{name:>8} | {numpy.percentile(latencies, 50) * 1e3:>8.2f} | "
+            f"{numpy.percentile(latencies, 99) * 1e3:>8.2f} | {numpy.mean(sizes):>7.1f} | "
+            f"{numpy.mean(represented):>17.1%} | {numpy.mean(recovered):>18.1%}"
+        )
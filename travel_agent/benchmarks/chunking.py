@@ -0,0 +1,68 @@
+import agent_catalog_example.embedding.backends
+import argparse
+import numpy
+import os
+import time
+import typing
+
+from setup.ingest_blogs import BLOG_TOOL
+from setup.ingest_blogs import chunk_articles
+
+# Usage (from the travel_agent folder): python -m benchmarks.chunking [--articles 100000] [--workers 1 2 4 8]
+
+
+def synthetic_articles(count: int, words: int, distinct: int = 1000) -> typing.Iterable[typing.Dict]:
+    # Articles of random (English-looking) sentences and paragraphs. We cycle through a pool of distinct texts, so that
+    # generating our corpus does not cost more than chunking it.
+    random = numpy.random.default_rng(0)
+    vocabulary = [
+        "".join(random.choice(list("abcdefghijklmnopqrstuvwxyz"), size=random.integers(2, 10))) for _ in range(5000)
+    ]
+    texts = list()
+    for _ in range(min(count, distinct)):
+        sentences, remaining = list(), words
+        while remaining > 0:
+            length = min(int(random.integers(5, 25)), remaining)
+            sentences.append(" ".join(random.choice(vocabulary, size=length)).capitalize() + ".")
+            remaining -= length
+        texts.append("\n\n".join(" ".join(sentences[j : j + 5]) for j in range(0, len(sentences), 5)))
+    for i in range(count):
+        yield {"text": texts[i % len(texts)], "url": f"https://example.com/article/{i}"}
+
+
+def word_count(text: str) -> int:
+    return len(text.split())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure chunking throughput against the number of worker processes.")
+    parser.add_argument("--articles", type=int, default=100_000)
+    parser.add_argument("--words", type=int, default=400, help="Number of words per article.")
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, 4, os.cpu_count()}))
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--word-tokens", action="store_true", help="Count words instead of running our tokenizer.")
+    args = parser.parse_args()
+
+    if args.word_tokens:
+        token_counter = word_count
+    else:
+        token_counter = agent_catalog_example.embedding.backends.load_encoder(
+            agent_catalog_example.embedding.backends.tool_embedding_model(BLOG_TOOL)
+        ).tokenizer
+
+    print(f"{args.articles} articles of {args.words} words, on {os.cpu_count()} core(s).")
+    print(f"{'workers':>7} | {'chunks':>8} | {'seconds':>8} | {'chunks / s':>10} | {'speedup':>7}")
+    baseline = None
+    for workers in args.workers:
+        start = time.perf_counter()
+        chunks = 0
+        for _ in chunk_articles(
+            synthetic_articles(args.articles, args.words), workers, args.chunk_size, token_counter=token_counter
+        ):
+            chunks += 1
+        elapsed = time.perf_counter() - start
+        baseline = baseline if baseline is not None else chunks / elapsed
+        print(
+            f"{workers:>7} | {chunks:>8} | {elapsed:>8.2f} | {chunks / elapsed:>10.1f} | "
+            f"{chunks / elapsed / baseline:>6.2f}x"
+        )
@@ -0,0 +1,140 @@
+import agent_catalog_example.embedding.intent
+import argparse
+import numpy
+import time
+import typing
+
+# Usage (from the travel_agent folder): python -m benchmarks.intent_routing
+
+# Scripted sessions, written apart from the examples in intents.yaml (so we measure how well our routers generalize).
+# Each session is a list of (request, intent) turns, where each turn is followed by the user's reply to ask_to_continue
+# (which may already hold their next request). The last reply of a session ends it.
+SESSIONS = [
+    {
+        "turns": [("I'm thinking about a trip to Japan in the spring.", "trip planning")],
+        "replies": ["No, that's it for now."],
+    },
+    {
+        "turns": [("How many reward points are on my account?", "travel rewards")],
+        "replies": ["Thanks, bye!"],
+    },
+    {
+        "turns": [
+            ("Could you recommend somewhere to go skiing?", "trip planning"),
+            ("Yes, what are my points at?", "travel rewards"),
+        ],
+        "replies": ["Yes, what are my points at?", "No thank you."],
+    },
+    {
+        "turns": [
+            ("Do you have a refund policy?", "about agency questions"),
+            ("I need a flight from Chicago to Miami.", "trip planning"),
+        ],
+        "replies": ["Yep.", "That's all I needed."],
+    },
+    {
+        "turns": [("Can you order me a pizza?", "not applicable")],
+        "replies": ["Never mind, goodbye."],
+    },
+    {
+        "turns": [
+            ("I'd like to register as a new member of your rewards club.", "travel rewards"),
+            ("Plan me a honeymoon somewhere tropical.", "trip planning"),
+        ],
+        "replies": ["Sure, one more question.", "Nope."],
+    },
+    {
+        "turns": [
+            ("Are your travel agents available on weekends?", "about agency questions"),
+            ("What's the best way to get from Boston to Denver?", "trip planning"),
+            ("What's a good recipe for lasagna?", "not applicable"),
+        ],
+        "replies": ["Yes, I'd also like help planning a trip.", "Yes.", "No, I'm finished."],
+    },
+    {
+        "turns": [("Is my loyalty membership still active?", "travel rewards")],
+        "replies": ["All good, thanks."],
+    },
+    {
+        "turns": [
+            ("Where could I go for a cheap long weekend in Europe?", "trip planning"),
+            ("How long have you been in business?", "about agency questions"),
+        ],
+        "replies": ["Actually yes.", "No."],
+    },
+    {
+        "turns": [("Translate this sentence into French for me.", "not applicable")],
+        "replies": ["Okay, bye."],
+    },
+]
+
+
+class Counts(typing.NamedTuple):
+    llm_calls: int
+    local: int
+    misroutes: int
+
+
+def simulate(
+    session: typing.Dict, routers: typing.Dict[str, agent_catalog_example.embedding.intent.IntentRouter]
+) -> Counts:
+    # We walk the same decisions as agent_c.run_flow, counting the routing tasks that would have gone to the LLM.
+    # (A deferred task is assumed to route correctly, and costs at least one LLM call.)
+    llm_calls, local, misroutes = 0, 0, 0
+    user_request = None
+    turns, replies = session["turns"], session["replies"]
+    for i, (request, intent) in enumerate(turns):
+        intent_router = routers["get_user_intent"]
+        decision = intent_router.classifier.classify(user_request) if user_request is not None else None
+        if decision is None or not decision.confident:
+            decision = intent_router.classifier.classify(request)
+        if decision.confident:
+            local += 1
+            misroutes += decision.label != intent
+        else:
+            llm_calls += 1
+
+        expected_continue = i < len(turns) - 1
+        decision = routers["ask_to_continue"].classifier.classify(replies[i])
+        if decision.confident:
+            local += 1
+            misroutes += decision.label != expected_continue
+        else:
+            llm_calls += 1
+        user_request = replies[i] if expected_continue else None
+    return Counts(llm_calls, local, misroutes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Count the routing LLM calls our local intent routers save.")
+    parser.add_argument("--routers", default="src/resources/agent_c/intents.yaml")
+    parser.add_argument("--prompts", default="src/resources/agent_c/prompts")
+    args = parser.parse_args()
+
+    routers = agent_catalog_example.embedding.intent.load_routers(args.routers, prompts_dir=args.prompts)
+
+    # The latency of one (local) decision, over every utterance in our sessions.
+    utterances = [x for session in SESSIONS for x in [r for r, _ in session["turns"]] + session["replies"]]
+    routers["get_user_intent"].classifier.classify("warm up")
+    latencies = list()
+    for utterance in utterances:
+        start = time.perf_counter()
+        routers["get_user_intent"].classifier.classify(utterance)
+        latencies.append(time.perf_counter() - start)
+
+    # Without our routers, every turn costs (at least) two routing LLM calls: get_user_intent and ask_to_continue.
+    counts = [simulate(session, routers) for session in SESSIONS]
+    baseline = [2 * len(session["turns"]) for session in SESSIONS]
+    print(f"{len(SESSIONS)} sessions, {sum(len(x['turns']) for x in SESSIONS)} requests.")
+    print(f"{'session':>7} | {'LLM calls (before)':>18} | {'LLM calls (after)':>17} | {'local':>5} | {'misroutes':>9}")
+    for i, (before, after) in enumerate(zip(baseline, counts, strict=True)):
+        print(f"{i:>7} | {before:>18} | {after.llm_calls:>17} | {after.local:>5} | {after.misroutes:>9}")
+    saved = sum(baseline) - sum(x.llm_calls for x in counts)
+    print(
+        f"\nRouting LLM calls saved: {saved} / {sum(baseline)} ({saved / sum(baseline):.0%}), "
+        f"{saved / len(SESSIONS):.1f} per session, with {sum(x.misroutes for x in counts)} misroutes."
+    )
+    print(
+        f"Local decision latency: p50 {numpy.percentile(latencies, 50) * 1e3:.2f} ms, "
+        f"p99 {numpy.percentile(latencies, 99) * 1e3:.2f} ms."
+    )
@@ -0,0 +1,102 @@
+import argparse
+import asyncio
+import contextlib
+import dotenv
+import httpx
+import numpy
+import os
+import random
+import time
+import typing
+
+# Usage (from the travel_agent folder, with the rewards server running): python -m benchmarks.rewards_load
+# Note: 1000 concurrent clients need (at least) 1000 file descriptors (see 'ulimit -n').
+dotenv.load_dotenv()
+
+
+async def _client(
+    client: httpx.AsyncClient, mode: str, member_ids: typing.List[str], deadline: float, latencies: typing.List[float]
+) -> int:
+    errors, etags = 0, dict()
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            response = await _request(client, mode, member_ids, etags)
+        except httpx.TransportError:
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - start)
+        errors += response.status_code not in {200, 304}
+    return errors
+
+
+async def _request(
+    client: httpx.AsyncClient, mode: str, member_ids: typing.List[str], etags: typing.Dict[str, str]
+) -> httpx.Response:
+    match mode:
+        case "get":
+            return await client.get(f"/rewards/{random.choice(member_ids)}")
+        case "conditional-get":
+            # Clients that cache responses only download a member again if it has changed.
+            member_id = random.choice(member_ids)
+            headers = {"If-None-Match": etags[member_id]} if member_id in etags else {}
+            response = await client.get(f"/rewards/{member_id}", headers=headers)
+            if response.status_code == 200:
+                etags[member_id] = response.headers["ETag"]
+            return response
+        case "batch-get":
+            return await client.post("/rewards:batchGet", json={"member_ids": random.sample(member_ids, 10)})
+        case _:
+            raise ValueError(f"Unknown mode: {mode}")
+
+
+async def run(url: str, mode: str, clients: int, duration: float, member_ids: typing.List[str]) -> typing.Dict:
+    async with contextlib.AsyncExitStack() as stack:
+        # Each simulated client holds its own keep-alive connection (a shared httpx pool becomes our bottleneck
+        # otherwise). Clients are built before we start the clock, as building one is not free.
+        http_clients = [
+            await stack.enter_async_context(httpx.AsyncClient(base_url=url, timeout=30.0)) for _ in range(clients)
+        ]
+        latencies = list()
+        start = time.perf_counter()
+        errors = await asyncio.gather(
+            *[_client(x, mode, member_ids, start + duration, latencies) for x in http_clients]
+        )
+        elapsed = time.perf_counter() - start
+    return {
+        "requests": len(latencies),
+        "requests_per_second": len(latencies) / elapsed,
+        "p50_ms": numpy.percentile(latencies, 50) * 1e3,
+        "p99_ms": numpy.percentile(latencies, 99) * 1e3,
+        "errors": sum(errors),
+    }
+
+
+async def main(args: argparse.Namespace):
+    async with httpx.AsyncClient(base_url=args.url) as client:
+        member_ids = list()
+        for i in range(args.members):
+            response = await client.post("/create", params={"member_name": f"load_test_member_{i}"})
+            response.raise_for_status()
+            member_ids.append(response.json()["member_id"])
+
+    print(f"{args.members} members, {args.duration}s per run (batch-get requests fetch 10 members each).")
+    print(f"{'mode':>16} | {'clients':>7} | {'requests/s':>10} | {'p50 (ms)':>8} | {'p99 (ms)':>8} | {'errors':>6}")
+    for mode in args.modes:
+        for clients in args.clients:
+            result = await run(args.url, mode, clients, args.duration, member_ids)
+            print(
+                f"{mode:>16} | {clients:>7} | {result['requests_per_second']:>10.1f} | {result['p50_ms']:>8.2f} | "
+                f"{result['p99_ms']:>8.2f} | {result['errors']:>6}"
+            )
+
+
+if __name__ == "__main__":
+    default_url = f"http://{os.getenv('REWARDS_CONN_DOMAIN', 'localhost')}:{os.getenv('REWARDS_CONN_PORT', '10001')}"
+    parser = argparse.ArgumentParser(description="Load test the rewards server.")
+    parser.add_argument("--url", default=default_url)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument("--modes", nargs="+", default=["get", "conditional-get", "batch-get"])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--members", type=int, default=1000)
+    asyncio.run(main(parser.parse_args()))
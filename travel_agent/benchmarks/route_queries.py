@@ -0,0 +1,78 @@
+import argparse
+import couchbase.auth
+import couchbase.cluster
+import couchbase.options
+import dotenv
+import numpy
+import os
+import time
+import typing
+
+from setup.create_index import ROUTE_TOOLS
+from setup.create_index import read_sqlpp_query
+
+# Usage (from the travel_agent folder, after running setup/create_index.py): python -m benchmarks.route_queries
+dotenv.load_dotenv()
+
+# A fixed set of (source, destination) airport pairs, so runs are comparable across index changes.
+AIRPORT_PAIRS = [
+    ("SFO", "LAX"),
+    ("LAX", "JFK"),
+    ("JFK", "LHR"),
+    ("ATL", "ORD"),
+    ("ORD", "DFW"),
+    ("SEA", "SFO"),
+    ("CDG", "LHR"),
+    ("MCO", "BOS"),
+    ("DEN", "PHX"),
+    ("IAD", "MIA"),
+]
+
+
+def run(
+    cluster: couchbase.cluster.Cluster, query: str, adhoc: bool, repeat: int
+) -> typing.Tuple[typing.List[float], typing.List[int]]:
+    latencies, rows = list(), list()
+    for source_airport, destination_airport in AIRPORT_PAIRS:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = cluster.query(
+                query,
+                couchbase.options.QueryOptions(
+                    adhoc=adhoc,
+                    named_parameters={"source_airport": source_airport, "destination_airport": destination_airport},
+                ),
+            )
+            rows.append(len(list(result.rows())))
+            latencies.append(time.perf_counter() - start)
+    return latencies, rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the latency of our route tools over fixed airport pairs.")
+    parser.add_argument("--repeat", type=int, default=20, help="Number of runs per airport pair.")
+    parser.add_argument("--modes", nargs="+", choices=["adhoc", "prepared"], default=["adhoc", "prepared"])
+    args = parser.parse_args()
+
+    cluster = couchbase.cluster.Cluster(
+        os.getenv("CB_CONN_STRING"),
+        couchbase.options.ClusterOptions(
+            couchbase.auth.PasswordAuthenticator(username=os.getenv("CB_USERNAME"), password=os.getenv("CB_PASSWORD"))
+        ),
+    )
+    print(f"{len(AIRPORT_PAIRS)} airport pairs, {args.repeat} runs per pair.")
+    print(
+        f"{'tool':>48} | {'mode':>8} | {'first (ms)':>10} | {'p50 (ms)':>8} | {'p99 (ms)':>8} | "
+        f"{'max (ms)':>8} | {'rows / call':>11}"
+    )
+    for filename in ROUTE_TOOLS:
+        query = read_sqlpp_query(filename)
+        for mode in args.modes:
+            # The first call of a prepared statement also pays for PREPARE (i.e., what warming at startup avoids).
+            first, _ = run(cluster, query, adhoc=mode == "adhoc", repeat=1)
+            latencies, rows = run(cluster, query, adhoc=mode == "adhoc", repeat=args.repeat)
+            print(
+                f"{filename:>48} | {mode:>8} | {first[0] * 1e3:>10.2f} | "
+                f"{numpy.percentile(latencies, 50) * 1e3:>8.2f} | {numpy.percentile(latencies, 99) * 1e3:>8.2f} | "
+                f"{max(latencies) * 1e3:>8.2f} | {numpy.mean(rows):>11.1f}"
+            )
@@ -1,72 +1,88 @@
+import agent_catalog_example.tools.search_index
+import agent_catalog_example.tools.sqlpp
+import couchbase.auth
+import couchbase.cluster
+import couchbase.options
 import dotenv
-import http
 import os
-import requests
+import pathlib
+import typing
+
+# Composite indexes that cover both of our route tools (find_direct_flights.sqlpp and find_one_layover_flights.sqlpp).
+# The second index lets the optimizer drive the one-layover join from the destination airport as well.
+ROUTE_INDEXES = {
+    "route_source_destination_airline": ["sourceairport", "destinationairport", "airline"],
+    "route_destination_source_airline": ["destinationairport", "sourceairport", "airline"],
+}
+# Our vector index (including its dims) follows the configuration of the blog tool that queries it.
+BLOG_TOOL = "src/resources/agent_c/tools/blogs_from_interests.yaml"
+ROUTE_TOOLS = [
+    "src/resources/agent_c/tools/find_direct_flights.sqlpp",
+    "src/resources/agent_c/tools/find_one_layover_flights.sqlpp",
+]
 
 
 def create_vector_index() -> None:
-    hostname = os.getenv("CB_CONN_STRING").replace("couchbase", "http")
-    response = requests.put(
-        f"{hostname}:8094/api/bucket/travel-sample/scope/inventory/index/articles-index",
-        headers={"Content-Type": "application/json"},
-        auth=(
-            os.getenv("CB_USERNAME"),
-            os.getenv("CB_PASSWORD"),
-        ),
-        json={
-            "name": "articles-index",
-            "type": "fulltext-index",
-            "params": {
-                "doc_config": {
-                    "docid_prefix_delim": "",
-                    "docid_regexp": "",
-                    "mode": "scope.collection.type_field",
-                    "type_field": "type",
-                },
-                "mapping": {
-                    "default_analyzer": "standard",
-                    "default_datetime_parser": "dateTimeOptional",
-                    "default_field": "_all",
-                    "default_mapping": {"dynamic": False, "enabled": False},
-                    "default_type": "_default",
-                    "docvalues_dynamic": False,
-                    "index_dynamic": False,
-                    "store_dynamic": False,
-                    "type_field": "_type",
-                    "types": {
-                        "inventory.article": {
-                            "dynamic": False,
-                            "enabled": True,
-                            "properties": {
-                                "vec": {
-                                    "enabled": True,
-                                    "dynamic": False,
-                                    "fields": [
-                                        {
-                                            "dims": 384,
-                                            "index": True,
-                                            "name": "vec",
-                                            "similarity": "dot_product",
-                                            "type": "vector",
-                                            "vector_index_optimized_for": "recall",
-                                        }
-                                    ],
-                                }
-                            },
-                        }
-                    },
-                },
-                "store": {"indexType": "scorch", "segmentVersion": 16},
-            },
-            "sourceType": "gocbcore",
-            "sourceName": "travel-sample",
-            "sourceParams": {},
-            "planParams": {"maxPartitionsPerPIndex": 1024, "indexPartitions": 1, "numReplicas": 0},
-        },
+    # This creates (or updates) articles-index only if needed, and then waits until all of our articles are indexed.
+    manager = agent_catalog_example.tools.search_index.SearchIndexManager.from_env(os.environ)
+    manager.apply(
+        agent_catalog_example.tools.search_index.VectorIndexSpec.from_tool(BLOG_TOOL, similarity="dot_product")
     )
-    assert response.status_code == http.HTTPStatus.OK
+
+
+def read_sqlpp_query(filename: typing.Union[str, pathlib.Path]) -> str:
+    # We explain exactly the statement our SQL++ tools run (i.e., without their leading /* ... */ metadata).
+    return agent_catalog_example.tools.sqlpp.strip_header(pathlib.Path(filename).read_text())
+
+
+def create_route_indexes(cluster: couchbase.cluster.Cluster) -> None:
+    # Index creation (without defer_build) only returns once the index has been built.
+    for name, keys in ROUTE_INDEXES.items():
+        cluster.query(
+            f"CREATE INDEX `{name}` IF NOT EXISTS ON `travel-sample`.inventory.route({', '.join(keys)});"
+        ).execute()
+
+
+def _find_operators(plan: typing.Any, operator: str) -> typing.Iterable[typing.Dict]:
+    if isinstance(plan, dict):
+        if plan.get("#operator") == operator:
+            yield plan
+        for value in plan.values():
+            yield from _find_operators(value, operator)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _find_operators(value, operator)
+
+
+def verify_route_plans(cluster: couchbase.cluster.Cluster) -> None:
+    """Check (with EXPLAIN) that every keyspace of our route tools is read through one of our covering indexes."""
+    for filename in ROUTE_TOOLS:
+        query = read_sqlpp_query(filename)
+        result = cluster.query(
+            "EXPLAIN " + query,
+            couchbase.options.QueryOptions(
+                named_parameters={"source_airport": "SFO", "destination_airport": "LAX"},
+            ),
+        )
+        plan = next(iter(result.rows()))["plan"]
+        scans = list(_find_operators(plan, "IndexScan3"))
+        if len(list(_find_operators(plan, "PrimaryScan3"))) > 0 or len(list(_find_operators(plan, "Fetch"))) > 0:
+            raise RuntimeError(f"Query in {filename} is not covered by an index! Plan: {plan}")
+        if len(scans) == 0 or any(x["index"] not in ROUTE_INDEXES or "covers" not in x for x in scans):
+            raise RuntimeError(f"Query in {filename} does not use our route indexes! Plan: {plan}")
+        print(f"{filename} is covered by index(es): {', '.join(x['index'] for x in scans)}.")
 
 
 if __name__ == "__main__":
     dotenv.load_dotenv(".env")
     create_vector_index()
+
+    # Create (and verify) the indexes used by our route tools.
+    _cluster = couchbase.cluster.Cluster(
+        os.getenv("CB_CONN_STRING"),
+        couchbase.options.ClusterOptions(
+            couchbase.auth.PasswordAuthenticator(username=os.getenv("CB_USERNAME"), password=os.getenv("CB_PASSWORD"))
+        ),
+    )
+    create_route_indexes(_cluster)
+    verify_route_plans(_cluster)
@@ -1,62 +1,368 @@
+import agent_catalog_example.embedding.backends
+import agent_catalog_example.tools.cache
+import argparse
+import collections
+import concurrent.futures
 import couchbase.auth
 import couchbase.cluster
 import couchbase.options
 import dotenv
+import hashlib
+import json
+import multiprocessing
 import newspaper
+import numpy
 import os
+import pathlib
 import semchunk
-import sentence_transformers
+import time
 import typing
 import uuid
+import zlib
 
 _ARTICLES = [
     "https://www.aaa.com/tripcanvas/article/top-vacations-spots-in-the-us-CM817",
     "https://www.travelandleisure.com/best-places-to-go-2024-8385979",
     "https://www.buzzfeed.com/hannahloewentheil/better-than-expected-travel-destinations",
 ]
-_MODEL: sentence_transformers.SentenceTransformer = None
+# Our articles must be encoded with the same encoder as the queries of our blog tool (see EncoderSpec).
+BLOG_TOOL = "src/resources/agent_c/tools/blogs_from_interests.yaml"
+# Fetched articles are kept here (see ArticleCache), so that later runs do not need the network.
+DEFAULT_CACHE_DIR = pathlib.Path(".data") / "articles"
+_MODEL: agent_catalog_example.embedding.backends.Encoder = None
 _CLUSTER: couchbase.cluster.Cluster = None
+_CHUNKER: typing.Callable[[str], typing.List[str]] = None
 
 
-def grab_articles() -> typing.Iterable[typing.Dict]:
-    # As a first approach, we can leverage newspaper to do some pre-processing.
-    for article_url in _ARTICLES:
-        article = newspaper.build_article(article_url)
-        article.download()
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _write_atomically(path: pathlib.Path, text: str) -> None:
+    temporary = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+    temporary.write_text(text, encoding="utf-8")
+    os.replace(temporary, path)
+
+
+class ArticleCache:
+    """A content-addressed, on-disk cache of fetched articles, which later runs can replay without the network.
+
+    The raw HTML of a page is stored as html/<sha256 of the HTML>.html and its parsed text as text/<same sha256>.json,
+    while urls/<sha256 of the URL> names the HTML last fetched for that URL (so identical pages are stored once). Every
+    file is renamed into place, so concurrent fetchers (and interrupted runs) never leave a partial entry behind.
+    """
+
+    def __init__(self, directory: typing.Union[str, pathlib.Path] = DEFAULT_CACHE_DIR):
+        self.directory = pathlib.Path(directory)
+        for folder in ["html", "text", "urls"]:
+            (self.directory / folder).mkdir(parents=True, exist_ok=True)
+
+    def _digest(self, url: str) -> typing.Optional[str]:
+        path = self.directory / "urls" / _sha256(url)
+        return path.read_text(encoding="utf-8").strip() if path.exists() else None
+
+    def html(self, url: str) -> typing.Optional[str]:
+        digest = self._digest(url)
+        path = self.directory / "html" / f"{digest}.html"
+        return path.read_text(encoding="utf-8") if digest is not None and path.exists() else None
+
+    def get(self, url: str) -> typing.Optional[typing.Dict]:
+        digest = self._digest(url)
+        path = self.directory / "text" / f"{digest}.json"
+        if digest is None or not path.exists():
+            return None
+        return {"text": json.loads(path.read_text(encoding="utf-8"))["text"], "url": url}
+
+    def put(self, url: str, html: str, text: str) -> None:
+        digest = _sha256(html)
+        _write_atomically(self.directory / "html" / f"{digest}.html", html)
+        _write_atomically(self.directory / "text" / f"{digest}.json", json.dumps({"text": text}))
+        _write_atomically(self.directory / "urls" / _sha256(url), digest)
+
+
+class StageMeter:
+    """Measures the throughput of each stage of a (linear) generator pipeline.
+
+    track() times how long each item of a stage took to produce, which includes the time spent in the stages before
+    it. report() subtracts the latter, so each stage is charged only for its own work.
+    """
+
+    def __init__(self):
+        self.items = collections.OrderedDict()
+        self.seconds = collections.OrderedDict()
+        self.units = dict()
+
+    def track(self, stage: str, iterable: typing.Iterable, unit: str = "items") -> typing.Iterable:
+        self.items[stage], self.seconds[stage], self.units[stage] = 0, 0.0, unit
+        iterator = iter(iterable)
+        while True:
+            start_time = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.seconds[stage] += time.perf_counter() - start_time
+                return
+            self.seconds[stage] += time.perf_counter() - start_time
+            self.items[stage] += 1
+            yield item
+
+    def report(self) -> str:
+        lines, upstream = list(), 0.0
+        for stage, seconds in self.seconds.items():
+            own = max(seconds - upstream, 1e-9)
+            upstream = seconds
+            lines.append(
+                f"{stage:>8}: {self.items[stage]:>7} {self.units[stage]:<8} in {own:>7.2f}s "
+                f"({self.items[stage] / own:>9.1f} {self.units[stage]} / s)"
+            )
+        return "\n".join(lines)
+
+
+def read_urls(path: typing.Union[str, pathlib.Path]) -> typing.List[str]:
+    # One URL per line (blank lines and lines starting with '#' are skipped).
+    with pathlib.Path(path).open("r", encoding="utf-8") as fp:
+        return [line.strip() for line in fp if line.strip() and not line.lstrip().startswith("#")]
+
+
+def fetch_article(
+    url: str, cache: typing.Optional[ArticleCache], offline: bool = False
+) -> typing.Optional[typing.Dict]:
+    """Return the parsed article at url (from our cache, if we have it), or None if it could not be fetched."""
+    if cache is not None:
+        article = cache.get(url)
+        if article is not None:
+            return article
+    html = cache.html(url) if cache is not None else None
+    if html is None and offline:
+        print(f"Skipping {url} (it is not in our cache, and we are offline).")
+        return None
+    try:
+        # As a first approach, we can leverage newspaper to do some pre-processing.
+        article = newspaper.build_article(url)
+        article.download(input_html=html)
         article.parse()
-        yield {"text": article.text, "url": article_url}
+    except Exception as e:
+        print(f"Skipping {url} (it could not be fetched): {e}")
+        return None
+    if cache is not None:
+        cache.put(url, article.html, article.text)
+    return {"text": article.text, "url": url}
+
+
+def grab_articles(
+    urls: typing.Iterable[str],
+    workers: int = 8,
+    cache: typing.Optional[ArticleCache] = None,
+    offline: bool = False,
+) -> typing.Iterable[typing.Dict]:
+    # Articles are fetched by a bounded pool, at most 2 * workers ahead of our consumer, and are yielded in URL order.
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fetch") as executor:
+        pending = collections.deque()
+        for url in urls:
+            pending.append(executor.submit(fetch_article, url, cache, offline))
+            if len(pending) >= 2 * workers:
+                article = pending.popleft().result()
+                if article is not None:
+                    yield article
+        while len(pending) > 0:
+            article = pending.popleft().result()
+            if article is not None:
+                yield article
+
+
+def _initialize_chunker(token_counter: typing.Any, chunk_size: int) -> None:
+    global _CHUNKER
+    _CHUNKER = semchunk.chunkerify(token_counter, chunk_size=chunk_size)
+
+
+def _chunk_texts(texts: typing.List[str]) -> typing.List[typing.List[str]]:
+    return [_CHUNKER(text) for text in texts]
+
+
+def _ready(_: int) -> int:
+    return os.getpid()
 
 
-def chunk_articles(articles: typing.Iterable[typing.Dict]) -> typing.Iterable[typing.Dict]:
-    chunker = semchunk.chunkerify(_MODEL.tokenizer, chunk_size=256)
-    for article in articles:
-        for text_chunk in chunker(article["text"]):
-            yield {"text": text_chunk, "url": article["url"]}
+def chunk_articles(
+    articles: typing.Iterable[typing.Dict],
+    workers: int = 1,
+    chunk_size: int = 256,
+    batch_size: int = 16,
+    token_counter: typing.Any = None,
+) -> typing.Iterable[typing.Dict]:
+    """Split each article into chunks of at most chunk_size tokens, yielding them in article order.
 
+    With more than one worker, articles are sent (batch_size at a time) to forked worker processes, at most 2 * workers
+    batches ahead of our consumer. token_counter is a tokenizer (or a function that counts the tokens of a text), and
+    defaults to the tokenizer of our encoder.
+    """
+    token_counter = token_counter if token_counter is not None else _MODEL.tokenizer
+    if workers <= 1:
+        _initialize_chunker(token_counter, chunk_size)
+        for article in articles:
+            for text_chunk in _CHUNKER(article["text"]):
+                yield {"text": text_chunk, "url": article["url"]}
+        return
 
-def generate_records(chunks: typing.Iterable[typing.Dict]) -> typing.Iterable[typing.Dict]:
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("fork"),
+        initializer=_initialize_chunker,
+        initargs=(token_counter, chunk_size),
+    ) as executor:
+        # We fork our workers before we pull our first article, i.e., before our fetch threads (or any other threads of
+        # our pipeline) have started.
+        set(executor.map(_ready, range(workers * 4)))
+
+        pending = collections.deque()
+
+        def _drain() -> typing.Iterable[typing.Dict]:
+            urls, future = pending.popleft()
+            for url, text_chunks in zip(urls, future.result(), strict=True):
+                for text_chunk in text_chunks:
+                    yield {"text": text_chunk, "url": url}
+
+        batch = list()
+        for article in articles:
+            batch.append(article)
+            if len(batch) >= batch_size:
+                pending.append(([x["url"] for x in batch], executor.submit(_chunk_texts, [x["text"] for x in batch])))
+                batch = list()
+                if len(pending) >= 2 * workers:
+                    yield from _drain()
+        if len(batch) > 0:
+            pending.append(([x["url"] for x in batch], executor.submit(_chunk_texts, [x["text"] for x in batch])))
+        while len(pending) > 0:
+            yield from _drain()
+
+
+def shingles(text: str, size: int = 5) -> typing.Set[str]:
+    words = text.lower().split()
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+class NearDuplicateFilter:
+    """Keeps a text only if its (estimated) Jaccard similarity to every text kept so far is below threshold.
+
+    Texts are compared as sets of word shingles, through MinHash signatures of num_perm values. Signatures are split
+    into bands (locality-sensitive hashing): only texts that agree on all values of some band are compared, so each
+    check costs about the same no matter how many texts were kept. With 16 bands of 8 values, texts that are 80%
+    similar become candidates with a probability of about 0.95, and texts that are 40% similar with one of about 0.01.
+    """
+
+    _PRIME = (1 << 61) - 1
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 128, bands: int = 16, shingle_size: int = 5):
+        if num_perm % bands != 0:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands}).")
+        random = numpy.random.default_rng(0)
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self._a = random.integers(1, 1 << 32, num_perm, dtype=numpy.uint64)
+        self._b = random.integers(0, 1 << 32, num_perm, dtype=numpy.uint64)
+        self._rows = num_perm // bands
+        self._buckets: typing.List[typing.Dict[bytes, typing.List[int]]] = [dict() for _ in range(bands)]
+        self._signatures: typing.List[numpy.ndarray] = list()
+
+        # What we skipped (per source, e.g., article URL).
+        self.skipped = collections.Counter()
+
+    def signature(self, text: str) -> numpy.ndarray:
+        hashes = numpy.fromiter(
+            (zlib.crc32(x.encode("utf-8")) for x in shingles(text, self.shingle_size)), dtype=numpy.uint64
+        )
+        permuted = (hashes[:, None] * self._a[None, :] + self._b[None, :]) % self._PRIME
+        return (permuted & 0xFFFFFFFF).min(axis=0)
+
+    def __call__(self, text: str, source: str = None) -> bool:
+        """Return True (and remember text) if text is not a near-duplicate of a text we kept."""
+        signature = self.signature(text)
+        keys = [signature[i * self._rows : (i + 1) * self._rows].tobytes() for i in range(len(self._buckets))]
+        candidates = {x for bucket, key in zip(self._buckets, keys, strict=True) for x in bucket.get(key, ())}
+        for candidate in candidates:
+            if numpy.mean(self._signatures[candidate] == signature) >= self.threshold:
+                self.skipped[source] += 1
+                return False
+        for bucket, key in zip(self._buckets, keys, strict=True):
+            bucket.setdefault(key, list()).append(len(self._signatures))
+        self._signatures.append(signature)
+        return True
+
+    def report(self) -> str:
+        total = sum(self.skipped.values())
+        lines = [f"Skipped {total} near-duplicate chunk(s), and kept {len(self._signatures)}."]
+        lines += [f"  {count:>6} from {source}" for source, count in self.skipped.most_common(10)]
+        return "\n".join(lines)
+
+
+def dedupe_chunks(
+    chunks: typing.Iterable[typing.Dict], duplicates: NearDuplicateFilter
+) -> typing.Iterable[typing.Dict]:
+    # Syndicated (or overlapping) articles yield near-identical chunks, which would otherwise crowd our search results.
     for chunk in chunks:
-        embedding = _MODEL.encode([chunk["text"]])
+        if duplicates(chunk["text"], chunk["url"]):
+            yield chunk
+
+
+def _float32_list(vector: numpy.ndarray) -> typing.List[float]:
+    # JSON has no float32, so we write each value with the fewest digits that still round-trip to the same float32
+    # (our vectors are float32 to begin with, and their float64 expansions only add digits).
+    return [float(str(x)) for x in numpy.asarray(vector, dtype=numpy.float32)]
+
+
+def _encode_batch(chunks: typing.List[typing.Dict]) -> typing.Iterable[typing.Dict]:
+    embeddings = _MODEL.encode([chunk["text"] for chunk in chunks], batch_size=64)
+    for chunk, embedding in zip(chunks, embeddings, strict=True):
         yield {
-            "vec": list(embedding[0].astype("float64")),
+            "vec": _float32_list(embedding),
             "text": chunk["text"],
             "type": "article",
             "url": chunk["url"],
         }
 
 
-def ingest_records(records: typing.Iterable[typing.Dict]) -> None:
+def generate_records(chunks: typing.Iterable[typing.Dict], batch_size: int = 256) -> typing.Iterable[typing.Dict]:
+    # Chunks are encoded batch_size at a time, but records still stream out (i.e., we never hold more than one batch).
+    batch = list()
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) >= batch_size:
+            yield from _encode_batch(batch)
+            batch = list()
+    if len(batch) > 0:
+        yield from _encode_batch(batch)
+
+
+def ingest_records(records: typing.Iterable[typing.Dict]) -> typing.Iterable[str]:
+    # We yield the key of each record once it is stored (so that this stage can be metered like the others).
     bucket = _CLUSTER.bucket("travel-sample")
     collection = bucket.scope("inventory").collection("article")
     for r in records:
         k = "article_" + str(uuid.uuid4())
         collection.upsert(k, r)
+        yield k
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch, chunk, embed, and ingest travel articles.")
+    parser.add_argument("--urls", type=pathlib.Path, help="A file of article URLs (one per line).")
+    parser.add_argument("--workers", type=int, default=8, help="Number of articles fetched concurrently.")
+    parser.add_argument("--cache-dir", type=pathlib.Path, default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--offline", action="store_true", help="Only use articles that are in our cache.")
+    parser.add_argument("--chunk-workers", type=int, default=os.cpu_count(), help="Number of chunking processes.")
+    parser.add_argument("--batch-size", type=int, default=256, help="Number of chunks encoded at once.")
+    parser.add_argument(
+        "--dedupe-threshold", type=float, default=0.8, help="Skip chunks this similar (Jaccard) to an earlier one."
+    )
+    args = parser.parse_args()
     dotenv.load_dotenv(".env")
-    _MODEL = sentence_transformers.SentenceTransformer(
-        os.getenv("DEFAULT_SENTENCE_EMODEL"), tokenizer_kwargs={"clean_up_tokenization_spaces": True}
+
+    # Our articles must be encoded with the same encoder our blog tool queries (and create_index sizes its index) with,
+    # so we only take it from the tool's spec.
+    _MODEL = agent_catalog_example.embedding.backends.load_encoder(
+        agent_catalog_example.embedding.backends.tool_embedding_model(BLOG_TOOL)
     )
 
     # Create the article collection.
@@ -68,5 +374,23 @@ if __name__ == "__main__":
     )
     _CLUSTER.query("CREATE COLLECTION `travel-sample`.`inventory`.`article` IF NOT EXISTS;").execute()
 
-    # Run a pipeline to ingest chunked articles.
-    ingest_records(generate_records(chunk_articles(grab_articles())))
+    # Run a pipeline to ingest chunked articles (and report the throughput of each stage).
+    meter = StageMeter()
+    articles = grab_articles(
+        read_urls(args.urls) if args.urls is not None else _ARTICLES,
+        args.workers,
+        ArticleCache(args.cache_dir),
+        args.offline,
+    )
+    articles = meter.track("fetch", articles, "articles")
+    chunks = meter.track("chunk", chunk_articles(articles, args.chunk_workers), "chunks")
+    duplicates = NearDuplicateFilter(threshold=args.dedupe_threshold)
+    chunks = meter.track("dedupe", dedupe_chunks(chunks, duplicates), "chunks")
+    records = meter.track("encode", generate_records(chunks, args.batch_size), "records")
+    for _ in meter.track("ingest", ingest_records(records), "records"):
+        pass
+    print(meter.report())
+    print(duplicates.report())
+
+    # Our articles have changed, so any cached tool results (in running agent servers) are now stale.
+    agent_catalog_example.tools.cache.bump_epoch()
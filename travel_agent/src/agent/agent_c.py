@@ -1,6 +1,21 @@
+import agent_catalog_example.catalog.cache
+import agent_catalog_example.catalog.provider
+import agent_catalog_example.catalog.reload
+import agent_catalog_example.embedding.backends
+import agent_catalog_example.embedding.intent
+import agent_catalog_example.llm.cache
+import agent_catalog_example.llm.stream
+import agent_catalog_example.llm.tiers
+import agent_catalog_example.tools.cache
+import agent_catalog_example.tools.connections
+import agent_catalog_example.tools.offload
+import agent_catalog_example.tools.openapi
+import agent_catalog_example.tools.semantic
+import agent_catalog_example.tools.sqlpp
 import agentc
 import agentc.langchain
 import asyncio
+import collections
 import controlflow
 import controlflow.events
 import controlflow.events.events
@@ -8,6 +23,8 @@ import controlflow.orchestration
 import controlflow.tools
 import dotenv
 import fastapi
+import functools
+import hashlib
 import langchain_openai
 import os
 import pydantic
@@ -16,23 +33,179 @@ import typing
 # Load our OPENAI_API_KEY.
 dotenv.load_dotenv()
 
-# The Agent Catalog provider serves versioned tools and prompts.
-# For a comprehensive list of what parameters can be set here, see the class documentation.
-# Parameters can also be set with environment variables (e.g., bucket = $AGENT_CATALOG_BUCKET).
-provider = agentc.Provider(
-    # This 'decorator' parameter tells us how tools should be returned (in this case, as a ControlFlow tool).
-    decorator=lambda t: controlflow.tools.Tool.from_function(t.func),
-    # Below, we define parameters that are passed to tools at runtime.
-    # The 'keys' of this dictionary map to the values in various tool definitions (e.g., blogs_from_interests.yaml).
-    # The 'values' of this dictionary map to actual values required by the tool.
-    # In this case, we get the Couchbase connection string, username, and password from environment variables.
-    secrets={
-        "CB_CONN_STRING": os.getenv("CB_CONN_STRING"),
-        "CB_USERNAME": os.getenv("CB_USERNAME"),
-        "CB_PASSWORD": os.getenv("CB_PASSWORD"),
-    },
+# The (constant) queries our flow uses to fetch prompts. We resolve these whenever a catalog snapshot is built.
+PROMPT_QUERIES = [
+    "getting user intent",
+    "managing rewards",
+    "answering questions",
+    "negative intent",
+    "handling failed task",
+    "after addressing a user's request.",
+    "suggesting destination",
+    "getting closest airport",
+    "getting user location",
+    "finding travel routes",
+    "formatting flight plan",
+    "returning flight plan",
+]
+
+
+# Below, we define parameters that are passed to tools at runtime.
+# The 'keys' of this dictionary map to the values in various tool definitions (e.g., blogs_from_interests.yaml).
+# The 'values' of this dictionary map to actual values required by the tool.
+# In this case, we get the Couchbase connection string, username, and password from environment variables.
+SECRETS = {
+    "CB_CONN_STRING": os.getenv("CB_CONN_STRING"),
+    "CB_USERNAME": os.getenv("CB_USERNAME"),
+    "CB_PASSWORD": os.getenv("CB_PASSWORD"),
+}
+
+# SQL++ tools run as prepared statements, so the query service plans each one once (see SQLPPToolBinder).
+# Set SQLPP_ADHOC=true to run them as ad hoc queries instead.
+sqlpp_tools = agent_catalog_example.tools.sqlpp.SQLPPToolBinder(
+    ".agent-catalog/tool-catalog.json",
+    secrets=SECRETS,
+    adhoc=os.getenv("SQLPP_ADHOC", "false").lower() == "true",
+)
+
+# Semantic search tools (i.e., our blog snippet search) return the results of a recent query that is similar enough
+# (by cosine similarity of the query embeddings), instead of running another vector search (see SemanticCache).
+# Set SEMANTIC_CACHE_MAX_ENTRIES=0 to disable this cache.
+semantic_tools = agent_catalog_example.tools.semantic.SemanticSearchToolBinder(
+    ".agent-catalog/tool-catalog.json",
+    secrets=SECRETS,
+    threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.92)),
+    max_entries=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", 256)),
+    ttl=float(os.getenv("SEMANTIC_CACHE_TTL", 600)),
+)
+
+# Tool calls run off of our event loop (so one heavy call does not stall every session), either in a thread pool or in
+# a pool of processes that are forked once our models are loaded (see OffloadPool). Rules map tool names (or globs) to
+# 'process', 'thread', or 'inline', e.g., TOOL_OFFLOAD_RULES="get_travel_blog_*=process,*=thread".
+# By default, all tools run in threads: our blog tool shares its semantic cache, query batching, and local index across
+# sessions, which a worker process would only hold a copy of.
+offload_pool = agent_catalog_example.tools.offload.OffloadPool(
+    processes=int(os.getenv("TOOL_OFFLOAD_PROCESSES", 2)),
+    rules=os.getenv("TOOL_OFFLOAD_RULES", "*=thread"),
+)
+
+# Before we give a routing decision (i.e., the user's intent, or whether they want to continue) to an LLM task, we ask
+# the user ourselves and give their answer to a nearest-centroid classifier over labelled examples (see intents.yaml).
+# Only answers it is not confident about reach the LLM. Set INTENT_ROUTING=false to always use the LLM.
+intent_routers = (
+    agent_catalog_example.embedding.intent.load_routers(
+        "src/resources/agent_c/intents.yaml", prompts_dir="src/resources/agent_c/prompts"
+    )
+    if os.getenv("INTENT_ROUTING", "true").lower() == "true"
+    else dict()
+)
+
+# Our models stream their generations, so that long messages to the user can be sent to them as they are generated (see
+# message_streamer). Set ASSISTANT_STREAMING=false to only send full messages.
+assistant_streaming = os.getenv("ASSISTANT_STREAMING", "true").lower() == "true"
+stream_stats = agent_catalog_example.llm.stream.StreamStats()
+
+# Each task runs on the chat model of the tier its prompt declares (with a 'model_tier' annotation, see TierPolicy),
+# from a pool of MODEL_TIERS ordered from the cheapest to the strongest. Prompts that do not declare a tier run on
+# 'standard'. Per-tier latencies, token counts, and costs are reported at /metrics.
+model_pool = agent_catalog_example.llm.tiers.ModelPool(
+    tiers=agent_catalog_example.llm.tiers.TierSpec.parse_all(
+        os.getenv("MODEL_TIERS", agent_catalog_example.llm.tiers.DEFAULT_TIERS)
+    ),
+    model_factory=lambda model, callbacks: langchain_openai.chat_models.ChatOpenAI(
+        model=model,
+        temperature=0,
+        streaming=assistant_streaming,
+        stream_usage=assistant_streaming,
+        callbacks=callbacks,
+    ),
+)
+
+# Our (temperature 0) generations can be served from a response cache whenever a task sends the exact same conversation
+# and tools as before, under the same catalog version (see cache_responses). Cached conversations include what users
+# told our agent, so caching is opt-in: set LLM_CACHE to 'disk' (in LLM_CACHE_DIR) or 'couchbase' (in the
+# LLM_CACHE_KEYSPACE collection, shared by all agent servers). By default (LLM_CACHE=off), nothing is cached.
+match os.getenv("LLM_CACHE", "off").lower():
+    case "disk":
+        llm_cache = agent_catalog_example.llm.cache.DiskResponseCache(
+            os.getenv("LLM_CACHE_DIR", ".data/llm-cache"),
+            ttl=float(os.getenv("LLM_CACHE_TTL", agent_catalog_example.llm.cache.DEFAULT_TTL)),
+            max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", agent_catalog_example.llm.cache.DEFAULT_MAX_ENTRIES)),
+            max_bytes=int(os.getenv("LLM_CACHE_MAX_BYTES", agent_catalog_example.llm.cache.DEFAULT_MAX_BYTES)),
+        )
+    case "couchbase":
+        llm_cache = agent_catalog_example.llm.cache.CouchbaseResponseCache(
+            functools.partial(
+                agent_catalog_example.tools.connections.cluster_for,
+                {"conn_string": "CB_CONN_STRING", "username": "CB_USERNAME", "password": "CB_PASSWORD"},
+                SECRETS,
+            ),
+            *os.getenv("LLM_CACHE_KEYSPACE", "travel-sample._default.llm_cache").split("."),
+            ttl=float(os.getenv("LLM_CACHE_TTL", agent_catalog_example.llm.cache.DEFAULT_TTL)),
+        )
+    case _:
+        llm_cache = None
+
+
+def _build_provider(version: str):
+    # HTTP request tools are swapped for ones that use precompiled templates and a pooled client (see HTTPToolBinder).
+    http_tools = agent_catalog_example.tools.openapi.HTTPToolBinder(".agent-catalog/tool-catalog.json")
+
+    # SQL++ tools are re-read from our catalog, and their plans are prepared before this snapshot serves any session.
+    sqlpp_tools.refresh()
+    sqlpp_tools.warm()
+
+    # Semantic search tools are re-read as well (their caches survive as long as their search configuration does).
+    semantic_tools.refresh()
+    semantic_tools.warm()
+
+    # Tools that declare a cache policy (via 'cache_*' annotations) share one process-wide result cache.
+    # Our ingest scripts invalidate these caches with agent_catalog_example.tools.cache.bump_epoch().
+    cached_tools = agent_catalog_example.tools.cache.CachingToolBinder(".agent-catalog/tool-catalog.json")
+
+    # The Agent Catalog provider serves versioned tools and prompts.
+    # For a comprehensive list of what parameters can be set here, see the class documentation.
+    # Parameters can also be set with environment variables (e.g., bucket = $AGENT_CATALOG_BUCKET).
+    # The provider loads its own embedding model, which we only load once per process (not once per snapshot).
+    with agent_catalog_example.embedding.backends.shared_sentence_transformers():
+        agentc_provider = agentc.Provider(
+            # This 'decorator' parameter tells us how tools should be returned (in this case, as a ControlFlow tool).
+            decorator=lambda t: controlflow.tools.Tool.from_function(
+                offload_pool(cached_tools(semantic_tools(sqlpp_tools(http_tools(t.func)))))
+            ),
+            secrets=SECRETS,
+        )
+
+    # Queries given to our provider are resolved against an index over the local catalog (see IndexedProvider), and
+    # the matching tools / prompts are then fetched from the Agent Catalog provider by name.
+    # All resolutions are memoized by catalog version and shared across sessions (see CachingProvider). A snapshot
+    # always resolves against the catalog version it was built from, even after a newer one has been swapped in.
+    caching_provider = agent_catalog_example.catalog.cache.CachingProvider(
+        agent_catalog_example.catalog.provider.IndexedProvider(agentc_provider), catalog_version=lambda: version
+    )
+    caching_provider.warm(prompt_queries=PROMPT_QUERIES)
+
+    # The model tiers of our prompts belong to this snapshot too, so a (pinned) session keeps running each prompt on the
+    # same tier after a newer catalog version has been swapped in (see provider.model_tiers).
+    caching_provider.model_tiers = agent_catalog_example.llm.tiers.ModelTierBinder(
+        ".agent-catalog/prompt-catalog.json", model_pool
+    )
+    return caching_provider
+
+
+# Our provider is rebuilt (in the background) whenever a new version of our catalog is indexed, so tools and prompts
+# can be updated without restarting our server. Each session should pin one snapshot (see provider.pin()).
+provider = agent_catalog_example.catalog.reload.ReloadingProvider(
+    build=_build_provider,
+    catalog_version=agent_catalog_example.catalog.cache.CatalogVersion(".agent-catalog"),
+    poll_interval=float(os.getenv("CATALOG_POLL_INTERVAL", "5")),
 )
 
+# Our tools (and the models they use) are now loaded, and our server has not started any threads yet (e.g., our catalog
+# watcher), so this is when we fork our tool workers (only once: tools of later snapshots run in the thread pool). We
+# only fork if TOOL_OFFLOAD_RULES routes some tool to 'process' (see OffloadPool.start() for what a fork cannot see).
+offload_pool.start()
+
 
 # Below, we extend the Task class to track the (task-graph) walk our agent performs.
 # In frameworks like LangGraph, this process is more straightforward due to edge traversal being a "first-class"
@@ -40,10 +213,11 @@ provider = agentc.Provider(
 class Task(controlflow.Task):
     _accept_status: typing.Callable = None
 
-    def __init__(self, node_name: str, session: str, auditor: agentc.Auditor, **kwargs):
+    def __init__(self, node_name: str, session: str, auditor: agentc.Auditor, model_tier: str = None, **kwargs):
         super(Task, self).__init__(name=node_name, **kwargs)
+        content = {"model_tier": model_tier} if model_tier is not None else dict()
         self._accept_status = lambda status, direction: auditor.move(
-            node_name=node_name, direction=direction, session=session, content={"status": status.value}
+            node_name=node_name, direction=direction, session=session, content={"status": status.value, **content}
         )
 
     def set_status(self, status: controlflow.tasks.task.TaskStatus):
@@ -79,7 +253,9 @@ async def run_flow(thread_id: str, websocket: fastapi.WebSocket):
         asyncio.create_task(websocket.send_json({"role": "system", "content": content}))
 
     # In some agent frameworks like LangChain, user input is explicitly handled by the developer. In agent frameworks
-    # like ControlFlow, user input is just another tool call.
+    # like ControlFlow, user input is just another tool call. We keep every (question, answer) pair of this session.
+    answers: typing.List[typing.Dict[str, str]] = list()
+
     async def talk_to_user(message: str, get_response: bool = True) -> str:
         """
         Send a message to the human user and optionally wait for a response. If `get_response` is True, the function
@@ -95,159 +271,218 @@ async def run_flow(thread_id: str, websocket: fastapi.WebSocket):
         if get_response:
             response = await websocket.receive_json()
             auditor.accept(kind=agentc.auditor.Kind.Human, content=response["content"], session=thread_id)
+            answers.append({"question": message, "answer": response["content"]})
             return response
         return "Message sent to user."
 
-    # We provide a LangChain specific decorator (agentc.langchain.audit) to inject this auditor into ChatModels.
-    chat_model = langchain_openai.chat_models.ChatOpenAI(model="gpt-4o", temperature=0)
-    travel_agent = controlflow.Agent(
-        name="Couchbase Travel Agent",
-        model=agentc.langchain.audit(chat_model, session=thread_id, auditor=auditor),
-        tools=[talk_to_user],
+    # Our routing decisions (and their confidence) are logged like any other message, whether or not they are ours.
+    async def route(
+        router: agent_catalog_example.embedding.intent.IntentRouter, text: str
+    ) -> agent_catalog_example.embedding.intent.Decision:
+        decision = await asyncio.to_thread(router.classifier.classify, text)
+        content = decision.audit(router.name, text)
+        auditor.accept(kind=agentc.auditor.Kind.System, content=content, session=thread_id)
+        await websocket.send_json({"role": "system", "content": content})
+        return decision
+
+    # The messages our agent sends with talk_to_user are forwarded to the user as 'assistant_delta' frames while the LLM
+    # generates them (talk_to_user still sends the full message once the LLM is done).
+    streamer = (
+        agent_catalog_example.llm.stream.message_streamer(
+            send=lambda stream_id, text: websocket.send_json(
+                {"role": "assistant_delta", "id": stream_id, "content": text}
+            ),
+            stats=stream_stats,
+            tool_name=talk_to_user.__name__,
+            flush_interval=float(
+                os.getenv("ASSISTANT_STREAMING_INTERVAL", agent_catalog_example.llm.stream.DEFAULT_FLUSH_INTERVAL)
+            ),
+        )
+        if assistant_streaming
+        else None
     )
 
-    with controlflow.Flow():
-        callback_handler = controlflow.orchestration.handler.CallbackHandler(event_handler)
+    # We provide a LangChain specific decorator (agentc.langchain.audit) to inject this auditor into ChatModels.
+    # Our agent has one chat model per model tier (see ModelPool). Our response cache sits below the auditor, so cached
+    # generations are audited like any other.
+    def chat_model(tier: str):
+        model = model_pool.model(tier, callbacks=[streamer] if streamer is not None else None)
+        if llm_cache is not None:
+            model = agent_catalog_example.llm.cache.cache_responses(model, llm_cache, catalog_version=provider.version)
+        return agentc.langchain.audit(model, session=thread_id, auditor=auditor)
+
+    travel_agents = {
+        tier: controlflow.Agent(name="Couchbase Travel Agent", model=chat_model(tier), tools=[talk_to_user])
+        for tier in model_pool.names
+    }
+    callback_handler = controlflow.orchestration.handler.CallbackHandler(event_handler)
+
+    # ControlFlow gives each task a random id (which shows up in the messages it sends), so we give ours ids that only
+    # depend on our walk: tasks of identical walks then send identical messages (which our response cache can serve).
+    task_counts = collections.Counter()
+
+    # Each task runs on the model tier its prompt declares. If the task fails (e.g., its result does not validate
+    # against its result_type), it is run again on the next tier. Like Task.run_async, we raise if the last one fails.
+    # The user should not be asked the same questions twice, so a retry is given the answers the user already gave to
+    # the failed attempts (as context).
+    async def run_task(node_name: str, **kwargs) -> typing.Any:
+        tier = provider.model_tiers.tier_for(node_name)
+        first_answer = len(answers)
         while True:
-            # Request router: find out what the user wants to do.
-            user_intent_prompt = provider.get_prompt_for(query="getting user intent")
-            user_intent = await Task(
-                node_name="get_user_intent",
+            task_counts[node_name] += 1
+            task = Task(
+                id=hashlib.sha256(f"{node_name}:{task_counts[node_name]}".encode("utf-8")).hexdigest()[:8],
+                node_name=node_name,
                 auditor=auditor,
                 session=thread_id,
-                objective=user_intent_prompt.prompt,
-                tools=user_intent_prompt.tools,
-                agents=[travel_agent],
-                result_type=["travel rewards", "trip planning", "about agency questions", "not applicable"],
-            ).run_async(handlers=[callback_handler])
+                model_tier=tier,
+                agents=[travel_agents[tier]],
+                **kwargs,
+            )
+            try:
+                result = await task.run_async(handlers=[callback_handler])
+                if not task.is_failed():
+                    return result
+                error = ValueError(f"Task {node_name} failed: {task.result}")
+            except ValueError as e:
+                error = e
+            tier = model_pool.escalate(tier)
+            if tier is None:
+                raise error
+            if len(answers) > first_answer:
+                context = {**(kwargs.get("context") or dict()), "user_already_answered": answers[first_answer:]}
+                kwargs = {**kwargs, "context": context}
+
+    with controlflow.Flow():
+        user_request = None
+        while True:
+            # Request router: find out what the user wants to do (without an LLM, if our classifier is confident).
+            user_intent = None
+            if "get_user_intent" in intent_routers:
+                router = intent_routers["get_user_intent"]
+                # A reply to ask_to_continue may already hold the next request (e.g., "yes, what are my points?").
+                decision = await route(router, user_request) if user_request is not None else None
+                if decision is None or not decision.confident:
+                    user_request = (await talk_to_user(router.question))["content"]
+                    decision = await route(router, user_request)
+                user_intent = decision.label if decision.confident else None
+            request_context = {"user_request": user_request} if user_request is not None else dict()
+            if user_intent is None:
+                user_intent_prompt = provider.get_prompt_for(query="getting user intent")
+                user_intent = await run_task(
+                    node_name="get_user_intent",
+                    objective=user_intent_prompt.prompt,
+                    tools=user_intent_prompt.tools,
+                    result_type=["travel rewards", "trip planning", "about agency questions", "not applicable"],
+                    context=request_context,
+                )
 
             # Decide the next task.
             match user_intent:
                 case "travel rewards":
                     next_prompt = provider.get_prompt_for(query="managing rewards")
-                    next_task = Task(
+                    next_task = dict(
                         node_name="manage_rewards",
-                        auditor=auditor,
-                        session=thread_id,
                         objective=next_prompt.prompt,
                         tools=next_prompt.tools,
-                        agents=[travel_agent],
+                        context=request_context,
                     )
                 case "trip planning":
-                    next_task = await _build_recommender_task(
-                        thread_id=thread_id,
-                        auditor=auditor,
-                        travel_agent=travel_agent,
-                        callback_handler=callback_handler,
-                        talk_to_user=talk_to_user,
-                    )
+                    next_task = await _build_recommender_task(run_task=run_task, request_context=request_context)
                 case "about agency questions":
                     next_prompt = provider.get_prompt_for(query="answering questions")
-                    next_task = Task(
+                    next_task = dict(
                         node_name="answer_questions",
-                        auditor=auditor,
-                        session=thread_id,
                         objective=next_prompt.prompt,
                         tools=next_prompt.tools,
-                        agents=[travel_agent],
                         result_type=str,
+                        context=request_context,
                     )
                 case "not applicable":
                     next_prompt = provider.get_prompt_for(query="negative intent")
-                    next_task = Task(
+                    next_task = dict(
                         node_name="negative_intent",
-                        auditor=auditor,
-                        session=thread_id,
                         objective=next_prompt.prompt,
                         tools=next_prompt.tools,
-                        agents=[travel_agent],
+                        context=request_context,
                     )
                 case _:
                     raise RuntimeError("Bad response returned from agent!")
-            await next_task.run_async(handlers=[callback_handler])
-            if next_task.is_failed():
+            try:
+                await run_task(**next_task)
+            except ValueError:
                 failure_prompt = provider.get_prompt_for(query="handling failed task")
-                await Task(
+                await run_task(
                     node_name="handle_failed_task",
-                    auditor=auditor,
-                    session=thread_id,
                     objective=failure_prompt.prompt,
                     tools=failure_prompt.tools,
-                    agents=[travel_agent],
-                ).run_async(handlers=[callback_handler])
+                )
                 break
 
-            # See if the user wants to continue.
-            is_continue_prompt = provider.get_prompt_for(query="after addressing a user's request.")
-            is_continue = await Task(
-                node_name="ask_to_continue",
-                auditor=auditor,
-                session=thread_id,
-                objective=is_continue_prompt.prompt,
-                tools=is_continue_prompt.tools,
-                agents=[travel_agent],
-                result_type=[True, False],
-            ).run_async(handlers=[callback_handler])
+            # See if the user wants to continue (again, without an LLM if we can).
+            is_continue, reply = None, None
+            if "ask_to_continue" in intent_routers:
+                router = intent_routers["ask_to_continue"]
+                reply = (await talk_to_user(router.question))["content"]
+                decision = await route(router, reply)
+                is_continue = decision.label if decision.confident else None
+            if is_continue is None:
+                is_continue_prompt = provider.get_prompt_for(query="after addressing a user's request.")
+                is_continue = await run_task(
+                    node_name="ask_to_continue",
+                    objective=is_continue_prompt.prompt,
+                    tools=is_continue_prompt.tools,
+                    result_type=[True, False],
+                    context={"user_reply": reply} if reply is not None else dict(),
+                )
+            user_request = reply if is_continue else None
             if is_continue is False:
                 break
 
 
 async def _build_recommender_task(
-    thread_id: str,
-    auditor: agentc.Auditor,
-    travel_agent: controlflow.Agent,
-    callback_handler: controlflow.orchestration.Handler,
-    talk_to_user: typing.Callable,
-) -> controlflow.Task:
+    run_task: typing.Callable[..., typing.Awaitable], request_context: typing.Dict[str, str] = None
+) -> typing.Dict[str, typing.Any]:
+    # We run every task of our plan but the last (which returns the plan to the user), and return the arguments of the
+    # latter so that run_flow can run it like any other next task.
     # Task 1A: Decide on a destination by working with the user.
     recommend_destinations_prompt = provider.get_prompt_for(query="suggesting destination")
-    recommended_destinations = await Task(
+    recommended_destinations = await run_task(
         node_name="suggest_destination",
-        auditor=auditor,
-        session=thread_id,
         objective=recommend_destinations_prompt.prompt,
         tools=recommend_destinations_prompt.tools,
-        agents=[travel_agent],
         result_type=str,
-    ).run_async(handlers=[callback_handler])
+        context=request_context or dict(),
+    )
 
     # Task 1B: Find the closet airport to the user's destination.
     closet_dest_airport_prompt = provider.get_prompt_for(query="getting closest airport")
-    closest_dest_airport = await Task(
+    closest_dest_airport = await run_task(
         node_name="get_closest_airport",
-        auditor=auditor,
-        session=thread_id,
         objective=closet_dest_airport_prompt.prompt,
         tools=closet_dest_airport_prompt.tools,
-        agents=[travel_agent],
         result_type=str,
         context={"location": recommended_destinations},
-    ).run_async(handlers=[callback_handler])
+    )
 
     # Task 2A: Get the user's location.
     user_location_prompt = provider.get_prompt_for(query="getting user location")
-    user_location = await Task(
+    user_location = await run_task(
         node_name="get_user_location",
-        auditor=auditor,
-        session=thread_id,
         objective=user_location_prompt.prompt,
         tools=user_location_prompt.tools,
-        agents=[travel_agent],
         result_type=str,
-    ).run_async(handlers=[callback_handler])
+    )
 
     # Task 2B: Find the closest airport to the user's location.
     closet_source_airport_prompt = provider.get_prompt_for(query="getting closest airport")
-    closest_source_airport = await Task(
+    closest_source_airport = await run_task(
         node_name="get_closest_airport",
-        auditor=auditor,
-        session=thread_id,
         objective=closet_source_airport_prompt.prompt,
         tools=closet_source_airport_prompt.tools,
-        agents=[travel_agent],
         result_type=str,
         context={"location": user_location},
-    ).run_async(handlers=[callback_handler])
+    )
 
     # Tip: use Pydantic models to define the structure of the data you expect to receive!
     class TravelRoute(pydantic.BaseModel):
@@ -258,42 +493,33 @@ async def _build_recommender_task(
 
     # Part #3: find a route from the source airport to the destination airport.
     find_source_to_dest_route_prompt = provider.get_prompt_for(query="finding travel routes")
-    source_to_dest_route = await Task(
+    source_to_dest_route = await run_task(
         node_name="find_travel_routes",
-        auditor=auditor,
-        session=thread_id,
         objective=find_source_to_dest_route_prompt.prompt,
         tools=find_source_to_dest_route_prompt.tools,
-        agents=[travel_agent],
         result_type=list[TravelRoute],
         context={"dest_airport": closest_dest_airport, "source_airport": closest_source_airport},
-    ).run_async(handlers=[callback_handler])
+    )
 
     # Part #4: format the plan in Markdown.
     format_travel_plan_prompt = provider.get_prompt_for(query="formatting flight plan")
-    formatted_travel_plan = await Task(
+    formatted_travel_plan = await run_task(
         node_name="format_flight_plan",
-        auditor=auditor,
-        session=thread_id,
         objective=format_travel_plan_prompt.prompt,
         tools=format_travel_plan_prompt.tools,
-        agents=[travel_agent],
         result_type=str,
         context={
             "user_location": user_location,
             "travel_destination": recommended_destinations,
             "flight_plan": source_to_dest_route,
         },
-    ).run_async(handlers=[callback_handler])
+    )
 
     # Part #5: return this plan back to the user.
     return_travel_plan_prompt = provider.get_prompt_for(query="returning flight plan")
-    return Task(
+    return dict(
         node_name="return_flight_plan",
-        auditor=auditor,
-        session=thread_id,
         objective=return_travel_plan_prompt.prompt,
         tools=return_travel_plan_prompt.tools,
-        agents=[travel_agent],
         context={"travel_plan": formatted_travel_plan},
     )
@@ -73,19 +73,30 @@ def feedback_callback_factory(assistant_message: str):
     return feedback_callback
 
 
-# We need to gather messages until the agent is done thinking.
+# We need to gather messages until the agent is done thinking. Assistant messages arrive as deltas while the agent
+# generates them (rendered as they come), followed by the full message. Deltas of a message the agent abandoned (i.e.,
+# with another id) are dropped.
 def gather_messages():
+    thoughts = streamlit.status("(click here to see my thoughts)")
+    reply, reply_id, reply_text = streamlit.empty(), None, ""
     try:
         while True:
             _message = asyncio.run_coroutine_threadsafe(
                 streamlit.session_state.websocket.recv(), streamlit.session_state.event_loop
             ).result()
             _message = json.loads(_message)
+            if _message["role"] == "assistant_delta":
+                if _message["id"] != reply_id:
+                    reply_id, reply_text = _message["id"], ""
+                reply_text += _message["content"]
+                reply.markdown(reply_text + "▌")
+                continue
             if not any(_message["content"] == m for m in streamlit.session_state.messages):
                 streamlit.session_state.messages.append(_message)
-                streamlit.caption(_message["content"])
             if _message["role"] == "assistant":
+                reply.markdown(_message["content"])
                 break
+            thoughts.caption(_message["content"])
     except websockets.exceptions.ConnectionClosedError:
         streamlit.write("Agent has disconnected from the current session.")
         streamlit.session_state.is_finished = True
@@ -116,7 +127,7 @@ elif "is_ready" not in streamlit.session_state:
     streamlit.chat_input("Chat with the agent!", disabled=True)
     if "messages" not in streamlit.session_state:
         streamlit.session_state.messages = list()
-    with streamlit.chat_message("assistant"), streamlit.status("(click here to see my thoughts)"):
+    with streamlit.chat_message("assistant"):
         gather_messages()
     if any(message["role"] == "assistant" for message in streamlit.session_state.messages):
         streamlit.session_state.is_ready = True
@@ -162,6 +173,6 @@ else:
             asyncio.run_coroutine_threadsafe(
                 websocket.send(json.dumps(user_message)), streamlit.session_state.event_loop
             ).result()
-            with streamlit.chat_message("assistant"), streamlit.status("(click here to see my thoughts)"):
+            with streamlit.chat_message("assistant"):
                 gather_messages()
             streamlit.rerun()
@@ -1,4 +1,8 @@
+import agent_catalog_example.embedding.batching
+import agent_catalog_example.tools.cache
+import agent_catalog_example.tools.offload
 import agentc
+import contextlib
 import fastapi
 import logging
 import uuid
@@ -6,12 +10,37 @@ import uuid
 
 # Choose which agent "version" to run! (preferably agent_c :-))
 # from src.agent.agent_a import run_flow
+from src.agent.agent_c import llm_cache
+from src.agent.agent_c import model_pool
+from src.agent.agent_c import offload_pool
+from src.agent.agent_c import provider
 from src.agent.agent_c import run_flow
+from src.agent.agent_c import semantic_tools
+from src.agent.agent_c import sqlpp_tools
+from src.agent.agent_c import stream_stats
 
-agent_server = fastapi.FastAPI()
 logger = logging.getLogger(__name__)
 
 
+# How late our event loop runs its callbacks (if tool calls block the loop, every session waits).
+loop_lag = agent_catalog_example.tools.offload.LoopLagMonitor()
+
+
+@contextlib.asynccontextmanager
+async def lifespan(_: fastapi.FastAPI):
+    # Our (already warm) provider watches for new catalog versions while we serve sessions.
+    provider.start()
+    logger.debug("Catalog watcher has been started.")
+    loop_lag.start()
+    yield
+    loop_lag.stop()
+    provider.stop()
+    offload_pool.close()
+
+
+agent_server = fastapi.FastAPI(lifespan=lifespan)
+
+
 @agent_server.post("/feedback/{thread_id}")
 def feedback(thread_id: str, content: str):
     auditor = agentc.Auditor(agent_name="Couchbase Travel Agent")
@@ -23,6 +52,23 @@ def feedback(thread_id: str, content: str):
     return fastapi.Response(status_code=200)
 
 
+@agent_server.get("/metrics")
+def metrics():
+    return {
+        "catalog": provider.stats(),
+        "resolution_cache": provider.current.provider.cache.stats(),
+        "sqlpp_tools": sqlpp_tools.plan_cache_stats(),
+        "semantic_caches": semantic_tools.stats(),
+        "embedding_services": agent_catalog_example.embedding.batching.stats(),
+        "tool_offload": offload_pool.stats(),
+        "event_loop_lag": loop_lag.stats(),
+        "tool_result_caches": agent_catalog_example.tools.cache.default_registry.stats(),
+        "model_tiers": model_pool.stats(),
+        "llm_cache": llm_cache.stats() if llm_cache is not None else None,
+        "assistant_streaming": stream_stats.stats(),
+    }
+
+
 @agent_server.websocket("/chat")
 async def chat(websocket: fastapi.WebSocket):
     await websocket.accept()
@@ -33,7 +79,8 @@ async def chat(websocket: fastapi.WebSocket):
     await websocket.send_json({"thread_id": thread_id})
     logger.debug(f"Assigned thread id: {thread_id}")
 
-    # Now we can start chatting!
-    await run_flow(thread_id, websocket)
+    # Now we can start chatting! This session sees one catalog snapshot, even if a new one is swapped in meanwhile.
+    with provider.pin():
+        await run_flow(thread_id, websocket)
     await websocket.close()
     logger.debug("Websocket connection closed.")
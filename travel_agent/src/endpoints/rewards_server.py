@@ -1,9 +1,14 @@
-import datetime
 import fastapi
+import json
+import os
 import pydantic
-import random
-import uuid
+import typing
 
+from src.endpoints.rewards_store import Member
+from src.endpoints.rewards_store import MemberStore
+
+# Members live in memory. Set REWARDS_LOG_PATH to also persist them (as an append-only log) across restarts.
+store = MemberStore(log_path=os.getenv("REWARDS_LOG_PATH"))
 travel_server = fastapi.FastAPI()
 
 
@@ -21,17 +26,62 @@ class GetMemberRewardsResponse(pydantic.BaseModel):
     rewards: Rewards
 
 
+class BatchGetMemberRewardsRequest(pydantic.BaseModel):
+    member_ids: typing.List[str] = pydantic.Field(max_length=1000)
+
+
+class BatchGetMemberRewardsResponse(pydantic.BaseModel):
+    members: typing.List[GetMemberRewardsResponse]
+    missing: typing.List[str]
+
+
+def _to_response(member: Member) -> GetMemberRewardsResponse:
+    return GetMemberRewardsResponse(
+        member_id=member.member_id,
+        member_since=member.member_since,
+        rewards=GetMemberRewardsResponse.Rewards(points=member.rewards.points),
+    )
+
+
+# Creating a member appends to (and may fsync) our log, so this handler is a plain function: FastAPI runs it in its
+# threadpool instead of on the event loop. Our reads only touch memory, so they stay on the loop.
 @travel_server.post("/create")
 def create_new_member(member_name: str) -> NewMemberResponse:
     """Create a new travel-rewards member."""
-    return NewMemberResponse(member_name=member_name, member_id=uuid.uuid4().hex)
+    member = store.create(member_name)
+    return NewMemberResponse(member_name=member.member_name, member_id=member.member_id)
 
 
-@travel_server.get("/rewards/{member_id}")
-def get_member_rewards(member_id: str) -> GetMemberRewardsResponse:
+@travel_server.get("/rewards/{member_id}", responses={304: {"description": "Not Modified"}, 404: {}})
+async def get_member_rewards(
+    member_id: str,
+    response: fastapi.Response,
+    if_none_match: typing.Optional[str] = fastapi.Header(default=None, include_in_schema=False),
+) -> GetMemberRewardsResponse:
     """Get the rewards associated with a member."""
-    return GetMemberRewardsResponse(
-        member_id=member_id,
-        member_since=str((datetime.datetime.today() - datetime.timedelta(days=100)).isoformat()),
-        rewards=GetMemberRewardsResponse.Rewards(points=random.randint(1, 10000)),
+    found = store.get(member_id)
+    if found is None:
+        raise fastapi.HTTPException(status_code=404, detail=f"Member {member_id} not found.")
+    member, etag = found
+    if if_none_match is not None and etag in {x.strip() for x in if_none_match.split(",")}:
+        return fastapi.Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return _to_response(member)
+
+
+@travel_server.post("/rewards:batchGet")
+async def batch_get_member_rewards(request: BatchGetMemberRewardsRequest) -> BatchGetMemberRewardsResponse:
+    """Get the rewards associated with many members (up to 1000) at once."""
+    found = store.get_many(request.member_ids)
+    return BatchGetMemberRewardsResponse(
+        members=[_to_response(found[x][0]) for x in request.member_ids if x in found],
+        missing=[x for x in request.member_ids if x not in found],
     )
+
+
+if __name__ == "__main__":
+    # Regenerate the OpenAPI spec that our http_request tools are built from: python -m src.endpoints.rewards_server
+    spec = travel_server.openapi()
+    spec = {"openapi": spec["openapi"], "info": spec["info"], "servers": [{"url": "http://localhost:10001"}], **spec}
+    with open("src/endpoints/rewards_spec.json", "w") as fp:
+        json.dump(spec, fp, indent=2)
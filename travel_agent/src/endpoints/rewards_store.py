@@ -0,0 +1,99 @@
+import datetime
+import hashlib
+import logging
+import os
+import pathlib
+import pydantic
+import random
+import threading
+import typing
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class Member(pydantic.BaseModel):
+    class Rewards(pydantic.BaseModel):
+        points: int
+
+    member_id: str
+    member_name: str
+    member_since: str
+    rewards: Rewards
+
+
+class MemberStore:
+    """An in-process (dictionary-backed) store of rewards members, keyed by member ID.
+
+    If log_path is given, every write is appended to a JSON-lines log (which is replayed when the store is opened), so
+    members survive a server restart. Reads never touch the disk. Each member's ETag is computed once per write.
+    """
+
+    def __init__(self, log_path: typing.Optional[typing.Union[str, pathlib.Path]] = None, fsync: bool = False):
+        self.log_path = pathlib.Path(log_path) if log_path is not None else None
+        self.fsync = fsync
+        self._members: typing.Dict[str, typing.Tuple[Member, str]] = dict()
+        self._lock = threading.Lock()
+        self._log = None
+        if self.log_path is not None:
+            self._replay()
+            self._log = self.log_path.open("a")
+
+    @staticmethod
+    def _etag(member: Member) -> str:
+        return '"' + hashlib.sha1(member.model_dump_json().encode("utf-8")).hexdigest() + '"'
+
+    def _replay(self) -> None:
+        if not self.log_path.exists():
+            return
+        with self.log_path.open("r") as fp:
+            for line in fp:
+                if line.strip() == "":
+                    continue
+                try:
+                    member = Member.model_validate_json(line)
+                except pydantic.ValidationError:
+                    # A torn (last) write from a crash. Everything before it is still good.
+                    logger.warning(f"Skipping unreadable record in {self.log_path}.")
+                    continue
+                self._members[member.member_id] = (member, self._etag(member))
+        logger.info(f"Loaded {len(self._members)} member(s) from {self.log_path}.")
+
+    def put(self, member: Member) -> str:
+        etag = self._etag(member)
+        with self._lock:
+            if self._log is not None:
+                self._log.write(member.model_dump_json() + "\n")
+                self._log.flush()
+                if self.fsync:
+                    os.fsync(self._log.fileno())
+            self._members[member.member_id] = (member, etag)
+        return etag
+
+    def create(self, member_name: str) -> Member:
+        member = Member(
+            member_id=uuid.uuid4().hex,
+            member_name=member_name,
+            member_since=datetime.datetime.now().isoformat(),
+            # New members start with some (random) welcome bonus.
+            rewards=Member.Rewards(points=random.randint(1, 10000)),
+        )
+        self.put(member)
+        return member
+
+    def get(self, member_id: str) -> typing.Optional[typing.Tuple[Member, str]]:
+        # Dictionary reads are atomic, so we do not need our lock here.
+        return self._members.get(member_id)
+
+    def get_many(self, member_ids: typing.List[str]) -> typing.Dict[str, typing.Tuple[Member, str]]:
+        members = self._members
+        return {x: members[x] for x in member_ids if x in members}
+
+    def __len__(self):
+        return len(self._members)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
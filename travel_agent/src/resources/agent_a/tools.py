@@ -1,8 +1,9 @@
+import agent_catalog_example.tools.openapi
+import agent_catalog_example.tools.semantic
 import controlflow
-import json
+import functools
 import pydantic
 import re
-import requests
 import typing
 
 
@@ -72,131 +73,62 @@ def check_if_airport_exists(aita_code: str) -> bool:
     )
 
 
-@controlflow.tool
-def get_travel_blog_snippets_from_user_interests(user_interests: list[str]) -> list[str]:
-    """Fetch snippets of travel blogs using a user's interests."""
+@functools.lru_cache
+def _get_couchbase_cluster():
     import couchbase.auth
     import couchbase.cluster
     import couchbase.options
-    import couchbase.search
-    import couchbase.vector_search
 
-    def _get_couchbase_cluster() -> couchbase.cluster.Cluster:
-        authenticator = couchbase.auth.PasswordAuthenticator(username="admin", password="password")
-        conn_string = "couchbase://localhost"
-        return couchbase.cluster.Cluster(conn_string, couchbase.options.ClusterOptions(authenticator))
+    authenticator = couchbase.auth.PasswordAuthenticator(username="admin", password="password")
+    conn_string = "couchbase://localhost"
+    return couchbase.cluster.Cluster(conn_string, couchbase.options.ClusterOptions(authenticator))
+
+
+# Each interest is embedded (in one batch) and searched on its own, and the results are merged with reciprocal rank
+# fusion (see SemanticSearchTool). Joining all interests into one query lets one interest drown out the others.
+_blog_search = agent_catalog_example.tools.semantic.SemanticSearchTool(
+    name="get_travel_blog_snippets_from_user_interests",
+    description="Fetch snippets of travel blogs using a user's interests.",
+    parameter="user_interests",
+    parameter_type=list[str],
+    vector_search={
+        "bucket": "travel-sample",
+        "scope": "inventory",
+        "collection": "article",
+        "index": "articles-index",
+        "vector_field": "vec",
+        "text_field": "text",
+        "embedding_model": "sentence-transformers/all-MiniLM-L12-v2",
+    },
+    cluster_factory=_get_couchbase_cluster,
+    cache=None,
+)
 
-    cluster = _get_couchbase_cluster()
-    bucket = cluster.bucket("travel-sample")
-    scope = bucket.scope("inventory")
-    collection = scope.collection("article")
 
-    import sentence_transformers
+@controlflow.tool
+def get_travel_blog_snippets_from_user_interests(user_interests: list[str]) -> list[str]:
+    """Fetch snippets of travel blogs using a user's interests."""
+    return _blog_search(user_interests)
 
-    embedding_model = sentence_transformers.SentenceTransformer(
-        "sentence-transformers/all-MiniLM-L12-v2",
-        tokenizer_kwargs={"clean_up_tokenization_spaces": True},
-    )
-    _embedding = embedding_model.encode(",".join(user_interests))
-    for_q = list(_embedding.astype("float64"))
-    vector_req = couchbase.vector_search.VectorSearch.from_vector_query(
-        couchbase.vector_search.VectorQuery("vec", for_q, num_candidates=3)
-    )
-    search_req = couchbase.search.SearchRequest.create(couchbase.search.MatchNoneQuery())
-    search_req = search_req.with_vector_search(vector_req)
-    search_opt = couchbase.options.SearchOptions(fields=["*"])
-    search_result = scope.search("articles-index", search_req, search_opt)
 
-    tool_results = []
-    for r in search_result.rows():
-        tool_results.append(collection.get(r.id).content_as[dict]["text"])
-    return tool_results
+# Our OpenAPI operations are compiled once (at import time), and share one pooled HTTP client.
+_rewards_spec = agent_catalog_example.tools.openapi.load_specification("src/endpoints/rewards_spec.json")
+_create_member = agent_catalog_example.tools.openapi.OperationTemplate(_rewards_spec, "/create", "post")
+_get_member_rewards = agent_catalog_example.tools.openapi.OperationTemplate(
+    _rewards_spec, "/rewards/{member_id}", "get"
+)
 
 
 @controlflow.tool
 def create_new_travel_rewards_member(member_name: str) -> str:
     """Create a new travel-rewards member."""
-    parameter_locations = {"member_name": "query"}
-    named_parameters = {"member_name": member_name}
-    for server_url in ["http://localhost:10001"]:
-        url = server_url + "/create"
-        request_body = dict()
-        parameters = dict()
-        headers = dict()
-        cookies = dict()
-        for name, location in parameter_locations.items():
-            match location:
-                case "header":
-                    headers[name] = named_parameters[name]
-                case "query":
-                    parameters[name] = named_parameters[name]
-                case "cookie":
-                    cookies[name] = named_parameters[name]
-                case "path":
-                    url = url.replace("{" + name + "}", named_parameters[name])
-                case "body":
-                    request_body[name] = named_parameters[name]
-                case _:
-                    # We should never reach here...
-                    raise ValueError("Unknown location of parameter!")
-
-        request_args = dict()
-        if len(parameters) > 0:
-            request_args["params"] = parameters
-        if len(headers) > 0:
-            request_args["headers"] = headers
-        if len(cookies) > 0:
-            request_args["cookies"] = cookies
-        if len(request_body) > 0:
-            request_args["data"] = json.dumps(request_body)
-
-        response = requests.request("POST", url, **request_args)
-        if response.status_code == 200:
-            return response.text
-        raise Exception(f"Non-200 status code returned from server!\n\n{response.text}")
+    return _create_member(member_name=member_name)
 
 
 @controlflow.tool
 def get_travel_rewards_for_member(member_id: str) -> float:
     """Get the rewards associated with a member."""
-    parameter_locations = {"member_id": "path"}
-    named_parameters = {"member_id": member_id}
-    for server_url in ["http://localhost:10001"]:
-        url = server_url + "/rewards/{member_id}"
-        request_body = dict()
-        parameters = dict()
-        headers = dict()
-        cookies = dict()
-        for name, location in parameter_locations.items():
-            match location:
-                case "header":
-                    headers[name] = named_parameters[name]
-                case "query":
-                    parameters[name] = named_parameters[name]
-                case "cookie":
-                    cookies[name] = named_parameters[name]
-                case "path":
-                    url = url.replace("{" + name + "}", named_parameters[name])
-                case "body":
-                    request_body[name] = named_parameters[name]
-                case _:
-                    # We should never reach here...
-                    raise ValueError("Unknown location of parameter!")
-
-        request_args = dict()
-        if len(parameters) > 0:
-            request_args["params"] = parameters
-        if len(headers) > 0:
-            request_args["headers"] = headers
-        if len(cookies) > 0:
-            request_args["cookies"] = cookies
-        if len(request_body) > 0:
-            request_args["data"] = json.dumps(request_body)
-
-        response = requests.request("GET", url, **request_args)
-        if response.status_code == 200:
-            return response.text
-        raise Exception(f"Non-200 status code returned from server!\n\n{response.text}")
+    return _get_member_rewards(member_id=member_id)
 
 
 def find_direct_routes_between_airports(source_airport: str, destination_airport: str):
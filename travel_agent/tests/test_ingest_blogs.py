@@ -0,0 +1,65 @@
+import numpy
+import pytest
+import setup.ingest_blogs
+import socket
+
+# Run from the travel_agent folder: python -m pytest tests
+
+ARTICLES = {
+    "https://example.com/beaches": "Surfing in San Diego is best in the fall. " * 40,
+    "https://example.com/mountains": "Hiking near Denver takes you above the tree line in a day. " * 40,
+}
+
+
+class _Encoder:
+    # A stand-in for our sentence encoder (we are testing the pipeline, not the model).
+    def encode(self, texts, batch_size=None):
+        return numpy.asarray([[len(x), x.count(" ")] for x in texts], dtype=numpy.float32)
+
+
+@pytest.fixture
+def no_network(monkeypatch):
+    def _refuse(*args, **kwargs):
+        raise AssertionError("Ingestion tried to use the network.")
+
+    monkeypatch.setattr(socket, "create_connection", _refuse)
+    monkeypatch.setattr(socket, "getaddrinfo", _refuse)
+    monkeypatch.setattr(socket.socket, "connect", _refuse)
+
+
+@pytest.fixture
+def article_cache(tmp_path):
+    cache = setup.ingest_blogs.ArticleCache(tmp_path / "articles")
+    for url, text in ARTICLES.items():
+        cache.put(url, f"<html><body><p>{text}</p></body></html>", text)
+    return cache
+
+
+def test_replay_from_cache(no_network, article_cache, monkeypatch):
+    monkeypatch.setattr(setup.ingest_blogs, "_MODEL", _Encoder())
+    urls = list(ARTICLES) + ["https://example.com/not-cached"]
+
+    articles = setup.ingest_blogs.grab_articles(urls, workers=2, cache=article_cache, offline=True)
+    chunks = setup.ingest_blogs.chunk_articles(articles, chunk_size=64, token_counter=lambda x: len(x.split()))
+    duplicates = setup.ingest_blogs.NearDuplicateFilter(threshold=0.8)
+    records = list(setup.ingest_blogs.generate_records(setup.ingest_blogs.dedupe_chunks(chunks, duplicates), 4))
+
+    # Both cached articles are ingested (in URL order), and the one we never fetched is skipped.
+    assert [x["url"] for x in records] == sorted({x["url"] for x in records}, key=urls.index)
+    assert {x["url"] for x in records} == set(ARTICLES)
+    assert all(x["type"] == "article" and len(x["vec"]) == 2 for x in records)
+
+    # Each article repeats one sentence, so all but its first chunk are near-duplicates.
+    assert len(records) == len(ARTICLES)
+    assert all(ARTICLES[x["url"]].startswith(x["text"][:40]) for x in records)
+
+
+def test_cache_round_trip(article_cache):
+    url = next(iter(ARTICLES))
+    assert article_cache.get(url) == {"text": ARTICLES[url], "url": url}
+    assert article_cache.html(url).startswith("<html>")
+    assert article_cache.get("https://example.com/not-cached") is None
+
+    # Identical pages are stored once.
+    article_cache.put("https://example.com/copy", article_cache.html(url), ARTICLES[url])
+    assert len(list((article_cache.directory / "html").iterdir())) == len(ARTICLES)
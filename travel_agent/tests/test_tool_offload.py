@@ -0,0 +1,62 @@
+import asyncio
+import pytest
+import time
+
+from agent_catalog_example.tools import offload
+
+# The p99 event loop lag we allow while CPU-bound tool calls saturate a process pool (see benchmarks/event_loop_lag.py
+# in the repository root, which compares all offload targets).
+LAG_THRESHOLD_MS = 50.0
+
+
+def encode_blog_query(cost: float) -> int:
+    # Stands in for a CPU-bound tool (e.g., a sentence embedding): pure Python work that holds the GIL throughout.
+    deadline, spins = time.perf_counter() + cost, 0
+    while time.perf_counter() < deadline:
+        spins += 1
+    return spins
+
+
+async def _measure(pool: offload.OffloadPool, callers: int = 4, duration: float = 2.0, cost: float = 0.05):
+    tool = pool(encode_blog_query)
+    pool.start()
+    monitor = offload.LoopLagMonitor(interval=0.005, window=100_000)
+    monitor.start()
+    stop_at, calls = time.perf_counter() + duration, 0
+
+    async def _caller():
+        nonlocal calls
+        while time.perf_counter() < stop_at:
+            await tool(cost)
+            calls += 1
+            await asyncio.sleep(0)
+
+    try:
+        await asyncio.gather(*(_caller() for _ in range(callers)))
+    finally:
+        monitor.stop()
+        pool.close()
+    return calls, monitor.stats()
+
+
+def test_process_offload_keeps_the_loop_responsive():
+    pool = offload.OffloadPool(processes=2, threads=4, rules="*=process")
+    calls, lag = asyncio.run(_measure(pool))
+    assert pool.stats()["encode_blog_query"].keys() == {"process"}
+    assert calls > 0
+    assert lag["p99_ms"] <= LAG_THRESHOLD_MS
+
+
+def test_inline_calls_block_the_loop():
+    # A sanity check of our measurement: the same calls, run on the loop itself, stall it for (at least) one call.
+    pool = offload.OffloadPool(processes=2, rules="*=inline")
+    _, lag = asyncio.run(_measure(pool, duration=0.5))
+    assert lag["max_ms"] >= 40.0
+
+
+@pytest.mark.parametrize("rules", ["*=thread", "*=inline"])
+def test_no_fork_without_process_rules(rules):
+    pool = offload.OffloadPool(processes=2, rules=rules)
+    pool.start()
+    assert pool._executor is None
+    pool.close()